@@ -25,6 +25,7 @@ import webob
 
 from cinder.api.openstack import wsgi
 from cinder.api import xmlutil
+from cinder.common import sqlalchemyutils
 from cinder.i18n import _
 from cinder import utils
 
@@ -170,6 +171,26 @@ def limited_by_marker(items, request, max_limit=CONF.osapi_max_limit):
     return items[start_index:range_end]
 
 
+def get_db_limit(limit, offset):
+    """Returns the number of items to read from the database.
+
+    limited() skips the offset first and returns at most limit, or
+    osapi_max_limit, of the remaining items, so there is no need to read any
+    more than that, plus one row telling the view builder whether a next
+    link is needed.  Zero, negative and invalid limits are passed through
+    untouched, to be handled further down.
+    """
+    try:
+        offset = max(int(offset or 0), 0)
+        if limit is None or int(limit) > CONF.osapi_max_limit:
+            return offset + CONF.osapi_max_limit + 1
+        if int(limit) > 0:
+            return offset + int(limit)
+    except ValueError:
+        pass
+    return limit
+
+
 def get_sort_params(params, default_key='created_at', default_dir='desc'):
     """Retrieves sort keys/directions parameters.
 
@@ -251,6 +272,9 @@ class ViewBuilder(object):
     """Model API responses as dictionaries."""
 
     _collection_name = None
+    # Whether the collection is sorted and paginated by the database, so
+    # that its next links can hold opaque markers instead of ids.
+    _opaque_markers = False
 
     def _get_links(self, request, identifier):
         return [{"rel": "self",
@@ -338,7 +362,9 @@ class ViewBuilder(object):
                             collection_name):
         links = []
         last_item = items[-1]
-        if id_key in last_item:
+        if self._opaque_markers:
+            last_item_id = self._get_opaque_marker(request, last_item)
+        elif id_key in last_item:
             last_item_id = last_item[id_key]
         else:
             last_item_id = last_item["id"]
@@ -349,6 +375,22 @@ class ViewBuilder(object):
         })
         return links
 
+    def _get_opaque_marker(self, request, item):
+        """Return a marker holding the sort key values of the item.
+
+        The next page can then be read without looking the item up again.
+        The sort keys are those of the request, completed with the default
+        keys the database adds to them.
+        """
+        sort_keys, _sort_dirs = get_sort_params(request.params.copy())
+        # The v2 API allows name instead of display_name
+        sort_keys = ['display_name' if key == 'name' else key
+                     for key in sort_keys]
+        for key in ('created_at', 'id'):
+            if key not in sort_keys:
+                sort_keys.append(key)
+        return sqlalchemyutils.encode_marker(item, sort_keys)
+
     def _update_link_prefix(self, orig_url, prefix):
         if not prefix:
             return orig_url
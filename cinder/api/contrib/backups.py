@@ -209,16 +209,29 @@ class BackupsController(wsgi.Controller):
         """Returns a list of backups, transformed through view builder."""
         context = req.environ['cinder.context']
         filters = req.params.copy()
+        marker = filters.pop('marker', None)
+        limit = filters.pop('limit', None)
+        offset = filters.pop('offset', None)
+        sort_keys, sort_dirs = common.get_sort_params(filters,
+                                                      default_dir='asc')
 
         utils.remove_invalid_filter_options(context,
                                             filters,
                                             self._get_backup_filter_options())
 
+        if 'name' in sort_keys:
+            sort_keys[sort_keys.index('name')] = 'display_name'
+
         if 'name' in filters:
             filters['display_name'] = filters['name']
             del filters['name']
 
-        backups = self.backup_api.get_all(context, search_opts=filters)
+        backups = self.backup_api.get_all(context, search_opts=filters,
+                                          marker=marker,
+                                          limit=common.get_db_limit(limit,
+                                                                    offset),
+                                          sort_keys=sort_keys,
+                                          sort_dirs=sort_dirs)
         backup_count = len(backups)
         limited_list = common.limited(backups.objects, req)
         req.cache_db_backups(limited_list)
@@ -140,7 +140,15 @@ class CgsnapshotsController(wsgi.Controller):
     def _get_cgsnapshots(self, req, is_detail):
         """Returns a list of cgsnapshots, transformed through view builder."""
         context = req.environ['cinder.context']
-        cgsnapshots = self.cgsnapshot_api.get_all_cgsnapshots(context)
+        params = req.params.copy()
+        marker = params.pop('marker', None)
+        limit = params.pop('limit', None)
+        offset = params.pop('offset', None)
+        sort_keys, sort_dirs = common.get_sort_params(params,
+                                                      default_dir='asc')
+        cgsnapshots = self.cgsnapshot_api.get_all_cgsnapshots(
+            context, marker=marker, limit=common.get_db_limit(limit, offset),
+            sort_keys=sort_keys, sort_dirs=sort_dirs)
         limited_list = common.limited(cgsnapshots, req)
 
         if is_detail:
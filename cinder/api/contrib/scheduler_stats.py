@@ -50,6 +50,15 @@ class SchedulerStatsController(wsgi.Controller):
 
         return self._view_builder.pools(req, pools, detail)
 
+    def get_placement_stats(self, req):
+        """Show placement traces and latency histograms of a scheduler."""
+        context = req.environ['cinder.context']
+        authorize(context, 'get_placement_stats')
+
+        stats = self.scheduler_api.get_placement_stats(context)
+
+        return self._view_builder.placement_stats(req, stats)
+
 
 class Scheduler_stats(extensions.ExtensionDescriptor):
     """Scheduler stats support."""
@@ -64,7 +73,8 @@ class Scheduler_stats(extensions.ExtensionDescriptor):
         res = extensions.ResourceExtension(
             Scheduler_stats.alias,
             SchedulerStatsController(),
-            collection_actions={"get_pools": "GET"})
+            collection_actions={"get_pools": "GET",
+                                "get_placement_stats": "GET"})
 
         resources.append(res)
 
@@ -0,0 +1,141 @@
+#   Copyright 2015 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_utils import uuidutils
+from webob import exc
+
+from cinder.api import extensions
+from cinder.api.openstack import wsgi
+from cinder.api.v2.views import volumes as volume_views
+from cinder import exception
+from cinder.i18n import _, _LI
+from cinder import utils
+from cinder import volume as cinder_volume
+from cinder.volume import volume_types
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+authorize = extensions.extension_authorizer('volume', 'volume_batch_create')
+
+
+class VolumeBatchCreateController(wsgi.Controller):
+    """The /os-volume-batch-create controller for the OpenStack API."""
+
+    _view_builder_class = volume_views.ViewBuilder
+
+    def __init__(self, *args, **kwargs):
+        super(VolumeBatchCreateController, self).__init__(*args, **kwargs)
+        self.volume_api = cinder_volume.API()
+
+    @wsgi.response(202)
+    def create(self, req, body):
+        """Create a batch of identical volumes.
+
+        The volumes are created like with a POST to /volumes, but are sent
+        to the scheduler in a single request which places all of them in
+        one pass.
+
+        Required HTTP Body:
+
+        {
+         'volume_batch':
+          {
+           'count': <Number of volumes to create>,
+           'size':  <Size of each volume in GB>,
+          }
+        }
+
+        Optional elements to 'volume_batch' are name, description,
+        volume_type, metadata, availability_zone, scheduler_hints and
+        multiattach, with the same meaning as for a single volume.
+
+        The count is limited to osapi_max_limit, so that all the volumes fit
+        in the response.
+        """
+        context = req.environ['cinder.context']
+        authorize(context)
+
+        self.assert_valid_body(body, 'volume_batch')
+
+        batch = body['volume_batch']
+
+        LOG.debug('Create volume batch request body: %s', body)
+
+        count = batch.get('count')
+        if (not utils.is_int_like(count) or int(count) <= 0 or
+                int(count) > CONF.osapi_max_limit):
+            msg = (_("Invalid count provided for batch create request: %(c)s "
+                     "(count must be an integer between 1 and %(max)d).") %
+                   {'c': count, 'max': CONF.osapi_max_limit})
+            raise exc.HTTPBadRequest(explanation=msg)
+        count = int(count)
+
+        size = batch.get('size')
+        if size is None:
+            msg = _("The size of the volumes is required.")
+            raise exc.HTTPBadRequest(explanation=msg)
+
+        kwargs = {}
+        req_volume_type = batch.get('volume_type', None)
+        if req_volume_type:
+            try:
+                if not uuidutils.is_uuid_like(req_volume_type):
+                    kwargs['volume_type'] = \
+                        volume_types.get_volume_type_by_name(
+                            context, req_volume_type)
+                else:
+                    kwargs['volume_type'] = volume_types.get_volume_type(
+                        context, req_volume_type)
+            except exception.VolumeTypeNotFound as error:
+                raise exc.HTTPNotFound(explanation=error.msg)
+
+        kwargs['metadata'] = batch.get('metadata', None)
+        kwargs['availability_zone'] = batch.get('availability_zone', None)
+        kwargs['scheduler_hints'] = batch.get('scheduler_hints', None)
+        kwargs['multiattach'] = batch.get('multiattach', False)
+
+        LOG.info(_LI("Create batch of %(count)d volumes of %(size)s GB"),
+                 {'count': count, 'size': size}, context=context)
+
+        new_volumes = self.volume_api.create_batch(context,
+                                                   count,
+                                                   size,
+                                                   batch.get('name'),
+                                                   batch.get('description'),
+                                                   **kwargs)
+
+        new_volumes = [dict(new_volume) for new_volume in new_volumes]
+        for new_volume in new_volumes:
+            utils.add_visible_admin_metadata(new_volume)
+
+        return self._view_builder.detail_list(req, new_volumes,
+                                              len(new_volumes))
+
+
+class Volume_batch_create(extensions.ExtensionDescriptor):
+    """Allows creating many volumes in one request."""
+
+    name = 'VolumeBatchCreate'
+    alias = 'os-volume-batch-create'
+    namespace = ('http://docs.openstack.org/volume/ext/'
+                 'os-volume-batch-create/api/v1')
+    updated = '2015-09-01T00:00:00+00:00'
+
+    def get_resources(self):
+        controller = VolumeBatchCreateController()
+        res = extensions.ResourceExtension(Volume_batch_create.alias,
+                                           controller)
+        return [res]
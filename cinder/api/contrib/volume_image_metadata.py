@@ -47,10 +47,15 @@ class VolumeImageMetadataController(wsgi.Controller):
             raise webob.exc.HTTPNotFound(explanation=msg)
         return meta
 
-    def _get_all_images_metadata(self, context):
-        """Returns the image metadata for all volumes."""
+    def _get_all_images_metadata(self, context, volume_ids=None):
+        """Returns the image metadata of volumes.
+
+        :param volume_ids: the volumes to get the metadata of, all volumes
+                           if None.
+        """
         try:
-            all_metadata = self.volume_api.get_volumes_image_metadata(context)
+            all_metadata = self.volume_api.get_volumes_image_metadata(
+                context, volume_ids=volume_ids)
         except Exception as e:
             LOG.debug('Problem retrieving volume image metadata. '
                       'It will be skipped. Error: %s', six.text_type(e))
@@ -88,8 +93,11 @@ class VolumeImageMetadataController(wsgi.Controller):
         context = req.environ['cinder.context']
         if authorize(context):
             resp_obj.attach(xml=VolumesImageMetadataTemplate())
-            all_meta = self._get_all_images_metadata(context)
-            for vol in list(resp_obj.obj.get('volumes', [])):
+            volumes = list(resp_obj.obj.get('volumes', []))
+            # Only load the metadata of the volumes in this page.
+            all_meta = self._get_all_images_metadata(
+                context, [vol['id'] for vol in volumes])
+            for vol in volumes:
                 image_meta = all_meta.get(vol['id'], {})
                 self._add_image_metadata(context, vol, image_meta)
 
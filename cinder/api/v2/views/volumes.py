@@ -25,6 +25,7 @@ class ViewBuilder(common.ViewBuilder):
     """Model a server API response as a python dictionary."""
 
     _collection_name = "volumes"
+    _opaque_markers = True
 
     def __init__(self):
         """Initialize view builder."""
@@ -230,7 +230,7 @@ class VolumeController(wsgi.Controller):
         marker = params.pop('marker', None)
         limit = params.pop('limit', None)
         sort_keys, sort_dirs = common.get_sort_params(params)
-        params.pop('offset', None)
+        offset = params.pop('offset', None)
         filters = params
 
         utils.remove_invalid_filter_options(context,
@@ -251,16 +251,21 @@ class VolumeController(wsgi.Controller):
             except (ValueError, SyntaxError):
                 LOG.debug('Could not evaluate value %s, assuming string', v)
 
-        volumes = self.volume_api.get_all(context, marker, limit,
+        # NOTE: the summary view only shows columns of the volumes table,
+        # so their metadata, type and attachments need not be joined in.
+        volumes = self.volume_api.get_all(context, marker,
+                                          common.get_db_limit(limit, offset),
                                           sort_keys=sort_keys,
                                           sort_dirs=sort_dirs,
                                           filters=filters,
-                                          viewable_admin_meta=True)
+                                          viewable_admin_meta=True,
+                                          joined_load=is_detail)
 
         volumes = [dict(vol) for vol in volumes]
 
-        for volume in volumes:
-            utils.add_visible_admin_metadata(volume)
+        if is_detail:
+            for volume in volumes:
+                utils.add_visible_admin_metadata(volume)
 
         limited_list = common.limited(volumes, req)
         volume_count = len(volumes)
@@ -25,6 +25,7 @@ class ViewBuilder(common.ViewBuilder):
     """Model backup API responses as a python dictionary."""
 
     _collection_name = "backups"
+    _opaque_markers = True
 
     def __init__(self):
         """Initialize view builder."""
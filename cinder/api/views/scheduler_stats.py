@@ -51,3 +51,12 @@ class ViewBuilder(common.ViewBuilder):
         pools_dict = dict(pools=plist)
 
         return pools_dict
+
+    def placement_stats(self, request, stats):
+        """View of the placement traces and latencies of a scheduler."""
+        return {
+            'placement_stats': {
+                'histograms': stats.get('histograms', {}),
+                'traces': stats.get('traces', []),
+            }
+        }
@@ -98,18 +98,20 @@ class API(base.Base):
         backup.save()
         self.backup_rpcapi.delete_backup(context, backup)
 
-    def get_all(self, context, search_opts=None):
+    def get_all(self, context, search_opts=None, marker=None, limit=None,
+                sort_keys=None, sort_dirs=None):
         if search_opts is None:
             search_opts = {}
         check_policy(context, 'get_all')
 
         if context.is_admin:
-            backups = objects.BackupList.get_all(context, filters=search_opts)
+            backups = objects.BackupList.get_all(context, search_opts,
+                                                 marker, limit, sort_keys,
+                                                 sort_dirs)
         else:
             backups = objects.BackupList.get_all_by_project(
-                context,
-                context.project_id,
-                filters=search_opts
+                context, context.project_id, search_opts, marker, limit,
+                sort_keys, sort_dirs
             )
 
         return backups
@@ -22,11 +22,18 @@
 """
 
 import abc
+import binascii
+import bisect
+import collections
+import ctypes
+import ctypes.util
 import hashlib
 import json
 import os
+import uuid
 
 import eventlet
+from eventlet import tpool
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_service import loopingcall
@@ -45,12 +52,143 @@ LOG = logging.getLogger(__name__)
 chunkedbackup_service_opts = [
     cfg.StrOpt('backup_compression_algorithm',
                default='zlib',
-               help='Compression algorithm (None to disable)'),
+               help='Compression algorithm (None to disable). Supported '
+                    'values are zlib, bz2, lz4 and zstd; lz4 and zstd '
+                    'require the lz4 and zstandard libraries.'),
+    cfg.IntOpt('backup_compression_threads',
+               default=0,
+               help='Number of threads used to compress a single chunk, for '
+                    'compression algorithms that support it (zstd). 0 '
+                    'compresses in the calling thread, -1 uses one thread '
+                    'per CPU.'),
+    cfg.BoolOpt('backup_adaptive_compression',
+                default=False,
+                help='Compress a sample of every chunk first, and store the '
+                     'chunk uncompressed if the sample does not compress '
+                     'well, e.g. for already compressed or encrypted data.'),
+    cfg.IntOpt('backup_max_objects_in_flight',
+               default=1,
+               help='Maximum number of backup objects being compressed and '
+                    'written to, or read from and decompressed, the backup '
+                    'repository concurrently. Each object in flight holds '
+                    'up to one chunk of volume data in memory. Values '
+                    'greater than 1 require a backup driver whose object '
+                    'readers and writers can be used concurrently.'),
+    cfg.BoolOpt('backup_skip_zero_blocks',
+                default=False,
+                help='Do not store all-zero blocks in chunked backups, '
+                     'record them as holes in the backup metadata instead. '
+                     'Backups with holes can only be restored by backup '
+                     'services that support them.'),
+    cfg.BoolOpt('backup_dedup',
+                default=False,
+                help='Store backup objects by content in a container wide '
+                     'store shared by all backups in the container, so '
+                     'that identical data is only stored once. Shared '
+                     'objects are deleted with the last backup using them.'),
+    cfg.StrOpt('backup_sha256file_format',
+               default='json',
+               choices=['json', 'binary'],
+               help='Format of the file holding the SHA-256 digests of the '
+                    'blocks of a backup, used to find the changed blocks '
+                    'of incremental backups. binary stores packed digests '
+                    'and is about a third of the size of json, but can only '
+                    'be read by backup services that support it.'),
+    cfg.IntOpt('backup_restore_fsync_interval',
+               default=0,
+               help='Number of bytes written to the volume during a restore '
+                    'between two fsync calls. 0 syncs the volume after every '
+                    'restored object.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(chunkedbackup_service_opts)
 
+# fallocate(2) flags to deallocate a range without changing the file size.
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+
+_libc = None
+
+# Size of the sample compressed by adaptive compression, and the ratio of
+# compressed to original sample size above which a chunk is stored
+# uncompressed.
+ADAPTIVE_COMPRESSION_SAMPLE_SIZE = 64 * units.Ki
+ADAPTIVE_COMPRESSION_MAX_RATIO = 0.95
+
+# Binary sha256files start with this line, followed by a JSON header line and
+# the packed digests of all the blocks of the backup.
+SHA256FILE_BINARY_MAGIC = b'cinder-sha256file\n'
+SHA256_DIGEST_SIZE = hashlib.sha256().digest_size
+
+
+def _punch_hole(fileno, offset, length):
+    """Deallocate a range of a file so that it reads back as zeros.
+
+    Returns False if the platform or the file does not support it.
+    """
+    global _libc
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(ctypes.util.find_library('c'),
+                                use_errno=True)
+        ret = _libc.fallocate(ctypes.c_int(fileno),
+                              ctypes.c_int(FALLOC_FL_PUNCH_HOLE |
+                                           FALLOC_FL_KEEP_SIZE),
+                              ctypes.c_int64(offset),
+                              ctypes.c_int64(length))
+    except (AttributeError, OSError):
+        return False
+    return ret == 0
+
+
+class ZstdCompressor(object):
+    """Compressor using the zstandard library."""
+
+    def __init__(self, threads=0):
+        import zstandard
+        self.zstd = zstandard
+        self.threads = threads
+
+    def compress(self, data):
+        # Compression contexts are not thread safe, use one per call.
+        return self.zstd.ZstdCompressor(threads=self.threads).compress(data)
+
+    def decompress(self, data):
+        return self.zstd.ZstdDecompressor().decompress(data)
+
+
+def _get_zlib_compressor():
+    import zlib
+    return zlib
+
+
+def _get_bz2_compressor():
+    import bz2
+    return bz2
+
+
+def _get_lz4_compressor():
+    import lz4.frame
+    return lz4.frame
+
+
+def _get_zstd_compressor():
+    return ZstdCompressor(threads=CONF.backup_compression_threads)
+
+
+# Maps compression algorithm names, as recorded in the backup metadata, to
+# functions returning an object with compress() and decompress() methods.
+# The functions raise ImportError if the algorithm is not available.
+COMPRESSORS = {
+    'zlib': _get_zlib_compressor,
+    'gzip': _get_zlib_compressor,
+    'bz2': _get_bz2_compressor,
+    'bzip2': _get_bz2_compressor,
+    'lz4': _get_lz4_compressor,
+    'zstd': _get_zstd_compressor,
+}
+
 
 @six.add_metaclass(abc.ABCMeta)
 class ChunkedBackupDriver(driver.BackupDriver):
@@ -65,18 +203,19 @@ class ChunkedBackupDriver(driver.BackupDriver):
     """
 
     DRIVER_VERSION = '1.0.0'
-    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1'}
+    # Backups with zero-filled holes or deduplicated objects are recorded
+    # with this version, so that services that would restore them wrongly
+    # refuse to.
+    EXTENDED_DRIVER_VERSION = '1.1.0'
+    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1',
+                              '1.1.0': '_restore_v1'}
 
     def _get_compressor(self, algorithm):
         try:
             if algorithm.lower() in ('none', 'off', 'no'):
                 return None
-            elif algorithm.lower() in ('zlib', 'gzip'):
-                import zlib as compressor
-                return compressor
-            elif algorithm.lower() in ('bz2', 'bzip2'):
-                import bz2 as compressor
-                return compressor
+            elif algorithm.lower() in COMPRESSORS:
+                return COMPRESSORS[algorithm.lower()]()
         except ImportError:
             pass
 
@@ -98,6 +237,13 @@ class ChunkedBackupDriver(driver.BackupDriver):
         self.backup_compression_algorithm = CONF.backup_compression_algorithm
         self.compressor = \
             self._get_compressor(CONF.backup_compression_algorithm)
+        self.max_objects_in_flight = max(1, CONF.backup_max_objects_in_flight)
+        self.restore_fsync_interval = CONF.backup_restore_fsync_interval
+        self.skip_zero_blocks = CONF.backup_skip_zero_blocks
+        self.adaptive_compression = CONF.backup_adaptive_compression
+        self.dedup = CONF.backup_dedup
+        self.sha256file_format = CONF.backup_sha256file_format
+        self._zero_shas = {}
         self.support_force_delete = True
 
     # To create your own "chunked" backup driver, implement the following
@@ -185,7 +331,7 @@ class ChunkedBackupDriver(driver.BackupDriver):
         return filename
 
     def _write_metadata(self, backup, volume_id, container, object_list,
-                        volume_meta, extra_metadata=None):
+                        volume_meta, extra_metadata=None, holes=None):
         filename = self._metadata_filename(backup)
         LOG.debug('_write_metadata started, container name: %(container)s,'
                   ' metadata filename: %(filename)s.',
@@ -202,6 +348,12 @@ class ChunkedBackupDriver(driver.BackupDriver):
         metadata['volume_meta'] = volume_meta
         if extra_metadata:
             metadata['extra_metadata'] = extra_metadata
+        if holes:
+            metadata['version'] = self.EXTENDED_DRIVER_VERSION
+            metadata['holes'] = holes
+        if any('dedup_object' in list(obj.values())[0]
+               for obj in object_list):
+            metadata['version'] = self.EXTENDED_DRIVER_VERSION
         metadata_json = json.dumps(metadata, sort_keys=True, indent=2)
         if six.PY3:
             metadata_json = metadata_json.encode('utf-8')
@@ -209,7 +361,8 @@ class ChunkedBackupDriver(driver.BackupDriver):
             writer.write(metadata_json)
         LOG.debug('_write_metadata finished. Metadata: %s.', metadata_json)
 
-    def _write_sha256file(self, backup, volume_id, container, sha256_list):
+    def _write_sha256file(self, backup, volume_id, container, digests):
+        """Write the packed SHA-256 digests of the backup's blocks."""
         filename = self._sha256_filename(backup)
         LOG.debug('_write_sha256file started, container name: %(container)s,'
                   ' sha256file filename: %(filename)s.',
@@ -222,14 +375,33 @@ class ChunkedBackupDriver(driver.BackupDriver):
         sha256file['backup_description'] = backup['display_description']
         sha256file['created_at'] = six.text_type(backup['created_at'])
         sha256file['chunk_size'] = self.sha_block_size_bytes
-        sha256file['sha256s'] = sha256_list
-        sha256file_json = json.dumps(sha256file, sort_keys=True, indent=2)
-        if six.PY3:
-            sha256file_json = sha256file_json.encode('utf-8')
+        if self.sha256file_format == 'binary':
+            # The header is a single line, the digests follow it as is.
+            sha256file['count'] = len(digests) // SHA256_DIGEST_SIZE
+            header = json.dumps(sha256file, sort_keys=True)
+            if six.PY3:
+                header = header.encode('utf-8')
+            sha256file_data = b''.join([SHA256FILE_BINARY_MAGIC, header,
+                                        b'\n', bytes(digests)])
+        else:
+            sha256file['sha256s'] = self._digests_to_hex(digests)
+            sha256file_data = json.dumps(sha256file, sort_keys=True,
+                                         indent=2)
+            if six.PY3:
+                sha256file_data = sha256file_data.encode('utf-8')
         with self.get_object_writer(container, filename) as writer:
-            writer.write(sha256file_json)
+            writer.write(sha256file_data)
         LOG.debug('_write_sha256file finished.')
 
+    @staticmethod
+    def _digests_to_hex(digests):
+        hex_digests = binascii.hexlify(digests)
+        if six.PY3:
+            hex_digests = hex_digests.decode('ascii')
+        size = SHA256_DIGEST_SIZE * 2
+        return [hex_digests[i:i + size]
+                for i in range(0, len(hex_digests), size)]
+
     def _read_metadata(self, backup):
         container = backup['container']
         filename = self._metadata_filename(backup)
@@ -244,18 +416,45 @@ class ChunkedBackupDriver(driver.BackupDriver):
         LOG.debug('_read_metadata finished. Metadata: %s.', metadata_json)
         return metadata
 
-    def _read_sha256file(self, backup):
+    def _read_sha256_digests(self, backup):
+        """Read the sha256file of a backup, in either format.
+
+        The digests are returned packed, under 'digests', instead of as
+        the list of hex digests of the json format.
+        """
         container = backup['container']
         filename = self._sha256_filename(backup)
         LOG.debug('_read_sha256file started, container name: %(container)s, '
                   'sha256 filename: %(filename)s.',
                   {'container': container, 'filename': filename})
         with self.get_object_reader(container, filename) as reader:
-            sha256file_json = reader.read()
-        if six.PY3:
-            sha256file_json = sha256file_json.decode('utf-8')
-        sha256file = json.loads(sha256file_json)
-        LOG.debug('_read_sha256file finished (%s).', sha256file)
+            sha256file_data = reader.read()
+        if sha256file_data.startswith(SHA256FILE_BINARY_MAGIC):
+            header_end = sha256file_data.index(b'\n',
+                                               len(SHA256FILE_BINARY_MAGIC))
+            header = sha256file_data[len(SHA256FILE_BINARY_MAGIC):header_end]
+            if six.PY3:
+                header = header.decode('utf-8')
+            sha256file = json.loads(header)
+            sha256file['digests'] = sha256file_data[header_end + 1:]
+            if (len(sha256file['digests']) !=
+                    sha256file['count'] * SHA256_DIGEST_SIZE):
+                err = (_('sha256file %s is truncated.') % filename)
+                raise exception.InvalidBackup(reason=err)
+        else:
+            if six.PY3:
+                sha256file_data = sha256file_data.decode('utf-8')
+            sha256file = json.loads(sha256file_data)
+            sha256file['digests'] = binascii.unhexlify(
+                ''.join(sha256file.pop('sha256s')))
+        LOG.debug('_read_sha256file finished (%(count)d digests).',
+                  {'count': len(sha256file['digests']) // SHA256_DIGEST_SIZE})
+        return sha256file
+
+    def _read_sha256file(self, backup):
+        sha256file = self._read_sha256_digests(backup)
+        sha256file['sha256s'] = self._digests_to_hex(
+            sha256file.pop('digests'))
         return sha256file
 
     def _prepare_backup(self, backup):
@@ -286,7 +485,8 @@ class ChunkedBackupDriver(driver.BackupDriver):
                   })
         object_meta = {'id': 1, 'list': [], 'prefix': object_prefix,
                        'volume_meta': None}
-        object_sha256 = {'id': 1, 'sha256s': [], 'prefix': object_prefix}
+        object_sha256 = {'id': 1, 'digests': bytearray(),
+                         'prefix': object_prefix}
         extra_metadata = self.get_extra_metadata(backup, volume)
         if extra_metadata is not None:
             object_meta['extra_metadata'] = extra_metadata
@@ -296,7 +496,13 @@ class ChunkedBackupDriver(driver.BackupDriver):
 
     def _backup_chunk(self, backup, container, data, data_offset,
                       object_meta, extra_metadata):
-        """Backup data chunk based on the object metadata and offset."""
+        """Backup data chunk based on the object metadata and offset.
+
+        The object is added to the object list right away so that the list
+        keeps the order of the volume data, while compressing and writing
+        the object is left to a separate greenthread.  The greenthread is
+        returned and must be waited on before the backup is finalized.
+        """
         object_prefix = object_meta['prefix']
         object_list = object_meta['list']
 
@@ -306,30 +512,160 @@ class ChunkedBackupDriver(driver.BackupDriver):
         obj[object_name] = {}
         obj[object_name]['offset'] = data_offset
         obj[object_name]['length'] = len(data)
+        object_list.append(obj)
+        object_id += 1
+        object_meta['list'] = object_list
+        object_meta['id'] = object_id
+
         LOG.debug('Backing up chunk of data from volume.')
-        algorithm, output_data = self._prepare_output_data(data)
-        obj[object_name]['compression'] = algorithm
+        return eventlet.spawn(self._write_chunk, container, object_name,
+                              obj[object_name], data, extra_metadata)
+
+    def _backup_hole(self, object_meta, offset, length):
+        """Record a range of zeros that is not stored in any object."""
+        holes = object_meta.setdefault('holes', [])
+        if holes and holes[-1]['offset'] + holes[-1]['length'] == offset:
+            holes[-1]['length'] += length
+        else:
+            holes.append({'offset': offset, 'length': length})
+
+    def _zero_sha(self, length):
+        """Return the SHA-256 digest of a block of zeros."""
+        if length not in self._zero_shas:
+            self._zero_shas[length] = hashlib.sha256(
+                b'\0' * length).digest()
+        return self._zero_shas[length]
+
+    def _write_chunk(self, container, object_name, obj, data,
+                     extra_metadata):
+        """Compress a chunk of data and write it to the backup repository."""
+        if self.dedup:
+            self._write_dedup_chunk(container, obj, data, extra_metadata)
+            return
+
+        # Compression and hashing are CPU bound, run them in a native
+        # thread so that other chunks can be processed in the meantime.
+        algorithm, output_data, md5 = tpool.execute(
+            self._prepare_chunk_data, data)
+        obj['compression'] = algorithm
         LOG.debug('About to put_object')
         with self.get_object_writer(
                 container, object_name, extra_metadata=extra_metadata
         ) as writer:
             writer.write(output_data)
-        md5 = hashlib.md5(data).hexdigest()
-        obj[object_name]['md5'] = md5
+        obj['md5'] = md5
         LOG.debug('backup MD5 for %(object_name)s: %(md5)s',
                   {'object_name': object_name, 'md5': md5})
-        object_list.append(obj)
-        object_id += 1
-        object_meta['list'] = object_list
-        object_meta['id'] = object_id
 
-        LOG.debug('Calling eventlet.sleep(0)')
-        eventlet.sleep(0)
+    def _prepare_chunk_data(self, data):
+        algorithm, output_data = self._prepare_output_data(data)
+        return algorithm, output_data, hashlib.md5(data).hexdigest()
+
+    def _hash_chunk_data(self, data):
+        return hashlib.md5(data).hexdigest(), hashlib.sha256(data).hexdigest()
+
+    def _write_dedup_chunk(self, container, obj, data, extra_metadata):
+        """Store a chunk of data in the container's deduplication store.
+
+        If the store already has an object with the same content, a
+        reference to it is taken instead of writing the data again.  The
+        object used is recorded in obj under 'dedup_object'.
+        """
+        md5, sha256 = tpool.execute(self._hash_chunk_data, data)
+        chunk = self.db.backup_dedup_chunk_reference(self.context, container,
+                                                     sha256)
+        if chunk is not None:
+            obj['dedup_id'] = chunk['id']
+            obj['dedup_object'] = chunk['object_name']
+            LOG.debug('Reusing deduplicated object %s.',
+                      chunk['object_name'])
+        else:
+            algorithm, output_data = tpool.execute(self._prepare_output_data,
+                                                   data)
+            chunk = self.db.backup_dedup_chunk_create(
+                self.context,
+                {'container': container,
+                 'sha256': sha256,
+                 'object_name': 'dedup-%s-%s' % (sha256, uuid.uuid4()),
+                 'compression': algorithm,
+                 'length': len(data),
+                 'refcount': 1,
+                 'status': 'creating'})
+            # Record the reference first, so that it is dropped again if
+            # writing the object fails.
+            obj['dedup_id'] = chunk['id']
+            obj['dedup_object'] = chunk['object_name']
+            LOG.debug('About to put_object')
+            with self.get_object_writer(
+                    container, chunk['object_name'],
+                    extra_metadata=extra_metadata
+            ) as writer:
+                writer.write(output_data)
+            self.db.backup_dedup_chunk_update(self.context, chunk['id'],
+                                              {'status': 'available'})
+        obj['compression'] = chunk['compression']
+        obj['md5'] = md5
+
+    def _release_dedup_chunks(self, container, object_list):
+        """Drop the references a backup holds on deduplicated objects.
+
+        Objects that are not referenced by any backup any more are deleted.
+        """
+        for metadata_object in object_list:
+            obj = list(metadata_object.values())[0]
+            chunk_id = obj.get('dedup_id')
+            if chunk_id is None:
+                continue
+            if self.db.backup_dedup_chunk_release(self.context, chunk_id):
+                try:
+                    self.delete_object(container, obj['dedup_object'])
+                except Exception:
+                    LOG.warning(_LW('Failed to delete deduplicated object '
+                                    '%s, continuing.'), obj['dedup_object'])
+                else:
+                    LOG.debug('deleted deduplicated object: %s.',
+                              obj['dedup_object'])
+
+    @staticmethod
+    def _wait_for_chunks(in_flight, max_in_flight=0):
+        """Wait until no more than max_in_flight chunk writes are pending."""
+        while len(in_flight) > max_in_flight:
+            in_flight.popleft().wait()
+
+    def _calculate_shas(self, data):
+        """Return the packed SHA-256 digests of each block of data."""
+        shalist = []
+        off = 0
+        datalen = len(data)
+        while off < datalen:
+            chunk_start = off
+            chunk_end = chunk_start + self.sha_block_size_bytes
+            if chunk_end > datalen:
+                chunk_end = datalen
+            chunk = data[chunk_start:chunk_end]
+            shalist.append(hashlib.sha256(chunk).digest())
+            off += self.sha_block_size_bytes
+        return b''.join(shalist)
+
+    def _is_compressible(self, data):
+        """Guess from a sample whether compressing data is worthwhile."""
+        sample = data[:ADAPTIVE_COMPRESSION_SAMPLE_SIZE]
+        if len(sample) == len(data):
+            # Small enough to just try compressing all of it.
+            return True
+        comp_sample_size = len(self.compressor.compress(sample))
+        return (comp_sample_size <
+                len(sample) * ADAPTIVE_COMPRESSION_MAX_RATIO)
 
     def _prepare_output_data(self, data):
         if self.compressor is None:
             return 'none', data
         data_size_bytes = len(data)
+        if self.adaptive_compression and not self._is_compressible(data):
+            LOG.debug('Skipping compression of this chunk, a sample of it '
+                      'does not compress well. Using original data for this '
+                      'chunk.')
+            return 'none', data
         compressed_data = self.compressor.compress(data)
         comp_size_bytes = len(compressed_data)
         algorithm = CONF.backup_compression_algorithm.lower()
@@ -355,18 +691,20 @@ class ChunkedBackupDriver(driver.BackupDriver):
         object_list = object_meta['list']
         object_id = object_meta['id']
         volume_meta = object_meta['volume_meta']
-        sha256_list = object_sha256['sha256s']
+        digests = object_sha256['digests']
         extra_metadata = object_meta.get('extra_metadata')
+        holes = object_meta.get('holes')
         self._write_sha256file(backup,
                                backup.volume_id,
                                container,
-                               sha256_list)
+                               digests)
         self._write_metadata(backup,
                              backup.volume_id,
                              container,
                              object_list,
                              volume_meta,
-                             extra_metadata)
+                             extra_metadata,
+                             holes)
         backup.object_count = object_id
         backup.save()
         LOG.debug('backup %s finished.', backup['id'])
@@ -422,8 +760,8 @@ class ChunkedBackupDriver(driver.BackupDriver):
         if backup.parent_id:
             parent_backup = objects.Backup.get_by_id(self.context,
                                                      backup.parent_id)
-            parent_backup_shafile = self._read_sha256file(parent_backup)
-            parent_backup_shalist = parent_backup_shafile['sha256s']
+            parent_backup_shafile = self._read_sha256_digests(parent_backup)
+            parent_digests = parent_backup_shafile['digests']
             if (parent_backup_shafile['chunk_size'] !=
                     self.sha_block_size_bytes):
                 err = (_('Hash block size has changed since the last '
@@ -460,88 +798,120 @@ class ChunkedBackupDriver(driver.BackupDriver):
         if self.enable_progress_timer:
             timer.start(interval=self.backup_timer_interval)
 
-        sha256_list = object_sha256['sha256s']
+        digests = object_sha256['digests']
         shaindex = 0
         is_backup_canceled = False
-        while True:
-            # First of all, we check the status of this backup. If it
-            # has been changed to delete or has been deleted, we cancel the
-            # backup process to do forcing delete.
-            backup = objects.Backup.get_by_id(self.context, backup.id)
-            if 'deleting' == backup.status or 'deleted' == backup.status:
-                is_backup_canceled = True
-                # To avoid the chunk left when deletion complete, need to
-                # clean up the object of chunk again.
-                self.delete(backup)
-                LOG.debug('Cancel the backup process of %s.', backup.id)
-                break
-            data_offset = volume_file.tell()
-            data = volume_file.read(self.chunk_size_bytes)
-            if data == b'':
-                break
-
-            # Calculate new shas with the datablock.
-            shalist = []
-            off = 0
-            datalen = len(data)
-            while off < datalen:
-                chunk_start = off
-                chunk_end = chunk_start + self.sha_block_size_bytes
-                if chunk_end > datalen:
-                    chunk_end = datalen
-                chunk = data[chunk_start:chunk_end]
-                sha = hashlib.sha256(chunk).hexdigest()
-                shalist.append(sha)
-                off += self.sha_block_size_bytes
-            sha256_list.extend(shalist)
-
-            # If parent_backup is not None, that means an incremental
-            # backup will be performed.
-            if parent_backup:
-                # Find the extent that needs to be backed up.
+        # Chunk writes still in progress, oldest first.  Reading and hashing
+        # the next chunk overlaps with compressing and writing the previous
+        # ones, bounded by max_objects_in_flight.
+        in_flight = collections.deque()
+
+        def _backup_chunk(data, data_offset):
+            self._wait_for_chunks(in_flight, self.max_objects_in_flight - 1)
+            in_flight.append(self._backup_chunk(backup, container, data,
+                                                data_offset, object_meta,
+                                                extra_metadata))
+
+        def _backup_extent(kind, data, data_offset, start, end):
+            if kind == 'hole':
+                self._backup_hole(object_meta, data_offset + start,
+                                  end - start)
+            else:
+                _backup_chunk(data[start:end], data_offset + start)
+
+        try:
+            while True:
+                # First of all, we check the status of this backup. If it
+                # has been changed to delete or has been deleted, we cancel
+                # the backup process to do forcing delete.
+                backup = objects.Backup.get_by_id(self.context, backup.id)
+                if 'deleting' == backup.status or 'deleted' == backup.status:
+                    is_backup_canceled = True
+                    # To avoid the chunk left when deletion complete, need to
+                    # wait for pending writes and clean up the object of
+                    # chunk again.
+                    self._wait_for_chunks(in_flight)
+                    self._release_dedup_chunks(container, object_meta['list'])
+                    self.delete(backup)
+                    LOG.debug('Cancel the backup process of %s.', backup.id)
+                    break
+                data_offset = volume_file.tell()
+                data = volume_file.read(self.chunk_size_bytes)
+                if data == b'':
+                    break
+
+                # Calculate new shas with the datablock.
+                shalist = tpool.execute(self._calculate_shas, data)
+                digests.extend(shalist)
+                sha_count = len(shalist) // SHA256_DIGEST_SIZE
+                parent_shalist = b''
+                if parent_backup:
+                    parent_shalist = parent_digests[
+                        shaindex * SHA256_DIGEST_SIZE:
+                        (shaindex + sha_count) * SHA256_DIGEST_SIZE]
+                shaindex += sha_count
+                if shalist == parent_shalist:
+                    # Nothing changed in the whole chunk, which is the
+                    # common case for incremental backups, so skip the
+                    # per block comparison.
+                    sha_count = 0
+
+                # Find the extents that need to be backed up.  That is the
+                # whole chunk for a full backup, and the blocks that changed
+                # since the parent backup for an incremental one.  Extents
+                # of all-zero blocks are recorded as holes instead if
+                # backup_skip_zero_blocks is enabled.
                 extent_off = -1
-                for idx, sha in enumerate(shalist):
-                    if sha != parent_backup_shalist[shaindex]:
-                        if extent_off == -1:
-                            # Start of new extent.
-                            extent_off = idx * self.sha_block_size_bytes
+                extent_kind = None
+                shalist = memoryview(shalist)
+                parent_shalist = memoryview(parent_shalist)
+                for idx in range(sha_count):
+                    block_off = idx * self.sha_block_size_bytes
+                    sha = shalist[idx * SHA256_DIGEST_SIZE:
+                                  (idx + 1) * SHA256_DIGEST_SIZE]
+                    if sha == parent_shalist[idx * SHA256_DIGEST_SIZE:
+                                             (idx + 1) * SHA256_DIGEST_SIZE]:
+                        kind = None
+                    elif (self.skip_zero_blocks and sha == self._zero_sha(
+                            min(self.sha_block_size_bytes,
+                                len(data) - block_off))):
+                        kind = 'hole'
                     else:
-                        if extent_off != -1:
-                            # We've reached the end of extent.
-                            extent_end = idx * self.sha_block_size_bytes
-                            segment = data[extent_off:extent_end]
-                            self._backup_chunk(backup, container, segment,
-                                               data_offset + extent_off,
-                                               object_meta,
-                                               extra_metadata)
-                            extent_off = -1
-                    shaindex += 1
+                        kind = 'data'
+
+                    if kind != extent_kind:
+                        if extent_kind is not None:
+                            _backup_extent(extent_kind, data, data_offset,
+                                           extent_off, block_off)
+                        extent_off = block_off
+                        extent_kind = kind
 
                 # The last extent extends to the end of data buffer.
-                if extent_off != -1:
-                    extent_end = datalen
-                    segment = data[extent_off:extent_end]
-                    self._backup_chunk(backup, container, segment,
-                                       data_offset + extent_off,
-                                       object_meta, extra_metadata)
-                    extent_off = -1
-            else:  # Do a full backup.
-                self._backup_chunk(backup, container, data, data_offset,
-                                   object_meta, extra_metadata)
-
-            # Notifications
-            total_block_sent_num += self.data_block_num
-            counter += 1
-            if counter == self.data_block_num:
-                # Send the notification to Ceilometer when the chunk
-                # number reaches the data_block_num.  The backup percentage
-                # is put in the metadata as the extra information.
-                self._send_progress_notification(self.context, backup,
-                                                 object_meta,
-                                                 total_block_sent_num,
-                                                 volume_size_bytes)
-                # Reset the counter
-                counter = 0
+                if extent_kind is not None:
+                    _backup_extent(extent_kind, data, data_offset,
+                                   extent_off, len(data))
+
+                # Notifications
+                total_block_sent_num += self.data_block_num
+                counter += 1
+                if counter == self.data_block_num:
+                    # Send the notification to Ceilometer when the chunk
+                    # number reaches the data_block_num.  The backup
+                    # percentage is put in the metadata as the extra
+                    # information.
+                    self._send_progress_notification(self.context, backup,
+                                                     object_meta,
+                                                     total_block_sent_num,
+                                                     volume_size_bytes)
+                    # Reset the counter
+                    counter = 0
+
+            self._wait_for_chunks(in_flight)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for thread in in_flight:
+                    thread.kill()
+                self._release_dedup_chunks(container, object_meta['list'])
 
         # Stop the timer.
         timer.stop()
@@ -552,7 +922,7 @@ class ChunkedBackupDriver(driver.BackupDriver):
         # All the data have been sent, the backup_percent reaches 100.
         self._send_progress_end(self.context, backup, object_meta)
 
-        object_sha256['sha256s'] = sha256_list
+        object_sha256['digests'] = digests
         if backup_metadata:
             try:
                 self._backup_metadata(backup, object_meta)
@@ -561,12 +931,20 @@ class ChunkedBackupDriver(driver.BackupDriver):
                 with excutils.save_and_reraise_exception():
                     LOG.exception(_LE("Backup volume metadata failed: %s."),
                                   err)
+                    self._release_dedup_chunks(container, object_meta['list'])
                     self.delete(backup)
 
         self._finalize_backup(backup, container, object_meta, object_sha256)
 
-    def _restore_v1(self, backup, volume_id, metadata, volume_file):
-        """Restore a v1 volume backup."""
+    def _restore_v1(self, backup, volume_id, metadata, volume_file,
+                    extents=None):
+        """Restore a v1 volume backup.
+
+        If extents is given, it maps object names to the list of
+        (start, end) volume ranges to restore from each object; objects
+        that are not in it are skipped.  Otherwise every object is
+        restored in full.
+        """
         backup_id = backup['id']
         LOG.debug('v1 volume backup restore of %s started.', backup_id)
         extra_metadata = metadata.get('extra_metadata')
@@ -574,7 +952,10 @@ class ChunkedBackupDriver(driver.BackupDriver):
         metadata_objects = metadata['objects']
         metadata_object_names = []
         for obj in metadata_objects:
-            metadata_object_names.extend(obj.keys())
+            # Deduplicated objects live outside of the backup's prefix.
+            metadata_object_names.extend(
+                object_name for object_name, value in obj.items()
+                if 'dedup_object' not in value)
         LOG.debug('metadata_object_names = %s.', metadata_object_names)
         prune_list = [self._metadata_filename(backup),
                       self._sha256_filename(backup)]
@@ -586,53 +967,194 @@ class ChunkedBackupDriver(driver.BackupDriver):
                     'does not match object list stored in metadata.')
             raise exception.InvalidBackup(reason=err)
 
-        for metadata_object in metadata_objects:
-            object_name, obj = list(metadata_object.items())[0]
-            LOG.debug('restoring object. backup: %(backup_id)s, '
-                      'container: %(container)s, object name: '
-                      '%(object_name)s, volume: %(volume_id)s.',
-                      {
-                          'backup_id': backup_id,
-                          'container': container,
-                          'object_name': object_name,
-                          'volume_id': volume_id,
-                      })
-
-            with self.get_object_reader(
-                    container, object_name,
-                    extra_metadata=extra_metadata) as reader:
-                body = reader.read()
-            compression_algorithm = metadata_object[object_name]['compression']
-            decompressor = self._get_compressor(compression_algorithm)
-            volume_file.seek(obj['offset'])
-            if decompressor is not None:
-                LOG.debug('decompressing data using %s algorithm',
-                          compression_algorithm)
-                decompressed = decompressor.decompress(body)
-                volume_file.write(decompressed)
-            else:
-                volume_file.write(body)
-
-            # force flush every write to avoid long blocking write on close
-            volume_file.flush()
+        # Objects being read and decompressed, oldest first.  They are
+        # written to the volume in order as they complete.
+        in_flight = collections.deque()
+        unsynced_bytes = 0
 
-            # Be tolerant to IO implementations that do not support fileno()
-            try:
-                fileno = volume_file.fileno()
-            except IOError:
-                LOG.info(_LI("volume_file does not support "
-                             "fileno() so skipping "
-                             "fsync()"))
-            else:
-                os.fsync(fileno)
+        try:
+            for metadata_object in metadata_objects:
+                object_name, obj = list(metadata_object.items())[0]
+                ranges = None
+                if extents is not None:
+                    ranges = extents.get(object_name)
+                    if not ranges:
+                        LOG.debug('Skipping object %s, its data is '
+                                  'superseded by a later backup.',
+                                  object_name)
+                        continue
+                LOG.debug('restoring object. backup: %(backup_id)s, '
+                          'container: %(container)s, object name: '
+                          '%(object_name)s, volume: %(volume_id)s.',
+                          {
+                              'backup_id': backup_id,
+                              'container': container,
+                              'object_name': object_name,
+                              'volume_id': volume_id,
+                          })
 
-            # Restoring a backup to a volume can take some time. Yield so other
-            # threads can run, allowing for among other things the service
-            # status to be updated
-            eventlet.sleep(0)
+                while len(in_flight) >= self.max_objects_in_flight:
+                    unsynced_bytes = self._write_restored_chunk(
+                        in_flight.popleft(), volume_file, unsynced_bytes)
+                in_flight.append((obj['offset'], ranges, eventlet.spawn(
+                    self._read_chunk, container,
+                    obj.get('dedup_object', object_name),
+                    obj['compression'], extra_metadata)))
+
+            while in_flight:
+                unsynced_bytes = self._write_restored_chunk(
+                    in_flight.popleft(), volume_file, unsynced_bytes)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for _offset, _ranges, thread in in_flight:
+                    thread.kill()
+
+        if unsynced_bytes:
+            self._fsync_volume_file(volume_file)
         LOG.debug('v1 volume backup restore of %s finished.',
                   backup_id)
 
+    def _read_chunk(self, container, object_name, compression_algorithm,
+                    extra_metadata):
+        """Read a backup object and return its decompressed data."""
+        with self.get_object_reader(
+                container, object_name,
+                extra_metadata=extra_metadata) as reader:
+            body = reader.read()
+        decompressor = self._get_compressor(compression_algorithm)
+        if decompressor is not None:
+            LOG.debug('decompressing data using %s algorithm',
+                      compression_algorithm)
+            # Decompression is CPU bound, run it in a native thread so that
+            # other objects can be fetched in the meantime.
+            return tpool.execute(decompressor.decompress, body)
+        return body
+
+    def _write_restored_chunk(self, chunk, volume_file, unsynced_bytes):
+        """Write the data of a restored object at its offset.
+
+        Only the requested ranges of the object are written if the chunk
+        has any.  Returns the number of bytes written since the last fsync.
+        """
+        offset, ranges, thread = chunk
+        data = thread.wait()
+        if ranges is None:
+            ranges = [(offset, offset + len(data))]
+        for start, end in ranges:
+            volume_file.seek(start)
+            volume_file.write(data[start - offset:end - offset])
+            unsynced_bytes += end - start
+
+        # force flush every write to avoid long blocking write on close
+        volume_file.flush()
+
+        if unsynced_bytes >= self.restore_fsync_interval:
+            self._fsync_volume_file(volume_file)
+            unsynced_bytes = 0
+
+        # Restoring a backup to a volume can take some time. Yield so other
+        # threads can run, allowing for among other things the service
+        # status to be updated
+        eventlet.sleep(0)
+        return unsynced_bytes
+
+    def _fsync_volume_file(self, volume_file):
+        # Be tolerant to IO implementations that do not support fileno()
+        try:
+            fileno = volume_file.fileno()
+        except IOError:
+            LOG.info(_LI("volume_file does not support "
+                         "fileno() so skipping "
+                         "fsync()"))
+        else:
+            os.fsync(fileno)
+
+    @staticmethod
+    def _claim_extent(covered, start, end):
+        """Mark a volume range as restored.
+
+        covered is a sorted list of disjoint (start, end) ranges that have
+        already been claimed.  Returns the parts of [start, end) that were
+        not claimed yet and adds [start, end) to covered.
+        """
+        unclaimed = []
+        i = bisect.bisect_left(covered, (start, start))
+        if i > 0 and covered[i - 1][1] >= start:
+            i -= 1
+        pos = start
+        new_start, new_end = start, end
+        j = i
+        while j < len(covered) and covered[j][0] <= end:
+            claimed_start, claimed_end = covered[j]
+            if claimed_start > pos:
+                unclaimed.append((pos, claimed_start))
+            pos = max(pos, claimed_end)
+            new_start = min(new_start, claimed_start)
+            new_end = max(new_end, claimed_end)
+            j += 1
+        if pos < end:
+            unclaimed.append((pos, end))
+        covered[i:j] = [(new_start, new_end)]
+        return unclaimed
+
+    def _get_restore_extents(self, metadata_list):
+        """Compute which data to restore from each backup of a chain.
+
+        metadata_list holds the metadata of the backups in the chain, the
+        most recent backup first.  Every volume range is restored from the
+        most recent backup holding it, so data overwritten by a later
+        incremental backup is neither read nor written.  Returns, for each
+        backup, a tuple of a dict mapping object names to the (start, end)
+        ranges to restore from that object, and the list of (start, end)
+        ranges to restore as zeros.
+        """
+        covered = []
+        extents_list = []
+        for metadata in metadata_list:
+            extents = {}
+            holes = []
+            # Objects and holes of one backup never overlap, so the order
+            # they are claimed in does not matter.
+            for metadata_object in metadata['objects']:
+                object_name, obj = list(metadata_object.items())[0]
+                ranges = self._claim_extent(covered, obj['offset'],
+                                            obj['offset'] + obj['length'])
+                if ranges:
+                    extents[object_name] = ranges
+            for hole in metadata.get('holes', []):
+                holes.extend(self._claim_extent(
+                    covered, hole['offset'], hole['offset'] + hole['length']))
+            extents_list.append((extents, holes))
+        return extents_list
+
+    def _restore_holes(self, volume_file, holes):
+        """Fill the given (start, end) ranges of the volume with zeros.
+
+        The ranges are deallocated if the volume file supports punching
+        holes, and explicitly written with zeros otherwise.
+        """
+        if not holes:
+            return
+        volume_file.flush()
+        try:
+            fileno = volume_file.fileno()
+        except IOError:
+            fileno = None
+
+        zeros = None
+        for start, end in holes:
+            if fileno is not None and _punch_hole(fileno, start, end - start):
+                continue
+            if zeros is None:
+                zeros = b'\0' * min(self.chunk_size_bytes, end - start)
+            volume_file.seek(start)
+            while start < end:
+                length = min(len(zeros), end - start)
+                volume_file.write(zeros[:length])
+                start += length
+            eventlet.sleep(0)
+        volume_file.flush()
+
     def restore(self, backup, volume_id, volume_file):
         """Restore the given volume backup from backup repository."""
         backup_id = backup['id']
@@ -669,14 +1191,25 @@ class ChunkedBackupDriver(driver.BackupDriver):
             backup_list.append(prev_backup)
             current_backup = prev_backup
 
-        # Do a full restore first, then layer the incremental backups
-        # on top of it in order.
+        # Work out from the metadata of the whole chain which backup holds
+        # the most recent data of each extent, so that every extent is
+        # restored only once.
+        metadata_list = [metadata]
+        for backup1 in backup_list[1:]:
+            metadata_list.append(self._read_metadata(backup1))
+        extents_list = self._get_restore_extents(metadata_list)
+
+        # Restore the full backup first, then the incremental backups in
+        # order, each one only writing the extents it holds the latest
+        # data for.
         index = len(backup_list) - 1
         while index >= 0:
             backup1 = backup_list[index]
+            metadata = metadata_list[index]
+            extents, holes = extents_list[index]
             index = index - 1
-            metadata = self._read_metadata(backup1)
-            restore_func(backup1, volume_id, metadata, volume_file)
+            self._restore_holes(volume_file, holes)
+            restore_func(backup1, volume_id, metadata, volume_file, extents)
 
             volume_meta = metadata.get('volume_meta', None)
             try:
@@ -692,6 +1225,23 @@ class ChunkedBackupDriver(driver.BackupDriver):
         LOG.debug('restore %(backup_id)s to %(volume_id)s finished.',
                   {'backup_id': backup_id, 'volume_id': volume_id})
 
+    def _delete_dedup_references(self, backup, metadata_filename):
+        """Release the deduplicated objects referenced by a backup.
+
+        The metadata object is deleted before the references are dropped so
+        that a retried delete can never release the same reference twice.
+        """
+        container = backup['container']
+        try:
+            metadata = self._read_metadata(backup)
+        except Exception:
+            LOG.warning(_LW('Unable to read metadata of backup %s, '
+                            'deduplicated objects will not be released.'),
+                        backup['id'])
+            metadata = {}
+        self.delete_object(container, metadata_filename)
+        self._release_dedup_chunks(container, metadata.get('objects', []))
+
     def delete(self, backup):
         """Delete the given backup."""
         container = backup['container']
@@ -709,6 +1259,11 @@ class ChunkedBackupDriver(driver.BackupDriver):
                 LOG.warning(_LW('swift error while listing objects, continuing'
                                 ' with delete.'))
 
+            metadata_filename = self._metadata_filename(backup)
+            if metadata_filename in object_names:
+                self._delete_dedup_references(backup, metadata_filename)
+                object_names.remove(metadata_filename)
+
             for object_name in object_names:
                 self.delete_object(container, object_name)
                 LOG.debug('deleted object: %(object_name)s'
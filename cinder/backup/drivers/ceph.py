@@ -49,6 +49,7 @@ import subprocess
 import time
 
 import eventlet
+from eventlet import tpool
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import excutils
@@ -88,12 +89,28 @@ service_opts = [
                help='RBD stripe count to use when creating a backup image.'),
     cfg.BoolOpt('restore_discard_excess_bytes', default=True,
                 help='If True, always discard excess bytes when restoring '
-                     'volumes i.e. pad with zeroes.')
+                     'volumes i.e. pad with zeroes.'),
+    cfg.IntOpt('backup_ceph_connection_pool_size', default=4,
+               help='Maximum number of idle connections to the Ceph '
+                    'cluster kept open to be reused by the next backup '
+                    'operations. 0 disables the reuse of connections.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(service_opts)
 
+# Connections to the backup cluster.  They are shared by all the driver
+# instances, since one is created for each backup operation.
+_connection_pool = None
+
+
+def _get_connection_pool():
+    global _connection_pool
+    if _connection_pool is None:
+        _connection_pool = rbd_driver.RADOSConnectionPool(
+            CONF.backup_ceph_connection_pool_size)
+    return _connection_pool
+
 
 class VolumeMetadataBackup(object):
 
@@ -232,25 +249,32 @@ class CephBackupDriver(driver.BackupDriver):
 
         return (old_format, features)
 
-    def _connect_to_rados(self, pool=None):
-        """Establish connection to the backup Ceph cluster."""
-        client = self.rados.Rados(rados_id=self._ceph_backup_user,
-                                  conffile=self._ceph_backup_conf)
+    def _connect_to_cluster(self):
+        # The calls of the client wait on the cluster, they are run in
+        # native threads.
+        client = tpool.Proxy(self.rados.Rados(
+            rados_id=self._ceph_backup_user,
+            conffile=self._ceph_backup_conf))
         try:
             client.connect()
-            pool_to_open = utils.convert_str(pool or self._ceph_backup_pool)
-            ioctx = client.open_ioctx(pool_to_open)
-            return client, ioctx
         except self.rados.Error:
             # shutdown cannot raise an exception
             client.shutdown()
             raise
+        return client
+
+    def _connect_to_rados(self, pool=None):
+        """Establish connection to the backup Ceph cluster.
+
+        Connections released before are reused.
+        """
+        pool_to_open = utils.convert_str(pool or self._ceph_backup_pool)
+        return _get_connection_pool().get(self._connect_to_cluster,
+                                          pool_to_open)
 
-    def _disconnect_from_rados(self, client, ioctx):
-        """Terminate connection with the backup Ceph cluster."""
-        # closing an ioctx cannot raise an exception
-        ioctx.close()
-        client.shutdown()
+    def _disconnect_from_rados(self, client, ioctx, discard=False):
+        """Release a connection with the backup Ceph cluster."""
+        _get_connection_pool().put(client, ioctx, discard=discard)
 
     def _get_backup_base_name(self, volume_id, backup_id=None,
                               diff_format=False):
@@ -18,7 +18,13 @@
 
 """Implementation of paginate query."""
 
+import base64
+import binascii
+import datetime
+
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
+import six
 from six.moves import range
 import sqlalchemy
 
@@ -28,10 +34,71 @@ from cinder.i18n import _, _LW
 
 LOG = logging.getLogger(__name__)
 
+# Prefix of the opaque markers built by encode_marker, it tells them apart
+# from the ids used as markers otherwise.
+MARKER_PREFIX = 'k1.'
+_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_marker(item, sort_keys):
+    """Returns an opaque marker pointing right after the given item.
+
+    The marker holds the values of the sort keys of the item, so the next
+    page can be retrieved with decode_marker and paginate_query without
+    reading the item again.
+
+    :param item: the last item of the current page
+    :param sort_keys: the sort keys of the current page
+    """
+    values = []
+    for key in sort_keys:
+        value = item[key]
+        if isinstance(value, datetime.datetime):
+            value = {'datetime': value.strftime(_DATETIME_FORMAT)}
+        values.append(value)
+    data = jsonutils.dumps({'keys': list(sort_keys), 'values': values})
+    # The padding is dropped, so the marker can go in a URL as it is
+    token = base64.urlsafe_b64encode(data.encode('utf-8')).rstrip(b'=')
+    return MARKER_PREFIX + token.decode('ascii')
+
+
+def decode_marker(marker, sort_keys):
+    """Returns the sort key values held by an opaque marker.
+
+    :param marker: the marker given by the client
+    :param sort_keys: the sort keys of the requested page
+    :returns: list of values, or None if the marker was not built by
+              encode_marker
+    :raises InvalidInput: if the marker is malformed or was built for other
+                          sort keys
+    """
+    if (not isinstance(marker, six.string_types) or
+            not marker.startswith(MARKER_PREFIX)):
+        return None
+
+    try:
+        token = str(marker[len(MARKER_PREFIX):])
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = jsonutils.loads(data.decode('utf-8'))
+        keys = data['keys']
+        values = []
+        for value in data['values']:
+            if isinstance(value, dict):
+                value = datetime.datetime.strptime(value['datetime'],
+                                                   _DATETIME_FORMAT)
+            values.append(value)
+    except (binascii.Error, TypeError, ValueError, KeyError):
+        raise exception.InvalidInput(reason=_('Invalid marker'))
+
+    if keys != list(sort_keys) or len(values) != len(keys):
+        msg = _('Marker does not match the requested sort keys')
+        raise exception.InvalidInput(reason=msg)
+    return values
+
 
 # copied from glance/db/sqlalchemy/api.py
 def paginate_query(query, model, limit, sort_keys, marker=None,
-                   sort_dir=None, sort_dirs=None):
+                   sort_dir=None, sort_dirs=None, marker_values=None):
     """Returns a query with sorting / pagination criteria added.
 
     Pagination works by requiring a unique sort_key, specified by sort_keys.
@@ -47,7 +114,13 @@ def paginate_query(query, model, limit, sort_keys, marker=None,
 
     Typically, the id of the last row is used as the client-facing pagination
     marker, then the actual marker object must be fetched from the db and
-    passed in to us as marker.
+    passed in to us as marker.  Clients holding an opaque marker from
+    encode_marker save that lookup, its values are passed in as
+    marker_values instead.
+
+    The first sort key is also bounded by its marker value on its own, which
+    the database can resolve as a range scan of an index starting with that
+    key rather than evaluating the OR-chain above against every row.
 
     :param query: the query object to which we should add paging/sorting
     :param model: the ORM model class
@@ -57,6 +130,8 @@ def paginate_query(query, model, limit, sort_keys, marker=None,
                     results after this value.
     :param sort_dir: direction in which results should be sorted (asc, desc)
     :param sort_dirs: per-column array of sort_dirs, corresponding to sort_keys
+    :param marker_values: values of the sort keys of the last item of the
+                          previous page, used instead of marker
 
     :rtype: sqlalchemy.orm.query.Query
     :return: The query with sorting/pagination added.
@@ -99,6 +174,9 @@ def paginate_query(query, model, limit, sort_keys, marker=None,
             v = getattr(marker, sort_key)
             marker_values.append(v)
 
+    if marker_values is not None:
+        assert(len(marker_values) == len(sort_keys))
+
         # Build up an array of sort criteria as in the docstring
         criteria_list = []
         for i in range(0, len(sort_keys)):
@@ -122,6 +200,14 @@ def paginate_query(query, model, limit, sort_keys, marker=None,
         f = sqlalchemy.sql.or_(*criteria_list)
         query = query.filter(f)
 
+        # Redundant with the criteria above, but usable for an index range
+        if marker_values[0] is not None:
+            model_attr = getattr(model, sort_keys[0])
+            if sort_dirs[0] == 'desc':
+                query = query.filter(model_attr <= marker_values[0])
+            else:
+                query = query.filter(model_attr >= marker_values[0])
+
     if limit is not None:
         query = query.limit(limit)
 
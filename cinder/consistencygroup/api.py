@@ -678,7 +678,8 @@ class API(base.Base):
         rv = self.db.cgsnapshot_get(context, cgsnapshot_id)
         return dict(rv)
 
-    def get_all_cgsnapshots(self, context, search_opts=None):
+    def get_all_cgsnapshots(self, context, search_opts=None, marker=None,
+                            limit=None, sort_keys=None, sort_dirs=None):
         check_policy(context, 'get_all_cgsnapshots')
 
         search_opts = search_opts or {}
@@ -686,9 +687,12 @@ class API(base.Base):
         if (context.is_admin and 'all_tenants' in search_opts):
             # Need to remove all_tenants to pass the filtering below.
             del search_opts['all_tenants']
-            cgsnapshots = self.db.cgsnapshot_get_all(context, search_opts)
+            cgsnapshots = self.db.cgsnapshot_get_all(context, search_opts,
+                                                     marker, limit,
+                                                     sort_keys, sort_dirs)
         else:
             cgsnapshots = self.db.cgsnapshot_get_all_by_project(
-                context.elevated(), context.project_id, search_opts)
+                context.elevated(), context.project_id, search_opts, marker,
+                limit, sort_keys, sort_dirs)
 
         return cgsnapshots
@@ -180,6 +180,11 @@ def volume_data_get_for_host(context, host, count_only=False):
                                          count_only)
 
 
+def volume_count_get_for_hosts(context, hosts):
+    """Get {host: volume_count} for the given hosts with a single query."""
+    return IMPL.volume_count_get_for_hosts(context, hosts)
+
+
 def volume_data_get_for_project(context, project_id):
     """Get (volume_count, gigabytes) for project."""
     return IMPL.volume_data_get_for_project(context, project_id)
@@ -206,10 +211,11 @@ def volume_get(context, volume_id):
 
 
 def volume_get_all(context, marker, limit, sort_keys=None, sort_dirs=None,
-                   filters=None):
+                   filters=None, joined_load=True):
     """Get all volumes."""
     return IMPL.volume_get_all(context, marker, limit, sort_keys=sort_keys,
-                               sort_dirs=sort_dirs, filters=filters)
+                               sort_dirs=sort_dirs, filters=filters,
+                               joined_load=joined_load)
 
 
 def volume_get_all_by_host(context, host, filters=None):
@@ -223,12 +229,14 @@ def volume_get_all_by_group(context, group_id, filters=None):
 
 
 def volume_get_all_by_project(context, project_id, marker, limit,
-                              sort_keys=None, sort_dirs=None, filters=None):
+                              sort_keys=None, sort_dirs=None, filters=None,
+                              joined_load=True):
     """Get all volumes belonging to a project."""
     return IMPL.volume_get_all_by_project(context, project_id, marker, limit,
                                           sort_keys=sort_keys,
                                           sort_dirs=sort_dirs,
-                                          filters=filters)
+                                          filters=filters,
+                                          joined_load=joined_load)
 
 
 def volume_get_iscsi_target_num(context, volume_id):
@@ -289,14 +297,22 @@ def snapshot_get(context, snapshot_id):
     return IMPL.snapshot_get(context, snapshot_id)
 
 
-def snapshot_get_all(context, filters=None):
+def snapshot_get_all(context, filters=None, marker=None, limit=None,
+                     sort_keys=None, sort_dirs=None):
     """Get all snapshots."""
-    return IMPL.snapshot_get_all(context, filters)
+    return IMPL.snapshot_get_all(context, filters, marker=marker,
+                                 limit=limit, sort_keys=sort_keys,
+                                 sort_dirs=sort_dirs)
 
 
-def snapshot_get_all_by_project(context, project_id, filters=None):
+def snapshot_get_all_by_project(context, project_id, filters=None,
+                                marker=None, limit=None, sort_keys=None,
+                                sort_dirs=None):
     """Get all snapshots belonging to a project."""
-    return IMPL.snapshot_get_all_by_project(context, project_id, filters)
+    return IMPL.snapshot_get_all_by_project(context, project_id, filters,
+                                            marker=marker, limit=limit,
+                                            sort_keys=sort_keys,
+                                            sort_dirs=sort_dirs)
 
 
 def snapshot_get_by_host(context, host, filters=None):
@@ -433,6 +449,16 @@ def volume_type_get_all(context, inactive=False, filters=None):
     return IMPL.volume_type_get_all(context, inactive, filters)
 
 
+def volume_type_version_get(context):
+    """Get a version stamp of all volume types.
+
+    The stamp is made of the ids and names of the volume types, so it
+    changes whenever a volume type is created, renamed or deleted, and data
+    derived from them can be cached until then.
+    """
+    return IMPL.volume_type_version_get(context)
+
+
 def volume_type_get(context, id, inactive=False, expected_fields=None):
     """Get volume type by id.
 
@@ -652,6 +678,12 @@ def volume_glance_metadata_get_all(context):
     return IMPL.volume_glance_metadata_get_all(context)
 
 
+def volume_glance_metadata_get_all_by_volume_ids(context, volume_ids):
+    """Return the glance metadata for the given volumes."""
+    return IMPL.volume_glance_metadata_get_all_by_volume_ids(context,
+                                                             volume_ids)
+
+
 def volume_glance_metadata_get(context, volume_id):
     """Return the glance metadata for a volume."""
     return IMPL.volume_glance_metadata_get(context, volume_id)
@@ -829,9 +861,12 @@ def backup_get(context, backup_id):
     return IMPL.backup_get(context, backup_id)
 
 
-def backup_get_all(context, filters=None):
+def backup_get_all(context, filters=None, marker=None, limit=None,
+                   sort_keys=None, sort_dirs=None):
     """Get all backups."""
-    return IMPL.backup_get_all(context, filters=filters)
+    return IMPL.backup_get_all(context, filters=filters, marker=marker,
+                               limit=limit, sort_keys=sort_keys,
+                               sort_dirs=sort_dirs)
 
 
 def backup_get_all_by_host(context, host):
@@ -844,10 +879,13 @@ def backup_create(context, values):
     return IMPL.backup_create(context, values)
 
 
-def backup_get_all_by_project(context, project_id, filters=None):
+def backup_get_all_by_project(context, project_id, filters=None, marker=None,
+                              limit=None, sort_keys=None, sort_dirs=None):
     """Get all backups belonging to a project."""
     return IMPL.backup_get_all_by_project(context, project_id,
-                                          filters=filters)
+                                          filters=filters, marker=marker,
+                                          limit=limit, sort_keys=sort_keys,
+                                          sort_dirs=sort_dirs)
 
 
 def backup_get_all_by_volume(context, volume_id, filters=None):
@@ -869,6 +907,33 @@ def backup_destroy(context, backup_id):
     return IMPL.backup_destroy(context, backup_id)
 
 
+def backup_dedup_chunk_create(context, values):
+    """Create a deduplicated backup chunk holding a single reference."""
+    return IMPL.backup_dedup_chunk_create(context, values)
+
+
+def backup_dedup_chunk_update(context, chunk_id, values):
+    """Set the given properties on a deduplicated backup chunk."""
+    return IMPL.backup_dedup_chunk_update(context, chunk_id, values)
+
+
+def backup_dedup_chunk_reference(context, container, sha256):
+    """Add a reference to an available chunk with the given content.
+
+    Returns the referenced chunk, or None if there is no such chunk.
+    """
+    return IMPL.backup_dedup_chunk_reference(context, container, sha256)
+
+
+def backup_dedup_chunk_release(context, chunk_id):
+    """Drop a reference to a deduplicated backup chunk.
+
+    Returns True if it was the last reference.  The chunk is then removed
+    and the caller is responsible for deleting its object.
+    """
+    return IMPL.backup_dedup_chunk_release(context, chunk_id)
+
+
 ###################
 
 
@@ -946,9 +1011,12 @@ def cgsnapshot_get(context, cgsnapshot_id):
     return IMPL.cgsnapshot_get(context, cgsnapshot_id)
 
 
-def cgsnapshot_get_all(context, filters=None):
+def cgsnapshot_get_all(context, filters=None, marker=None, limit=None,
+                       sort_keys=None, sort_dirs=None):
     """Get all cgsnapshots."""
-    return IMPL.cgsnapshot_get_all(context, filters)
+    return IMPL.cgsnapshot_get_all(context, filters, marker=marker,
+                                   limit=limit, sort_keys=sort_keys,
+                                   sort_dirs=sort_dirs)
 
 
 def cgsnapshot_create(context, values):
@@ -961,9 +1029,14 @@ def cgsnapshot_get_all_by_group(context, group_id, filters=None):
     return IMPL.cgsnapshot_get_all_by_group(context, group_id, filters)
 
 
-def cgsnapshot_get_all_by_project(context, project_id, filters=None):
+def cgsnapshot_get_all_by_project(context, project_id, filters=None,
+                                  marker=None, limit=None, sort_keys=None,
+                                  sort_dirs=None):
     """Get all cgsnapshots belonging to a project."""
-    return IMPL.cgsnapshot_get_all_by_project(context, project_id, filters)
+    return IMPL.cgsnapshot_get_all_by_project(context, project_id, filters,
+                                              marker=marker, limit=limit,
+                                              sort_keys=sort_keys,
+                                              sort_dirs=sort_dirs)
 
 
 def cgsnapshot_update(context, cgsnapshot_id, values):
@@ -1000,3 +1073,37 @@ def driver_initiator_data_update(context, initiator, namespace, updates):
 def driver_initiator_data_get(context, initiator, namespace):
     """Query for an DriverPrivateData that has the specified key"""
     return IMPL.driver_initiator_data_get(context, initiator, namespace)
+
+
+###################
+
+
+def image_volume_cache_create(context, host, image_id, image_checksum,
+                              volume_id, size):
+    """Create an image volume cache entry."""
+    return IMPL.image_volume_cache_create(context, host, image_id,
+                                          image_checksum, volume_id, size)
+
+
+def image_volume_cache_delete(context, volume_id):
+    """Delete the image volume cache entry of a volume, if it has one."""
+    return IMPL.image_volume_cache_delete(context, volume_id)
+
+
+def image_volume_cache_update_last_used(context, entry_id):
+    """Mark an image volume cache entry as just used."""
+    return IMPL.image_volume_cache_update_last_used(context, entry_id)
+
+
+def image_volume_cache_get_by_volume_id(context, volume_id):
+    """Get the image volume cache entry of a volume, or None."""
+    return IMPL.image_volume_cache_get_by_volume_id(context, volume_id)
+
+
+def image_volume_cache_get_all_for_host(context, host, image_id=None):
+    """Get the image volume cache entries of a host and all its pools.
+
+    The entries are returned least recently used first.
+    """
+    return IMPL.image_volume_cache_get_all_for_host(context, host,
+                                                    image_id=image_id)
@@ -39,7 +39,7 @@ import six
 import sqlalchemy
 from sqlalchemy import MetaData
 from sqlalchemy import or_
-from sqlalchemy.orm import joinedload, joinedload_all
+from sqlalchemy.orm import joinedload, joinedload_all, noload
 from sqlalchemy.orm import RelationshipProperty
 from sqlalchemy.schema import Table
 from sqlalchemy.sql.expression import literal_column
@@ -1094,6 +1094,29 @@ def volume_data_get_for_host(context, host, count_only=False):
         return (result[0] or 0, result[1] or 0)
 
 
+@require_admin_context
+def volume_count_get_for_hosts(context, hosts):
+    # NOTE: one grouped query for all the hosts instead of a count per
+    # host.  Like in volume_data_get_for_host, the volumes of a pool also
+    # count for the hosts it belongs to.
+    rows = model_query(context,
+                       models.Volume.host,
+                       func.count(models.Volume.id),
+                       read_deleted="no").\
+        filter(models.Volume.host.isnot(None)).\
+        group_by(models.Volume.host).\
+        all()
+
+    counts = dict.fromkeys(hosts, 0)
+    for volume_host, count in rows:
+        parts = volume_host.split('#')
+        for i in range(1, len(parts) + 1):
+            host = '#'.join(parts[:i])
+            if host in counts:
+                counts[host] += count
+    return counts
+
+
 @require_admin_context
 def _volume_data_get_for_project(context, project_id, volume_type_id=None,
                                  session=None):
@@ -1252,7 +1275,23 @@ def volume_detached(context, volume_id, attachment_id):
 
 
 @require_context
-def _volume_get_query(context, session=None, project_only=False):
+def _volume_get_query(context, session=None, project_only=False,
+                      joined_load=True):
+    """Get the query to retrieve the volume.
+
+    :param joined_load: whether to load the volume's relationships, i.e.
+                        its metadata, type, attachments and consistency
+                        group, along with it.  Without, they are not loaded
+                        at all, for listings that only show volume columns.
+    """
+    if not joined_load:
+        return model_query(context, models.Volume, session=session,
+                           project_only=project_only).\
+            options(noload('volume_metadata')).\
+            options(noload('volume_admin_metadata')).\
+            options(noload('volume_type')).\
+            options(noload('volume_attachment')).\
+            options(noload('consistencygroup'))
     if is_admin_context(context):
         return model_query(context, models.Volume, session=session,
                            project_only=project_only).\
@@ -1339,7 +1378,7 @@ def volume_get(context, volume_id):
 
 @require_admin_context
 def volume_get_all(context, marker, limit, sort_keys=None, sort_dirs=None,
-                   filters=None):
+                   filters=None, joined_load=True):
     """Retrieves all volumes.
 
     If no sort parameters are specified then the returned volumes are sorted
@@ -1358,13 +1397,15 @@ def volume_get_all(context, marker, limit, sort_keys=None, sort_dirs=None,
                     or sets cause an 'IN' operation, while exact matching
                     is used for other values, see _process_volume_filters
                     function for more information
+    :param joined_load: whether to load the relationships of the volumes
     :returns: list of matching volumes
     """
     session = get_session()
     with session.begin():
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_keys, sort_dirs, filters)
+                                         sort_keys, sort_dirs, filters,
+                                         joined_load=joined_load)
         # No volumes would match, return empty list
         if query is None:
             return []
@@ -1429,7 +1470,8 @@ def volume_get_all_by_group(context, group_id, filters=None):
 
 @require_context
 def volume_get_all_by_project(context, project_id, marker, limit,
-                              sort_keys=None, sort_dirs=None, filters=None):
+                              sort_keys=None, sort_dirs=None, filters=None,
+                              joined_load=True):
     """Retrieves all volumes in a project.
 
     If no sort parameters are specified then the returned volumes are sorted
@@ -1449,6 +1491,7 @@ def volume_get_all_by_project(context, project_id, marker, limit,
                     or sets cause an 'IN' operation, while exact matching
                     is used for other values, see _process_volume_filters
                     function for more information
+    :param joined_load: whether to load the relationships of the volumes
     :returns: list of matching volumes
     """
     session = get_session()
@@ -1459,7 +1502,8 @@ def volume_get_all_by_project(context, project_id, marker, limit,
         filters['project_id'] = project_id
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_keys, sort_dirs, filters)
+                                         sort_keys, sort_dirs, filters,
+                                         joined_load=joined_load)
         # No volumes would match, return empty list
         if query is None:
             return []
@@ -1467,7 +1511,7 @@ def volume_get_all_by_project(context, project_id, marker, limit,
 
 
 def _generate_paginate_query(context, session, marker, limit, sort_keys,
-                             sort_dirs, filters):
+                             sort_dirs, filters, joined_load=True):
     """Generate the query to include the filters and the paginate options.
 
     Returns a query with sorting / pagination criteria added or None
@@ -1486,26 +1530,68 @@ def _generate_paginate_query(context, session, marker, limit, sort_keys,
                     or sets cause an 'IN' operation, while exact matching
                     is used for other values, see _process_volume_filters
                     function for more information
+    :param joined_load: whether to load the relationships of the volumes
     :returns: updated query or None
     """
-    sort_keys, sort_dirs = process_sort_params(sort_keys,
-                                               sort_dirs,
-                                               default_dir='desc')
-    query = _volume_get_query(context, session=session)
+    query = _volume_get_query(context, session=session,
+                              joined_load=joined_load)
 
     if filters:
         query = _process_volume_filters(query, filters)
         if query is None:
             return None
 
-    marker_volume = None
-    if marker is not None:
-        marker_volume = _volume_get(context, marker, session)
+    return _paginate_query(context, session, models.Volume, query, marker,
+                           limit, sort_keys, sort_dirs)
 
-    return sqlalchemyutils.paginate_query(query, models.Volume, limit,
+
+def _paginate_query(context, session, model, query, marker, limit, sort_keys,
+                    sort_dirs):
+    """Add sorting and pagination to a query of volumes, snapshots, etc.
+
+    The marker is either the id of the last item of the previous page, or
+    an opaque marker built by sqlalchemyutils.encode_marker from that item,
+    which saves reading it again.
+
+    :param context: context to query under
+    :param session: the session to use
+    :param model: the model queried: Volume, Snapshot, Backup or Cgsnapshot
+    :param query: the query to paginate
+    :param marker: the last item of the previous page; we returns the next
+                    results after this value.
+    :param limit: maximum number of items to return
+    :param sort_keys: list of attributes by which results should be sorted,
+                      paired with corresponding item in sort_dirs
+    :param sort_dirs: list of directions in which results should be sorted,
+                      paired with corresponding item in sort_keys
+    :returns: updated query
+    """
+    sort_keys, sort_dirs = process_sort_params(sort_keys,
+                                               sort_dirs,
+                                               default_dir='desc')
+
+    marker_item = None
+    marker_values = None
+    if marker is not None:
+        marker_values = sqlalchemyutils.decode_marker(marker, sort_keys)
+        if marker_values is None:
+            get_marker = {models.Volume: _volume_get,
+                          models.Snapshot: _snapshot_get,
+                          models.Backup: _backup_get,
+                          models.Cgsnapshot: _cgsnapshot_get}[model]
+            marker_item = get_marker(context, marker, session=session)
+
+    return sqlalchemyutils.paginate_query(query, model, limit,
                                           sort_keys,
-                                          marker=marker_volume,
-                                          sort_dirs=sort_dirs)
+                                          marker=marker_item,
+                                          sort_dirs=sort_dirs,
+                                          marker_values=marker_values)
+
+
+def _is_paginated(marker, limit, sort_keys, sort_dirs):
+    """Whether any of the pagination parameters of a listing were given."""
+    return (marker is not None or limit is not None or
+            bool(sort_keys) or bool(sort_dirs))
 
 
 def _process_volume_filters(query, filters):
@@ -2017,7 +2103,13 @@ def snapshot_get(context, snapshot_id):
 
 
 @require_admin_context
-def snapshot_get_all(context, filters=None):
+def snapshot_get_all(context, filters=None, marker=None, limit=None,
+                     sort_keys=None, sort_dirs=None):
+    """Retrieves all snapshots.
+
+    Sorting and pagination only apply when any of marker, limit, sort_keys
+    or sort_dirs is given, see _paginate_query for them.
+    """
     # Ensure that the filter value exists on the model
     if filters:
         for key in filters.keys():
@@ -2032,7 +2124,11 @@ def snapshot_get_all(context, filters=None):
     if filters:
         query = query.filter_by(**filters)
 
-    return query.options(joinedload('snapshot_metadata')).all()
+    query = query.options(joinedload('snapshot_metadata'))
+    if _is_paginated(marker, limit, sort_keys, sort_dirs):
+        query = _paginate_query(context, None, models.Snapshot, query,
+                                marker, limit, sort_keys, sort_dirs)
+    return query.all()
 
 
 @require_context
@@ -2067,15 +2163,21 @@ def snapshot_get_all_for_cgsnapshot(context, cgsnapshot_id):
 
 
 @require_context
-def snapshot_get_all_by_project(context, project_id, filters=None):
+def snapshot_get_all_by_project(context, project_id, filters=None,
+                                marker=None, limit=None, sort_keys=None,
+                                sort_dirs=None):
     authorize_project_context(context, project_id)
     query = model_query(context, models.Snapshot)
 
     if filters:
         query = query.filter_by(**filters)
 
-    return query.filter_by(project_id=project_id).\
-        options(joinedload('snapshot_metadata')).all()
+    query = query.filter_by(project_id=project_id).\
+        options(joinedload('snapshot_metadata'))
+    if _is_paginated(marker, limit, sort_keys, sort_dirs):
+        query = _paginate_query(context, None, models.Snapshot, query,
+                                marker, limit, sort_keys, sort_dirs)
+    return query.all()
 
 
 @require_context
@@ -2115,6 +2217,7 @@ def snapshot_get_active_by_window(context, begin, end=None, project_id=None):
         query = query.filter(models.Snapshot.created_at < end)
     if project_id:
         query = query.filter_by(project_id=project_id)
+    query = query.order_by(models.Snapshot.created_at, models.Snapshot.id)
 
     return query.all()
 
@@ -2318,7 +2421,10 @@ def volume_type_update(context, volume_type_id, values):
 
         volume_type_ref.update(values)
         volume_type_ref.save(session=session)
-        volume_type = volume_type_get(context, volume_type_id)
+        # Read within the transaction: another session could roll it back
+        # when it shares the connection, as with in-memory sqlite.
+        volume_type = _volume_type_get(context, volume_type_id,
+                                       session=session)
 
         return volume_type
 
@@ -2353,6 +2459,16 @@ def volume_type_get_all(context, inactive=False, filters=None):
     return result
 
 
+@require_admin_context
+def volume_type_version_get(context):
+    rows = model_query(context, models.VolumeTypes.id,
+                       models.VolumeTypes.name, read_deleted="no",
+                       base_model=models.VolumeTypes).\
+        order_by(models.VolumeTypes.id).\
+        all()
+    return tuple((row.id, row.name) for row in rows)
+
+
 def _volume_type_get_id_from_volume_type_query(context, id, session=None):
     return model_query(
         context, models.VolumeTypes.id, read_deleted="no",
@@ -2572,6 +2688,7 @@ def volume_get_active_by_window(context,
         query = query.filter(models.Volume.created_at < end)
     if project_id:
         query = query.filter_by(project_id=project_id)
+    query = query.order_by(models.Volume.created_at, models.Volume.id)
 
     return query.all()
 
@@ -3063,7 +3180,8 @@ def volume_encryption_metadata_get(context, volume_id, session=None):
 
 
 @require_context
-def _volume_glance_metadata_get_all(context, session=None):
+def _volume_glance_metadata_get_all(context, session=None,
+                                    volume_ids=None):
     query = model_query(context,
                         models.VolumeGlanceMetadata,
                         session=session)
@@ -3071,6 +3189,11 @@ def _volume_glance_metadata_get_all(context, session=None):
         query = query.filter(
             models.Volume.id == models.VolumeGlanceMetadata.volume_id,
             models.Volume.project_id == context.project_id)
+    if volume_ids is not None:
+        if not volume_ids:
+            return []
+        query = query.filter(
+            models.VolumeGlanceMetadata.volume_id.in_(volume_ids))
     return query.all()
 
 
@@ -3081,6 +3204,13 @@ def volume_glance_metadata_get_all(context):
     return _volume_glance_metadata_get_all(context)
 
 
+@require_context
+def volume_glance_metadata_get_all_by_volume_ids(context, volume_ids):
+    """Return the Glance metadata for the given volumes."""
+
+    return _volume_glance_metadata_get_all(context, volume_ids=volume_ids)
+
+
 @require_context
 @require_volume_exists
 def _volume_glance_metadata_get(context, volume_id, session=None):
@@ -3278,7 +3408,12 @@ def volume_glance_metadata_delete_by_snapshot(context, snapshot_id):
 
 @require_context
 def backup_get(context, backup_id):
-    result = model_query(context, models.Backup, project_only=True).\
+    return _backup_get(context, backup_id)
+
+
+def _backup_get(context, backup_id, session=None):
+    result = model_query(context, models.Backup, session=session,
+                         project_only=True).\
         filter_by(id=backup_id).\
         first()
 
@@ -3288,20 +3423,26 @@ def backup_get(context, backup_id):
     return result
 
 
-def _backup_get_all(context, filters=None):
+def _backup_get_all(context, filters=None, marker=None, limit=None,
+                    sort_keys=None, sort_dirs=None):
     session = get_session()
     with session.begin():
         # Generate the query
-        query = model_query(context, models.Backup)
+        query = model_query(context, models.Backup, session=session)
         if filters:
             query = query.filter_by(**filters)
 
+        if _is_paginated(marker, limit, sort_keys, sort_dirs):
+            query = _paginate_query(context, session, models.Backup, query,
+                                    marker, limit, sort_keys, sort_dirs)
         return query.all()
 
 
 @require_admin_context
-def backup_get_all(context, filters=None):
-    return _backup_get_all(context, filters)
+def backup_get_all(context, filters=None, marker=None, limit=None,
+                   sort_keys=None, sort_dirs=None):
+    return _backup_get_all(context, filters, marker=marker, limit=limit,
+                           sort_keys=sort_keys, sort_dirs=sort_dirs)
 
 
 @require_admin_context
@@ -3310,7 +3451,8 @@ def backup_get_all_by_host(context, host):
 
 
 @require_context
-def backup_get_all_by_project(context, project_id, filters=None):
+def backup_get_all_by_project(context, project_id, filters=None, marker=None,
+                              limit=None, sort_keys=None, sort_dirs=None):
 
     authorize_project_context(context, project_id)
     if not filters:
@@ -3320,7 +3462,8 @@ def backup_get_all_by_project(context, project_id, filters=None):
 
     filters['project_id'] = project_id
 
-    return _backup_get_all(context, filters)
+    return _backup_get_all(context, filters, marker=marker, limit=limit,
+                           sort_keys=sort_keys, sort_dirs=sort_dirs)
 
 
 @require_context
@@ -3377,6 +3520,64 @@ def backup_destroy(context, backup_id):
                 'updated_at': literal_column('updated_at')})
 
 
+@require_context
+def backup_dedup_chunk_create(context, values):
+    chunk = models.BackupDedupChunk()
+    chunk.update(values)
+
+    session = get_session()
+    with session.begin():
+        chunk.save(session)
+        return chunk
+
+
+@require_context
+def backup_dedup_chunk_update(context, chunk_id, values):
+    session = get_session()
+    with session.begin():
+        session.query(models.BackupDedupChunk).\
+            filter_by(id=chunk_id).\
+            update(values)
+
+
+@require_context
+def backup_dedup_chunk_reference(context, container, sha256):
+    session = get_session()
+    with session.begin():
+        chunks = session.query(models.BackupDedupChunk).\
+            filter_by(container=container).\
+            filter_by(sha256=sha256).\
+            filter_by(status='available').\
+            filter(models.BackupDedupChunk.refcount > 0).\
+            all()
+        for chunk in chunks:
+            # Only take a reference if the chunk still has one, a chunk
+            # whose last reference is being dropped must not be reused.
+            count = session.query(models.BackupDedupChunk).\
+                filter_by(id=chunk.id).\
+                filter(models.BackupDedupChunk.refcount > 0).\
+                update({'refcount': models.BackupDedupChunk.refcount + 1},
+                       synchronize_session=False)
+            if count:
+                return chunk
+    return None
+
+
+@require_context
+def backup_dedup_chunk_release(context, chunk_id):
+    session = get_session()
+    with session.begin():
+        session.query(models.BackupDedupChunk).\
+            filter_by(id=chunk_id).\
+            update({'refcount': models.BackupDedupChunk.refcount - 1},
+                   synchronize_session=False)
+        count = session.query(models.BackupDedupChunk).\
+            filter_by(id=chunk_id).\
+            filter(models.BackupDedupChunk.refcount <= 0).\
+            delete(synchronize_session=False)
+    return bool(count)
+
+
 ###############################
 
 
@@ -3646,7 +3847,9 @@ def is_valid_model_filters(model, filters):
     return True
 
 
-def _cgsnapshot_get_all(context, project_id=None, group_id=None, filters=None):
+def _cgsnapshot_get_all(context, project_id=None, group_id=None, filters=None,
+                        marker=None, limit=None, sort_keys=None,
+                        sort_dirs=None):
     query = model_query(context, models.Cgsnapshot)
 
     if filters:
@@ -3655,17 +3858,23 @@ def _cgsnapshot_get_all(context, project_id=None, group_id=None, filters=None):
         query = query.filter_by(**filters)
 
     if project_id:
-        query.filter_by(project_id=project_id)
+        query = query.filter_by(project_id=project_id)
 
     if group_id:
-        query.filter_by(consistencygroup_id=group_id)
+        query = query.filter_by(consistencygroup_id=group_id)
 
+    if _is_paginated(marker, limit, sort_keys, sort_dirs):
+        query = _paginate_query(context, None, models.Cgsnapshot, query,
+                                marker, limit, sort_keys, sort_dirs)
     return query.all()
 
 
 @require_admin_context
-def cgsnapshot_get_all(context, filters=None):
-    return _cgsnapshot_get_all(context, filters=filters)
+def cgsnapshot_get_all(context, filters=None, marker=None, limit=None,
+                       sort_keys=None, sort_dirs=None):
+    return _cgsnapshot_get_all(context, filters=filters, marker=marker,
+                               limit=limit, sort_keys=sort_keys,
+                               sort_dirs=sort_dirs)
 
 
 @require_admin_context
@@ -3674,9 +3883,13 @@ def cgsnapshot_get_all_by_group(context, group_id, filters=None):
 
 
 @require_context
-def cgsnapshot_get_all_by_project(context, project_id, filters=None):
+def cgsnapshot_get_all_by_project(context, project_id, filters=None,
+                                  marker=None, limit=None, sort_keys=None,
+                                  sort_dirs=None):
     authorize_project_context(context, project_id)
-    return _cgsnapshot_get_all(context, project_id=project_id, filters=filters)
+    return _cgsnapshot_get_all(context, project_id=project_id, filters=filters,
+                               marker=marker, limit=limit,
+                               sort_keys=sort_keys, sort_dirs=sort_dirs)
 
 
 @require_context
@@ -3814,3 +4027,63 @@ def driver_initiator_data_get(context, initiator, namespace):
             filter_by(initiator=initiator).\
             filter_by(namespace=namespace).\
             all()
+
+
+###############################
+
+
+@require_context
+def image_volume_cache_create(context, host, image_id, image_checksum,
+                              volume_id, size):
+    session = get_session()
+    with session.begin():
+        cache_entry = models.ImageVolumeCacheEntry()
+        cache_entry.host = host
+        cache_entry.image_id = image_id
+        cache_entry.image_checksum = image_checksum
+        cache_entry.volume_id = volume_id
+        cache_entry.size = size
+        cache_entry.last_used = timeutils.utcnow()
+        session.add(cache_entry)
+        return cache_entry
+
+
+@require_context
+def image_volume_cache_delete(context, volume_id):
+    session = get_session()
+    with session.begin():
+        session.query(models.ImageVolumeCacheEntry).\
+            filter_by(volume_id=volume_id).\
+            delete()
+
+
+@require_context
+def image_volume_cache_update_last_used(context, entry_id):
+    session = get_session()
+    with session.begin():
+        session.query(models.ImageVolumeCacheEntry).\
+            filter_by(id=entry_id).\
+            update({'last_used': timeutils.utcnow()})
+
+
+@require_context
+def image_volume_cache_get_by_volume_id(context, volume_id):
+    session = get_session()
+    with session.begin():
+        return session.query(models.ImageVolumeCacheEntry).\
+            filter_by(volume_id=volume_id).\
+            first()
+
+
+@require_context
+def image_volume_cache_get_all_for_host(context, host, image_id=None):
+    host_attr = models.ImageVolumeCacheEntry.host
+    conditions = [host_attr == host, host_attr.op('LIKE')(host + '#%')]
+    session = get_session()
+    with session.begin():
+        query = session.query(models.ImageVolumeCacheEntry).\
+            filter(or_(*conditions))
+        if image_id is not None:
+            query = query.filter_by(image_id=image_id)
+        return query.order_by(models.ImageVolumeCacheEntry.last_used,
+                              models.ImageVolumeCacheEntry.id).all()
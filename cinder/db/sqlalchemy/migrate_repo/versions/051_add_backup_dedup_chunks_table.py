@@ -0,0 +1,48 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Column, DateTime, Index, Integer
+from sqlalchemy import MetaData, String, Table
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    # New table
+    dedup_chunks = Table(
+        'backup_dedup_chunks', meta,
+        Column('created_at', DateTime(timezone=False)),
+        Column('updated_at', DateTime(timezone=False)),
+        Column('id', Integer, primary_key=True, nullable=False),
+        Column('container', String(length=255), nullable=False),
+        Column('sha256', String(length=64), nullable=False),
+        Column('object_name', String(length=255), nullable=False),
+        Column('compression', String(length=255)),
+        Column('length', Integer),
+        Column('refcount', Integer, nullable=False),
+        Column('status', String(length=255)),
+        Index('backup_dedup_chunks_container_sha256_idx',
+              'container', 'sha256'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8'
+    )
+
+    dedup_chunks.create()
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    table_name = 'backup_dedup_chunks'
+    dedup_chunks = Table(table_name, meta, autoload=True)
+    dedup_chunks.drop()
@@ -0,0 +1,54 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+
+# Based on the project listings, sorted by the default sort keys, from:
+# cinder/db/sqlalchemy/api.py
+INDEXES = (
+    ('volumes', 'volumes_project_created_idx'),
+    ('snapshots', 'snapshots_project_created_idx'),
+    ('backups', 'backups_project_created_idx'),
+    ('cgsnapshots', 'cgsnapshots_project_created_idx'),
+)
+COLUMNS = ('project_id', 'deleted', 'created_at', 'id')
+
+
+def _get_index(table, name):
+    for idx in table.indexes:
+        if idx.name == name:
+            return idx
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for table_name, index_name in INDEXES:
+        table = Table(table_name, meta, autoload=True)
+        if _get_index(table, index_name):
+            continue
+
+        index = Index(index_name, *[table.c[column] for column in COLUMNS])
+        index.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for table_name, index_name in INDEXES:
+        table = Table(table_name, meta, autoload=True)
+        index = _get_index(table, index_name)
+        if index:
+            index.drop(migrate_engine)
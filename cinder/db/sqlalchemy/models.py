@@ -90,6 +90,11 @@ class ConsistencyGroup(BASE, CinderBase):
 class Cgsnapshot(BASE, CinderBase):
     """Represents a cgsnapshot."""
     __tablename__ = 'cgsnapshots'
+    __table_args__ = (
+        schema.Index('cgsnapshots_project_created_idx',
+                     'project_id', 'deleted', 'created_at', 'id'),
+        {'mysql_engine': 'InnoDB'}
+    )
     id = Column(String(36), primary_key=True)
 
     consistencygroup_id = Column(String(36))
@@ -110,6 +115,11 @@ class Cgsnapshot(BASE, CinderBase):
 class Volume(BASE, CinderBase):
     """Represents a block storage device that can be attached to a vm."""
     __tablename__ = 'volumes'
+    __table_args__ = (
+        schema.Index('volumes_project_created_idx',
+                     'project_id', 'deleted', 'created_at', 'id'),
+        {'mysql_engine': 'InnoDB'}
+    )
     id = Column(String(36), primary_key=True)
     _name_id = Column(String(36))  # Don't access/modify this directly!
 
@@ -432,6 +442,11 @@ class Reservation(BASE, CinderBase):
 class Snapshot(BASE, CinderBase):
     """Represents a snapshot of volume."""
     __tablename__ = 'snapshots'
+    __table_args__ = (
+        schema.Index('snapshots_project_created_idx',
+                     'project_id', 'deleted', 'created_at', 'id'),
+        {'mysql_engine': 'InnoDB'}
+    )
     id = Column(String(36), primary_key=True)
 
     @property
@@ -506,6 +521,11 @@ class IscsiTarget(BASE, CinderBase):
 class Backup(BASE, CinderBase):
     """Represents a backup of a volume to Swift."""
     __tablename__ = 'backups'
+    __table_args__ = (
+        schema.Index('backups_project_created_idx',
+                     'project_id', 'deleted', 'created_at', 'id'),
+        {'mysql_engine': 'InnoDB'}
+    )
     id = Column(String(36), primary_key=True)
 
     @property
@@ -590,6 +610,42 @@ class DriverInitiatorData(BASE, models.TimestampMixin, models.ModelBase):
     value = Column(String(255))
 
 
+class BackupDedupChunk(BASE, models.TimestampMixin, models.ModelBase):
+    """Represents a backup object shared by backups with the same data."""
+    __tablename__ = 'backup_dedup_chunks'
+    __table_args__ = (
+        schema.Index('backup_dedup_chunks_container_sha256_idx',
+                     'container', 'sha256'),
+        {'mysql_engine': 'InnoDB'}
+    )
+    id = Column(Integer, primary_key=True, nullable=False)
+    container = Column(String(255), nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    object_name = Column(String(255), nullable=False)
+    compression = Column(String(255))
+    length = Column(Integer)
+    refcount = Column(Integer, nullable=False, default=1)
+    status = Column(String(255))
+
+
+class ImageVolumeCacheEntry(BASE, models.ModelBase):
+    """Represents a volume holding an image, cloned to create volumes."""
+    __tablename__ = 'image_volume_cache_entries'
+    __table_args__ = (
+        schema.Index('image_volume_cache_entries_host_image_id_idx',
+                     'host', 'image_id'),
+        {'mysql_engine': 'InnoDB'}
+    )
+    id = Column(Integer, primary_key=True, nullable=False)
+    host = Column(String(255), nullable=False)
+    image_id = Column(String(36), nullable=False)
+    image_checksum = Column(String(32))
+    volume_id = Column(String(36), nullable=False)
+    size = Column(Integer, nullable=False)
+    last_used = Column(DateTime, nullable=False,
+                       default=lambda: timeutils.utcnow())
+
+
 def register_models():
     """Register Models and create metadata.
 
@@ -0,0 +1,142 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Per-backend cache of volumes holding Glance images.
+
+Volumes created from an image the cache holds on their host are cloned
+from the cached volume instead of downloading and converting the image
+again.  The cached volumes belong to the Cinder internal tenant.
+"""
+
+from oslo_log import log as logging
+
+from cinder import exception
+from cinder.i18n import _LW
+from cinder.volume import utils as volume_utils
+
+
+LOG = logging.getLogger(__name__)
+
+
+class ImageVolumeCache(object):
+    """LRU cache of image volumes, limited in size and count per backend.
+
+    A limit of 0 means unlimited.
+    """
+
+    def __init__(self, db, volume_rpcapi, max_cache_size_gb=0,
+                 max_cache_size_count=0):
+        self.db = db
+        self.volume_rpcapi = volume_rpcapi
+        self.max_cache_size_gb = max_cache_size_gb
+        self.max_cache_size_count = max_cache_size_count
+
+    def get_entry(self, context, volume_ref, image_id, image_meta):
+        """Returns an entry the volume can be cloned from, or None.
+
+        The entry must be on the host of the volume, hold the current data
+        of the image and be no larger than the volume.  Entries holding
+        other data for the image are evicted.
+        """
+        checksum = image_meta.get('checksum')
+        host = volume_ref['host']
+        backend = volume_utils.extract_host(host)
+        found = None
+        entries = self.db.image_volume_cache_get_all_for_host(
+            context, backend, image_id=image_id)
+        for entry in entries:
+            if entry['image_checksum'] != checksum:
+                LOG.debug("Evicting outdated image volume %(volume_id)s of "
+                          "image %(image_id)s from the cache.",
+                          {'volume_id': entry['volume_id'],
+                           'image_id': image_id})
+                self.evict(context, entry)
+            elif (entry['host'] == host and
+                    entry['size'] <= volume_ref['size']):
+                # Entries are least recently used first, keep the last one
+                found = entry
+
+        if found is None:
+            LOG.debug("Image volume cache miss for image %(image_id)s on "
+                      "%(host)s.", {'image_id': image_id, 'host': host})
+            return None
+
+        LOG.debug("Image volume cache hit for image %(image_id)s on "
+                  "%(host)s: %(volume_id)s.",
+                  {'image_id': image_id, 'host': host,
+                   'volume_id': found['volume_id']})
+        self.db.image_volume_cache_update_last_used(context, found['id'])
+        return found
+
+    def create_cache_entry(self, context, volume_ref, image_id, image_meta):
+        """Adds an available volume holding the image to the cache."""
+        LOG.debug("Adding image volume %(volume_id)s of image %(image_id)s "
+                  "to the cache.",
+                  {'volume_id': volume_ref['id'], 'image_id': image_id})
+        return self.db.image_volume_cache_create(context,
+                                                 volume_ref['host'],
+                                                 image_id,
+                                                 image_meta.get('checksum'),
+                                                 volume_ref['id'],
+                                                 volume_ref['size'])
+
+    def ensure_space(self, context, space_required, host):
+        """Makes room in the cache for a new entry.
+
+        The least recently used entries of the backend of the host are
+        evicted until the new entry fits in the limits.
+
+        :returns: False if the entry can't fit, even in an empty cache.
+        """
+        if self.max_cache_size_gb and space_required > self.max_cache_size_gb:
+            return False
+        if not self.max_cache_size_gb and not self.max_cache_size_count:
+            return True
+
+        entries = self.db.image_volume_cache_get_all_for_host(
+            context, volume_utils.extract_host(host))
+        current_size = sum(entry['size'] for entry in entries)
+        current_count = len(entries)
+        for entry in entries:
+            if not self._over_limits(current_size + space_required,
+                                     current_count + 1):
+                break
+            self.evict(context, entry)
+            current_size -= entry['size']
+            current_count -= 1
+        return True
+
+    def _over_limits(self, size, count):
+        return ((self.max_cache_size_gb and
+                 size > self.max_cache_size_gb) or
+                (self.max_cache_size_count and
+                 count > self.max_cache_size_count))
+
+    def evict(self, context, cache_entry):
+        """Removes an entry from the cache and deletes its volume."""
+        LOG.debug("Evicting image volume %(volume_id)s of image "
+                  "%(image_id)s from the cache.",
+                  {'volume_id': cache_entry['volume_id'],
+                   'image_id': cache_entry['image_id']})
+        self.db.image_volume_cache_delete(context, cache_entry['volume_id'])
+        try:
+            volume = self.db.volume_update(context,
+                                           cache_entry['volume_id'],
+                                           {'status': 'deleting'})
+        except exception.VolumeNotFound:
+            LOG.warning(_LW("Image volume %s of the cache no longer "
+                            "exists."), cache_entry['volume_id'])
+            return
+        self.volume_rpcapi.delete_volume(context, volume)
@@ -0,0 +1,135 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""On-disk cache of the image files fetched and converted on a volume node."""
+
+import contextlib
+import errno
+import os
+import tempfile
+import time
+
+from oslo_log import log as logging
+from oslo_utils import uuidutils
+
+from cinder.openstack.common import fileutils
+from cinder import utils
+
+
+LOG = logging.getLogger(__name__)
+
+# Files being created or used have this prefix, they are not cache entries
+TEMP_PREFIX = 'tmp'
+
+# Age in seconds of the temporary files left behind by a dead process
+STALE_TEMP_FILE_AGE = 24 * 60 * 60
+
+
+class ImageFileCache(object):
+    """LRU cache of image files, limited in the space they use.
+
+    A missing file is created once for all the requests for it, the others
+    waiting for it to be created, including the requests of the other
+    processes using the same directory.  Each request gets its own hard
+    link to the file, so that evicting the file doesn't remove it from
+    under a request using it.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def _temp_path(self):
+        return os.path.join(self.cache_dir,
+                            TEMP_PREFIX + uuidutils.generate_uuid())
+
+    def _create_temp_file(self):
+        # Created by us, so that the file stays ours when it is written by
+        # a command run as root.
+        fd, path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.cache_dir)
+        os.close(fd)
+        return path
+
+    @contextlib.contextmanager
+    def get(self, name, create):
+        """Yields the path of a link to a cached file.
+
+        :param name: the file name of the cache entry
+        :param create: called with the path of an empty file to fill with
+                       the contents of the entry, when it is missing
+        """
+        fileutils.ensure_tree(self.cache_dir)
+        path = os.path.join(self.cache_dir, name)
+        link = self._temp_path()
+
+        @utils.synchronized('image-file-cache-%s' % name, external=True)
+        def _link_entry():
+            try:
+                os.link(path, link)
+            except OSError as ex:
+                if ex.errno != errno.ENOENT:
+                    raise
+            else:
+                LOG.debug("Image file cache hit for %s.", name)
+                os.utime(path, None)
+                return False
+
+            LOG.debug("Image file cache miss for %s.", name)
+            tmp = self._create_temp_file()
+            try:
+                create(tmp)
+                os.link(tmp, link)
+                os.rename(tmp, path)
+            finally:
+                fileutils.delete_if_exists(tmp)
+            return True
+
+        created = _link_entry()
+        try:
+            if created:
+                self._evict()
+            yield link
+        finally:
+            fileutils.delete_if_exists(link)
+
+    @utils.synchronized('image-file-cache-evict', external=True)
+    def _evict(self):
+        """Removes the least recently used files over the size limit."""
+        now = time.time()
+        entries = []
+        used = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed since listed
+                continue
+            if name.startswith(TEMP_PREFIX):
+                if now - stat.st_mtime > STALE_TEMP_FILE_AGE:
+                    LOG.debug("Removing stale image file %s.", path)
+                    fileutils.delete_if_exists(path)
+                continue
+            # Converted images are sparse, count the space they really use
+            size = getattr(stat, 'st_blocks', 0) * 512 or stat.st_size
+            entries.append((stat.st_mtime, size, path))
+            used += size
+
+        for _mtime, size, path in sorted(entries):
+            if used <= self.max_size:
+                break
+            LOG.debug("Evicting %s from the image file cache.", path)
+            fileutils.delete_if_exists(path)
+            used -= size
@@ -25,6 +25,7 @@ we should look at maybe pushing this up to Oslo
 
 
 import contextlib
+import hashlib
 import math
 import os
 import re
@@ -38,6 +39,7 @@ from oslo_utils import units
 
 from cinder import exception
 from cinder.i18n import _, _LI, _LW
+from cinder.image import file_cache
 from cinder.openstack.common import fileutils
 from cinder.openstack.common import imageutils
 from cinder import utils
@@ -49,11 +51,40 @@ LOG = logging.getLogger(__name__)
 image_helper_opt = [cfg.StrOpt('image_conversion_dir',
                                default='$state_path/conversion',
                                help='Directory used for temporary storage '
-                                    'during image conversion'), ]
+                                    'during image conversion'),
+                    cfg.IntOpt('image_conversion_cache_size_gb',
+                               default=0,
+                               help='Space in GB used to keep the images '
+                                    'fetched and converted to a volume '
+                                    'format in image_conversion_dir, so '
+                                    'that they are reused by the next '
+                                    'volumes created from the same images. '
+                                    'The least recently used images are '
+                                    'removed first. 0 disables the '
+                                    'cache.'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(image_helper_opt)
 
+# Magic numbers qemu-img detects image formats with, and their offsets.  A
+# raw image starting with one of them would be taken for an image of that
+# format once written to a volume.
+IMAGE_FORMAT_MAGICS = (
+    ('qcow', 0, b'QFI\xfb'),
+    ('qed', 0, b'QED\x00'),
+    ('vmdk', 0, b'KDMV'),
+    ('vmdk', 0, b'COWD'),
+    ('vmdk', 0, b'# Disk DescriptorFile'),
+    ('vhdx', 0, b'vhdxfile'),
+    ('vpc', 0, b'conectix'),
+    ('vdi', 0x40, b'\x7f\x10\xda\xbe'),
+    ('parallels', 0, b'WithoutFreeSpace'),
+    ('parallels', 0, b'WithouFreSpacExt'),
+    ('bochs', 0, b'Bochs Virtual HD Image'),
+    ('cloop', 0, b'#!/bin/sh\n#V2.0 Format\n'),
+)
+IMAGE_HEADER_SIZE = 512
+
 
 def qemu_img_info(path, run_as_root=True):
     """Return a object containing the parsed output from qemu-img info."""
@@ -233,6 +264,12 @@ def fetch_to_volume_format(context, image_service,
     qemu_img = True
     image_meta = image_service.show(context, image_id)
 
+    if (volume_format == 'raw' and _is_streamable_image(image_meta) and
+            os.path.exists(dest)):
+        _stream_raw_image(context, image_service, image_id, image_meta,
+                          dest, blocksize, size, run_as_root)
+        return
+
     # NOTE(avishay): I'm not crazy about creating temp files which may be
     # large and cause disk full errors which would confuse users.
     # Unfortunately it seems that you can't pipe to 'qemu-img convert' because
@@ -264,6 +301,14 @@ def fetch_to_volume_format(context, image_service,
                              "can be used if qemu-img is not installed."),
                     image_id=image_id)
 
+        checksum = image_meta.get('checksum') if image_meta else None
+        if qemu_img and checksum and _conversion_cache_enabled():
+            _fetch_to_volume_format_cached(context, image_service, image_id,
+                                           checksum, dest, volume_format,
+                                           user_id, project_id, size,
+                                           run_as_root)
+            return
+
         fetch(context, image_service, image_id, tmp, user_id, project_id)
 
         if is_xenserver_image(context, image_service, image_id):
@@ -281,50 +326,193 @@ def fetch_to_volume_format(context, image_service,
             return
 
         data = qemu_img_info(tmp, run_as_root=run_as_root)
-        virt_size = data.virtual_size / units.Gi
-
-        # NOTE(xqueralt): If the image virtual size doesn't fit in the
-        # requested volume there is no point on resizing it because it will
-        # generate an unusable image.
-        if size is not None and virt_size > size:
-            params = {'image_size': virt_size, 'volume_size': size}
-            reason = _("Size is %(image_size)dGB and doesn't fit in a "
-                       "volume of size %(volume_size)dGB.") % params
-            raise exception.ImageUnacceptable(image_id=image_id, reason=reason)
-
+        _check_image_info(image_id, data, size)
         fmt = data.file_format
-        if fmt is None:
-            raise exception.ImageUnacceptable(
-                reason=_("'qemu-img info' parsing failed."),
-                image_id=image_id)
-
-        backing_file = data.backing_file
-        if backing_file is not None:
-            raise exception.ImageUnacceptable(
-                image_id=image_id,
-                reason=_("fmt=%(fmt)s backed by:%(backing_file)s")
-                % {'fmt': fmt, 'backing_file': backing_file, })
 
         # NOTE(jdg): I'm using qemu-img convert to write
-        # to the volume regardless if it *needs* conversion or not
-        # TODO(avishay): We can speed this up by checking if the image is raw
-        # and if so, writing directly to the device. However, we need to keep
-        # check via 'qemu-img info' that what we copied was in fact a raw
-        # image and not a different format with a backing file, which may be
-        # malicious.
+        # to the volume regardless if it *needs* conversion or not.
+        # Raw images with a checksum are streamed to the volume instead.
         LOG.debug("%s was %s, converting to %s ", image_id, fmt, volume_format)
         convert_image(tmp, dest, volume_format,
                       run_as_root=run_as_root)
 
-        data = qemu_img_info(dest, run_as_root=run_as_root)
+        _check_converted_image(image_id, dest, volume_format, run_as_root)
+
+
+def _check_image_info(image_id, data, size=None):
+    """Checks the 'qemu-img info' of an image fits in a safe volume."""
+    virt_size = data.virtual_size / units.Gi
+
+    # NOTE(xqueralt): If the image virtual size doesn't fit in the
+    # requested volume there is no point on resizing it because it will
+    # generate an unusable image.
+    if size is not None and virt_size > size:
+        params = {'image_size': virt_size, 'volume_size': size}
+        reason = _("Size is %(image_size)dGB and doesn't fit in a "
+                   "volume of size %(volume_size)dGB.") % params
+        raise exception.ImageUnacceptable(image_id=image_id, reason=reason)
+
+    fmt = data.file_format
+    if fmt is None:
+        raise exception.ImageUnacceptable(
+            reason=_("'qemu-img info' parsing failed."),
+            image_id=image_id)
+
+    backing_file = data.backing_file
+    if backing_file is not None:
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("fmt=%(fmt)s backed by:%(backing_file)s")
+            % {'fmt': fmt, 'backing_file': backing_file, })
+
 
-        if not _validate_file_format(data, volume_format):
+def _check_converted_image(image_id, path, volume_format, run_as_root):
+    data = qemu_img_info(path, run_as_root=run_as_root)
+
+    if not _validate_file_format(data, volume_format):
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("Converted to %(vol_format)s, but format is "
+                     "now %(file_format)s") % {'vol_format': volume_format,
+                                               'file_format': data.
+                                               file_format})
+
+
+def _is_streamable_image(image_meta):
+    return bool(image_meta and image_meta.get('disk_format') == 'raw' and
+                image_meta.get('checksum') and image_meta.get('size'))
+
+
+def _check_raw_image_header(image_id, header):
+    """Checks the start of a raw image isn't the header of another format."""
+    for fmt, offset, magic in IMAGE_FORMAT_MAGICS:
+        if header[offset:offset + len(magic)] == magic:
             raise exception.ImageUnacceptable(
                 image_id=image_id,
-                reason=_("Converted to %(vol_format)s, but format is "
-                         "now %(file_format)s") % {'vol_format': volume_format,
-                                                   'file_format': data.
-                                                   file_format})
+                reason=_("Image is raw but its data is %s.") % fmt)
+
+
+def _check_raw_image_chunks(image_id, image_meta, chunks):
+    """Yields the chunks of a raw image, checking its data on the way.
+
+    No chunk is yielded before the header of the image was checked, and
+    the size and checksum are checked once all of them were.
+    """
+    image_size = image_meta['size']
+    checksum = hashlib.md5()
+    header = b''
+    pending = []
+    received = 0
+    for chunk in chunks:
+        received += len(chunk)
+        if received > image_size:
+            break
+        checksum.update(chunk)
+        if pending is None:
+            yield chunk
+            continue
+        pending.append(chunk)
+        header += chunk[:IMAGE_HEADER_SIZE - len(header)]
+        if len(header) == IMAGE_HEADER_SIZE:
+            _check_raw_image_header(image_id, header)
+            for pending_chunk in pending:
+                yield pending_chunk
+            pending = None
+
+    if pending:
+        # The whole image is smaller than a header
+        _check_raw_image_header(image_id, header)
+        for pending_chunk in pending:
+            yield pending_chunk
+    if (received != image_size or
+            checksum.hexdigest() != image_meta['checksum']):
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("Image data doesn't match the size and checksum of "
+                     "the image."))
+
+
+def _stream_raw_image(context, image_service, image_id, image_meta, dest,
+                      blocksize, size, run_as_root):
+    """Writes a raw image to the volume while it is downloaded.
+
+    There is nothing to convert in a raw image, so it is not staged in
+    image_conversion_dir.  Its data is checked as 'qemu-img info' checks a
+    fetched image, and must match the size and checksum of the image.
+    """
+    image_size = image_meta['size']
+    if size is not None and image_size > size * units.Gi:
+        params = {'image_size': math.ceil(float(image_size) / units.Gi),
+                  'volume_size': size}
+        reason = _("Size is %(image_size)dGB and doesn't fit in a "
+                   "volume of size %(volume_size)dGB.") % params
+        raise exception.ImageUnacceptable(image_id=image_id, reason=reason)
+
+    LOG.debug("Streaming raw image %(image_id)s to volume %(dest)s - "
+              "size: %(size)s", {'image_id': image_id, 'dest': dest,
+                                 'size': image_size})
+    start_time = timeutils.utcnow()
+    chown = utils.temporary_chown if run_as_root else _no_chown
+    with chown(dest):
+        chunks = image_service.download(context, image_id)
+        volume_utils.copy_stream(
+            _check_raw_image_chunks(image_id, image_meta, chunks), dest,
+            blocksize, sync=True)
+    duration = max(1, timeutils.delta_seconds(start_time,
+                                              timeutils.utcnow()))
+    LOG.info(_LI("Image download %(sz).2f MB at %(mbps).2f MB/s"),
+             {'sz': float(image_size) / units.Mi,
+              'mbps': float(image_size) / units.Mi / duration})
+
+
+@contextlib.contextmanager
+def _no_chown(path):
+    yield
+
+
+def _conversion_cache_enabled():
+    return bool(CONF.image_conversion_dir and
+                CONF.image_conversion_cache_size_gb > 0)
+
+
+def _fetch_to_volume_format_cached(context, image_service, image_id,
+                                   checksum, dest, volume_format, user_id,
+                                   project_id, size, run_as_root):
+    """Copies an image converted to the volume format from the cache.
+
+    The image is fetched and converted into the cache first if needed.
+    """
+    cache = file_cache.ImageFileCache(
+        os.path.join(CONF.image_conversion_dir, 'cache'),
+        CONF.image_conversion_cache_size_gb * units.Gi)
+
+    def _fetch_and_convert(path):
+        with temporary_file() as tmp:
+            fetch(context, image_service, image_id, tmp, user_id,
+                  project_id)
+
+            if is_xenserver_image(context, image_service, image_id):
+                replace_xenserver_image_with_coalesced_vhd(tmp)
+
+            data = qemu_img_info(tmp, run_as_root=run_as_root)
+            _check_image_info(image_id, data)
+            LOG.debug("%s was %s, converting to %s for the image cache",
+                      image_id, data.file_format, volume_format)
+            convert_image(tmp, path, volume_format, run_as_root=run_as_root)
+            _check_converted_image(image_id, path, volume_format,
+                                   run_as_root)
+
+    name = '%s-%s.%s' % (image_id, checksum, volume_format)
+    with cache.get(name, _fetch_and_convert) as cached:
+        data = qemu_img_info(cached, run_as_root=run_as_root)
+        _check_image_info(image_id, data, size)
+        LOG.debug("Copying %(image_id)s converted to %(format)s from the "
+                  "image cache to %(dest)s.",
+                  {'image_id': image_id, 'format': volume_format,
+                   'dest': dest})
+        convert_image(cached, dest, volume_format, run_as_root=run_as_root)
+
+    _check_converted_image(image_id, dest, volume_format, run_as_root)
 
 
 def _validate_file_format(image_data, expected_format):
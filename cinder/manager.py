@@ -51,6 +51,7 @@ This module provides Manager, a base class for managers.
 
 """
 
+import copy
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -58,11 +59,23 @@ import oslo_messaging as messaging
 from oslo_service import periodic_task
 
 from cinder.db import base
+from cinder.scheduler import capability_delta
 from cinder.scheduler import rpcapi as scheduler_rpcapi
 from cinder import version
 
 
+manager_opts = [
+    cfg.IntOpt('capabilities_full_report_interval',
+               default=10,
+               help='Services report their capabilities to the schedulers '
+                    'as deltas from the previous report, with a full '
+                    'report every this many reports so that schedulers '
+                    'that missed a delta catch up. 0 always sends full '
+                    'reports.'),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(manager_opts)
 LOG = logging.getLogger(__name__)
 
 
@@ -134,10 +147,17 @@ class SchedulerDependentManager(Manager):
     manager.Manager directly. Updates are only sent after
     update_service_capabilities is called with non-None values.
 
+    Updates carry a sequence number and, between full reports, only the
+    capabilities changed since the previous update.  Unchanged
+    capabilities are not sent again.
+
     """
 
     def __init__(self, host=None, db_driver=None, service_name='undefined'):
         self.last_capabilities = None
+        self._published_capabilities = None
+        self._capabilities_seq = 0
+        self._reports_since_full = 0
         self.service_name = service_name
         self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
         super(SchedulerDependentManager, self).__init__(host, db_driver)
@@ -147,12 +167,38 @@ class SchedulerDependentManager(Manager):
         self.last_capabilities = capabilities
 
     @periodic_task.periodic_task
-    def _publish_service_capabilities(self, context):
+    def _publish_service_capabilities(self, context, full=False):
         """Pass data back to the scheduler at a periodic interval."""
-        if self.last_capabilities:
-            LOG.debug('Notifying Schedulers of capabilities ...')
-            self.scheduler_rpcapi.update_service_capabilities(
-                context,
-                self.service_name,
-                self.host,
-                self.last_capabilities)
+        if not self.last_capabilities:
+            return
+
+        self._reports_since_full += 1
+        interval = CONF.capabilities_full_report_interval
+        delta = None
+        if (not full and interval > 0 and
+                self._reports_since_full < interval and
+                self._published_capabilities is not None):
+            delta = capability_delta.make_delta(self._published_capabilities,
+                                                self.last_capabilities)
+            if not delta:
+                LOG.debug('Capabilities unchanged, not notifying '
+                          'Schedulers.')
+                return
+        else:
+            self._reports_since_full = 0
+
+        self._capabilities_seq += 1
+        LOG.debug('Notifying Schedulers of capabilities (seq %(seq)s, '
+                  '%(kind)s) ...',
+                  {'seq': self._capabilities_seq,
+                   'kind': 'full' if delta is None else 'delta'})
+        self.scheduler_rpcapi.update_service_capabilities(
+            context,
+            self.service_name,
+            self.host,
+            self.last_capabilities,
+            seq=self._capabilities_seq,
+            delta=delta)
+        # Drivers may update their stats in place, keep our own copy to
+        # compute the next delta from.
+        self._published_capabilities = copy.deepcopy(self.last_capabilities)
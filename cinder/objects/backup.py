@@ -114,18 +114,24 @@ class Backup(base.CinderPersistentObject, base.CinderObject,
 
 @base.CinderObjectRegistry.register
 class BackupList(base.ObjectListBase, base.CinderObject):
-    VERSION = '1.0'
+    # Version 1.0: Initial version
+    # Version 1.1: Add marker, limit, sort_keys and sort_dirs to get_all and
+    #              get_all_by_project
+    VERSION = '1.1'
 
     fields = {
         'objects': fields.ListOfObjectsField('Backup'),
     }
     child_versions = {
-        '1.0': '1.0'
+        '1.0': '1.0',
+        '1.1': '1.0',
     }
 
     @base.remotable_classmethod
-    def get_all(cls, context, filters=None):
-        backups = db.backup_get_all(context, filters)
+    def get_all(cls, context, filters=None, marker=None, limit=None,
+                sort_keys=None, sort_dirs=None):
+        backups = db.backup_get_all(context, filters, marker, limit,
+                                    sort_keys, sort_dirs)
         return base.obj_make_list(context, cls(context), objects.Backup,
                                   backups)
 
@@ -136,8 +142,12 @@ class BackupList(base.ObjectListBase, base.CinderObject):
                                   backups)
 
     @base.remotable_classmethod
-    def get_all_by_project(cls, context, project_id, filters=None):
-        backups = db.backup_get_all_by_project(context, project_id, filters)
+    def get_all_by_project(cls, context, project_id, filters=None,
+                           marker=None, limit=None, sort_keys=None,
+                           sort_dirs=None):
+        backups = db.backup_get_all_by_project(context, project_id, filters,
+                                               marker, limit, sort_keys,
+                                               sort_dirs)
         return base.obj_make_list(context, cls(context), objects.Backup,
                                   backups)
 
@@ -203,18 +203,24 @@ class Snapshot(base.CinderPersistentObject, base.CinderObject,
 
 @base.CinderObjectRegistry.register
 class SnapshotList(base.ObjectListBase, base.CinderObject):
-    VERSION = '1.0'
+    # Version 1.0: Initial version
+    # Version 1.1: Add marker, limit, sort_keys and sort_dirs to get_all and
+    #              get_all_by_project
+    VERSION = '1.1'
 
     fields = {
         'objects': fields.ListOfObjectsField('Snapshot'),
     }
     child_versions = {
-        '1.0': '1.0'
+        '1.0': '1.0',
+        '1.1': '1.0',
     }
 
     @base.remotable_classmethod
-    def get_all(cls, context, search_opts):
-        snapshots = db.snapshot_get_all(context, search_opts)
+    def get_all(cls, context, search_opts, marker=None, limit=None,
+                sort_keys=None, sort_dirs=None):
+        snapshots = db.snapshot_get_all(context, search_opts, marker, limit,
+                                        sort_keys, sort_dirs)
         return base.obj_make_list(context, cls(), objects.Snapshot,
                                   snapshots,
                                   expected_attrs=['metadata'])
@@ -226,9 +232,12 @@ class SnapshotList(base.ObjectListBase, base.CinderObject):
                                   snapshots, expected_attrs=['metadata'])
 
     @base.remotable_classmethod
-    def get_all_by_project(cls, context, project_id, search_opts):
+    def get_all_by_project(cls, context, project_id, search_opts,
+                           marker=None, limit=None, sort_keys=None,
+                           sort_dirs=None):
         snapshots = db.snapshot_get_all_by_project(context, project_id,
-                                                   search_opts)
+                                                   search_opts, marker, limit,
+                                                   sort_keys, sort_dirs)
         return base.obj_make_list(context, cls(context), objects.Snapshot,
                                   snapshots, expected_attrs=['metadata'])
 
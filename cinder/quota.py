@@ -903,9 +903,27 @@ class QuotaEngine(object):
 class VolumeTypeQuotaEngine(QuotaEngine):
     """Represent the set of all quotas."""
 
+    def __init__(self, quota_driver_class=None):
+        super(VolumeTypeQuotaEngine, self).__init__(quota_driver_class)
+        self._resources_cache = None
+
+    def clear_resources_cache(self):
+        """Make the next access to resources rebuild them."""
+        self._resources_cache = None
+
     @property
     def resources(self):
-        """Fetches all possible quota resources."""
+        """Fetches all possible quota resources.
+
+        The resources are cached until the volume types change.  That is
+        detected with a version stamp of the volume types in the database,
+        so changes made by other processes are picked up as well.
+        """
+        ctxt = context.get_admin_context()
+        version = db.volume_type_version_get(ctxt)
+        cache = self._resources_cache
+        if cache is not None and cache[0] == version:
+            return dict(cache[1])
 
         result = {}
         # Global quotas.
@@ -921,13 +939,15 @@ class VolumeTypeQuotaEngine(QuotaEngine):
             result[resource.name] = resource
 
         # Volume type quotas.
-        volume_types = db.volume_type_get_all(context.get_admin_context(),
-                                              False)
+        volume_types = db.volume_type_get_all(ctxt, False)
         for volume_type in volume_types.values():
             for part_name in ('volumes', 'gigabytes', 'snapshots'):
                 resource = VolumeTypeResource(part_name, volume_type)
                 result[resource.name] = resource
-        return result
+        # The version was read first, a change made in the meantime only
+        # causes another rebuild.
+        self._resources_cache = (version, result)
+        return dict(result)
 
     def register_resource(self, resource):
         raise NotImplementedError(_("Cannot register resource"))
@@ -0,0 +1,125 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Delta encoding of the capabilities reported by the volume services.
+
+A delta lists the capabilities set or changed since the previous report
+and the ones removed::
+
+    {'updated': {'free_capacity_gb': 12},
+     'removed': ['reserved_percentage'],
+     'pools': {'changed': {'pool1': {'updated': {...}, 'removed': [...]}},
+               'added': [{'pool_name': 'pool3', ...}],
+               'removed': ['pool2']}}
+
+Pools are matched by their pool_name, so that a backend reporting hundreds
+of pools only sends the pools whose stats changed.  Empty parts are left
+out, an empty delta means nothing changed.
+"""
+
+import copy
+
+import six
+
+
+def _get_pools_by_name(capabilities):
+    """Returns the pools keyed by pool_name, None if they can't be."""
+    pools = capabilities.get('pools')
+    if not isinstance(pools, list):
+        return None
+    pools_by_name = {}
+    for pool in pools:
+        if not isinstance(pool, dict) or 'pool_name' not in pool:
+            return None
+        pools_by_name[pool['pool_name']] = pool
+    if len(pools_by_name) != len(pools):
+        return None
+    return pools_by_name
+
+
+def _make_dict_delta(old, new, skip=()):
+    delta = {}
+    updated = {key: value for key, value in six.iteritems(new)
+               if key not in skip and (key not in old or old[key] != value)}
+    if updated:
+        delta['updated'] = updated
+    removed = [key for key in old if key not in skip and key not in new]
+    if removed:
+        delta['removed'] = removed
+    return delta
+
+
+def _apply_dict_delta(old, delta):
+    new = dict(old)
+    for key in delta.get('removed', []):
+        new.pop(key, None)
+    new.update(copy.deepcopy(delta.get('updated', {})))
+    return new
+
+
+def make_delta(old, new):
+    """Returns the delta turning the old capabilities into the new ones."""
+    old_pools = _get_pools_by_name(old)
+    new_pools = _get_pools_by_name(new)
+    if old_pools is None or new_pools is None:
+        return _make_dict_delta(old, new)
+
+    delta = _make_dict_delta(old, new, skip=('pools',))
+    pools_delta = {}
+    changed = {}
+    for name, pool in six.iteritems(new_pools):
+        if name in old_pools:
+            pool_delta = _make_dict_delta(old_pools[name], pool)
+            if pool_delta:
+                changed[name] = pool_delta
+    if changed:
+        pools_delta['changed'] = changed
+    added = [pool for pool in new['pools'] if pool['pool_name'] not in
+             old_pools]
+    if added:
+        pools_delta['added'] = added
+    removed = [name for name in old_pools if name not in new_pools]
+    if removed:
+        pools_delta['removed'] = removed
+    if pools_delta:
+        delta['pools'] = pools_delta
+    return delta
+
+
+def apply_delta(capabilities, delta):
+    """Returns new capabilities with the delta applied.
+
+    The given capabilities are not modified.  The pools keep their order,
+    the added ones going last.
+    """
+    pools_delta = delta.get('pools')
+    new = _apply_dict_delta(capabilities, delta)
+    if pools_delta is None:
+        return new
+
+    changed = pools_delta.get('changed', {})
+    removed = set(pools_delta.get('removed', []))
+    pools = []
+    for pool in capabilities.get('pools', []):
+        name = pool['pool_name']
+        if name in removed:
+            continue
+        if name in changed:
+            pool = _apply_dict_delta(pool, changed[name])
+        pools.append(pool)
+    pools.extend(copy.deepcopy(pools_delta.get('added', [])))
+    new['pools'] = pools
+    return new
@@ -0,0 +1,140 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Inverted indexes over the capabilities of the pools known to the scheduler.
+"""
+
+from oslo_utils import strutils
+import six
+
+from cinder.openstack.common.scheduler.filters import availability_zone_filter
+from cinder.openstack.common.scheduler.filters import capabilities_filter
+
+
+# The operators of extra_specs_ops, requirements using them are not exact
+# matches
+OPERATORS = frozenset(['=', '<in>', '<is>', '<or>', '==', '!=', '>=', '<=',
+                       's==', 's!=', 's<', 's<=', 's>', 's>='])
+
+
+class CapabilityIndex(object):
+    """Narrows down a list of pools with exact-match requirements.
+
+    Many requests are decided by extra specs like volume_backend_name or
+    '<is> True' for multiattach, or by the availability zone. The pools
+    matching each of these requirements are found in an index, built on
+    first use, and intersected before the filters run on what is left.
+
+    Only the requirements the AvailabilityZoneFilter and CapabilitiesFilter
+    would enforce are used, and only when these filters are run, so the
+    pools left out are exactly pools that would not pass them.
+    """
+
+    def __init__(self, pools):
+        self.pools = pools
+        self._indexes = {}
+
+    def _get_index(self, name, get_value):
+        """Returns the {value: set of positions of the pools} index."""
+        index = self._indexes.get(name)
+        if index is None:
+            index = {}
+            for position, pool in enumerate(self.pools):
+                value = get_value(pool)
+                if value is None:
+                    continue
+                try:
+                    index.setdefault(value, set()).add(position)
+                except TypeError:
+                    # Unhashable values never equal the requested strings
+                    continue
+            self._indexes[name] = index
+        return index
+
+    @staticmethod
+    def _get_capability_requirements(filter_properties):
+        """Yields (index name, get_value, value) for the extra specs."""
+        resource_type = filter_properties.get('resource_type') or {}
+        extra_specs = resource_type.get('extra_specs') or {}
+        for key, req in six.iteritems(extra_specs):
+            # Same scoping as the CapabilitiesFilter, limited to top level
+            # capabilities
+            scope = key.split(':')
+            if len(scope) > 1 and scope[0] != 'capabilities':
+                continue
+            elif scope[0] == 'capabilities':
+                del scope[0]
+            if len(scope) != 1 or not isinstance(req, six.string_types):
+                continue
+            capability = scope[0]
+
+            words = req.split()
+            if not words:
+                continue
+            if words[0] == '<is>':
+                if len(words) < 2:
+                    continue
+
+                def get_bool(pool, capability=capability):
+                    value = pool.capabilities.get(capability)
+                    if value is None:
+                        return None
+                    return strutils.bool_from_string(value)
+
+                yield ('<is>' + capability, get_bool,
+                       strutils.bool_from_string(words[1]))
+            elif words[0] in OPERATORS:
+                # Not an exact match
+                continue
+            else:
+                def get_value(pool, capability=capability):
+                    return pool.capabilities.get(capability)
+
+                yield ('==' + capability, get_value, req)
+
+    def select(self, filter_properties, filter_classes):
+        """Returns the pools that may pass the given filters.
+
+        The pools keep their order.  All of them are returned when none of
+        the requirements could be looked up in an index.
+        """
+        requirements = []
+        if availability_zone_filter.AvailabilityZoneFilter in filter_classes:
+            spec = filter_properties.get('request_spec') or {}
+            props = spec.get('resource_properties') or {}
+            availability_zone = props.get('availability_zone')
+            if availability_zone:
+                requirements.append(
+                    ('availability_zone',
+                     lambda pool: pool.service.get('availability_zone'),
+                     availability_zone))
+        if capabilities_filter.CapabilitiesFilter in filter_classes:
+            requirements.extend(
+                self._get_capability_requirements(filter_properties))
+
+        if not requirements:
+            return self.pools
+
+        positions = None
+        for name, get_value, value in requirements:
+            matching = self._get_index(name, get_value).get(value, set())
+            if positions is None:
+                positions = set(matching)
+            else:
+                positions &= matching
+            if not positions:
+                return []
+        return [self.pools[position] for position in sorted(positions)]
@@ -78,11 +78,14 @@ class Scheduler(object):
 
         return self.host_manager.has_all_capabilities()
 
-    def update_service_capabilities(self, service_name, host, capabilities):
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    seq=None, delta=None):
         """Process a capability update from a service node."""
         self.host_manager.update_service_capabilities(service_name,
                                                       host,
-                                                      capabilities)
+                                                      capabilities,
+                                                      seq=seq,
+                                                      delta=delta)
 
     def host_passes_filters(self, context, volume_id, host, filter_properties):
         """Check if the specified host passes the filters."""
@@ -101,6 +104,26 @@ class Scheduler(object):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_("Must implement schedule_create_volume"))
 
+    def schedule_create_volumes(self, context, request_spec_list,
+                                filter_properties_list):
+        """Schedules a batch of volumes.
+
+        Places the volumes one by one, drivers able to place them in a
+        single pass should override this.
+
+        :returns: A list of (request_spec, exception) for the volumes that
+                  could not be scheduled.
+        """
+        failures = []
+        for request_spec, filter_properties in zip(request_spec_list,
+                                                   filter_properties_list):
+            try:
+                self.schedule_create_volume(context, request_spec,
+                                            filter_properties or {})
+            except Exception as ex:
+                failures.append((request_spec, ex))
+        return failures
+
     def schedule_create_consistencygroup(self, context, group_id,
                                          request_spec_list,
                                          filter_properties_list):
@@ -112,3 +135,10 @@ class Scheduler(object):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_(
             "Must implement schedule_get_pools"))
+
+    def get_placement_stats(self, context):
+        """Returns the placement traces and latency histograms.
+
+        Drivers that do not record them report empty stats.
+        """
+        return {'histograms': {}, 'traces': []}
@@ -13,8 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import operator
 import re
+import threading
 
 import pyparsing
 import six
@@ -37,14 +39,17 @@ def _operatorOperands(tokenList):
 class EvalConstant(object):
     def __init__(self, toks):
         self.value = toks[0]
+        self.variable = None
+        if (isinstance(self.value, six.string_types) and
+                re.match("^[a-zA-Z_]+\.[a-zA-Z_]+$", self.value)):
+            self.variable = tuple(self.value.split('.'))
 
-    def eval(self):
+    def eval(self, variables):
         result = self.value
-        if (isinstance(result, six.string_types) and
-                re.match("^[a-zA-Z_]+\.[a-zA-Z_]+$", result)):
-            (which_dict, entry) = result.split('.')
+        if self.variable is not None:
+            (which_dict, entry) = self.variable
             try:
-                result = _vars[which_dict][entry]
+                result = variables[which_dict][entry]
             except KeyError as e:
                 raise exception.EvaluatorParseException(
                     _("KeyError: %s") % six.text_type(e))
@@ -73,21 +78,21 @@ class EvalSignOp(object):
     def __init__(self, toks):
         self.sign, self.value = toks[0]
 
-    def eval(self):
-        return self.operations[self.sign] * self.value.eval()
+    def eval(self, variables):
+        return self.operations[self.sign] * self.value.eval(variables)
 
 
 class EvalAddOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        sum = self.value[0].eval()
+    def eval(self, variables):
+        sum = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
             if op == '+':
-                sum += val.eval()
+                sum += val.eval(variables)
             elif op == '-':
-                sum -= val.eval()
+                sum -= val.eval(variables)
         return sum
 
 
@@ -95,14 +100,14 @@ class EvalMultOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        prod = self.value[0].eval()
+    def eval(self, variables):
+        prod = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
             try:
                 if op == '*':
-                    prod *= val.eval()
+                    prod *= val.eval(variables)
                 elif op == '/':
-                    prod /= float(val.eval())
+                    prod /= float(val.eval(variables))
             except ZeroDivisionError as e:
                 raise exception.EvaluatorParseException(
                     _("ZeroDivisionError: %s") % six.text_type(e))
@@ -113,10 +118,10 @@ class EvalPowerOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        prod = self.value[0].eval()
+    def eval(self, variables):
+        prod = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
-            prod = pow(prod, val.eval())
+            prod = pow(prod, val.eval(variables))
         return prod
 
 
@@ -124,8 +129,8 @@ class EvalNegateOp(object):
     def __init__(self, toks):
         self.negation, self.value = toks[0]
 
-    def eval(self):
-        return not self.value.eval()
+    def eval(self, variables):
+        return not self.value.eval(variables)
 
 
 class EvalComparisonOp(object):
@@ -142,11 +147,11 @@ class EvalComparisonOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        val1 = self.value[0].eval()
+    def eval(self, variables):
+        val1 = self.value[0].eval(variables)
         for op, val in _operatorOperands(self.value[1:]):
             fn = self.operations[op]
-            val2 = val.eval()
+            val2 = val.eval(variables)
             if not fn(val1, val2):
                 break
             val1 = val2
@@ -159,12 +164,12 @@ class EvalTernaryOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        condition = self.value[0].eval()
+    def eval(self, variables):
+        condition = self.value[0].eval(variables)
         if condition:
-            return self.value[2].eval()
+            return self.value[2].eval(variables)
         else:
-            return self.value[4].eval()
+            return self.value[4].eval(variables)
 
 
 class EvalFunction(object):
@@ -177,8 +182,8 @@ class EvalFunction(object):
     def __init__(self, toks):
         self.func, self.value = toks[0]
 
-    def eval(self):
-        args = self.value.eval()
+    def eval(self, variables):
+        args = self.value.eval(variables)
         if type(args) is list:
             return self.functions[self.func](*args)
         else:
@@ -189,9 +194,9 @@ class EvalCommaSeperator(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        val1 = self.value[0].eval()
-        val2 = self.value[2].eval()
+    def eval(self, variables):
+        val1 = self.value[0].eval(variables)
+        val2 = self.value[2].eval(variables)
         if type(val2) is list:
             val_list = []
             val_list.append(val1)
@@ -206,9 +211,9 @@ class EvalBoolAndOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        left = self.value[0].eval()
-        right = self.value[2].eval()
+    def eval(self, variables):
+        left = self.value[0].eval(variables)
+        right = self.value[2].eval(variables)
         return left and right
 
 
@@ -216,13 +221,19 @@ class EvalBoolOrOp(object):
     def __init__(self, toks):
         self.value = toks[0]
 
-    def eval(self):
-        left = self.value[0].eval()
-        right = self.value[2].eval()
+    def eval(self, variables):
+        left = self.value[0].eval(variables)
+        right = self.value[2].eval(variables)
         return left or right
 
+# Maximum number of distinct compiled expressions kept in memory.  Each
+# backend reports at most a couple of filter/goodness functions, so this
+# comfortably covers even large deployments.
+EXPRESSION_CACHE_SIZE = 256
+
 _parser = None
-_vars = {}
+_parser_lock = threading.Lock()
+_expression_cache = collections.OrderedDict()
 
 
 def _def_parser():
@@ -272,6 +283,37 @@ def _def_parser():
     return expr
 
 
+def compile_expression(expression):
+    """Compiles an expression into a reusable evaluation tree.
+
+    The returned object exposes ``eval(variables)``, where ``variables`` is
+    a mapping of dictionary names to dictionaries that are referenced from
+    the expression (e.g. ``stats.free_capacity_gb``).  Compiled expressions
+    are kept in a bounded LRU cache keyed by the expression text, so the
+    expression is only parsed the first time it is seen.
+    """
+    global _parser
+
+    with _parser_lock:
+        result = _expression_cache.pop(expression, None)
+        if result is None:
+            if _parser is None:
+                _parser = _def_parser()
+
+            try:
+                result = _parser.parseString(expression, parseAll=True)[0]
+            except pyparsing.ParseException as e:
+                raise exception.EvaluatorParseException(
+                    _("ParseException: %s") % six.text_type(e))
+
+            if len(_expression_cache) >= EXPRESSION_CACHE_SIZE:
+                _expression_cache.popitem(last=False)
+
+        _expression_cache[expression] = result
+
+    return result
+
+
 def evaluate(expression, **kwargs):
     """Evaluates an expression.
 
@@ -281,17 +323,4 @@ def evaluate(expression, **kwargs):
     Supports both integer and floating point values, and automatic
     promotion where necessary.
     """
-    global _parser
-    if _parser is None:
-        _parser = _def_parser()
-
-    global _vars
-    _vars = kwargs
-
-    try:
-        result = _parser.parseString(expression, parseAll=True)[0]
-    except pyparsing.ParseException as e:
-        raise exception.EvaluatorParseException(
-            _("ParseException: %s") % six.text_type(e))
-
-    return result.eval()
+    return compile_expression(expression).eval(kwargs)
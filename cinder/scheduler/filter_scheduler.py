@@ -27,6 +27,7 @@ from cinder import exception
 from cinder.i18n import _, _LE, _LW
 from cinder.scheduler import driver
 from cinder.scheduler import scheduler_options
+from cinder.scheduler import tracing
 from cinder.volume import utils
 
 CONF = cfg.CONF
@@ -40,6 +41,7 @@ class FilterScheduler(driver.Scheduler):
         self.cost_function_cache = None
         self.options = scheduler_options.SchedulerOptions()
         self.max_attempts = self._max_attempts()
+        self.tracer = tracing.PlacementTracer()
 
     def schedule(self, context, topic, method, *args, **kwargs):
         """Schedule contract that returns best-suited host for this request."""
@@ -81,8 +83,63 @@ class FilterScheduler(driver.Scheduler):
                                                    updated_group, host)
 
     def schedule_create_volume(self, context, request_spec, filter_properties):
+        updated_volume, host = self._place_volume(context, request_spec,
+                                                  filter_properties)
+
+        self.volume_rpcapi.create_volume(context, updated_volume, host,
+                                         request_spec, filter_properties,
+                                         allow_reschedule=True)
+
+    def schedule_create_volumes(self, context, request_spec_list,
+                                filter_properties_list):
+        """Places a batch of volumes in one pass over the host states.
+
+        The host states are fetched once and the capacity taken by each
+        placed volume is consumed from them before placing the next one.
+        The creates are sent to the volume hosts once all the volumes have
+        been placed. If sending one fails, it and the ones not sent yet are
+        returned as failures.
+        """
+        hosts = self.host_manager.get_all_host_states(context.elevated())
+
+        failures = []
+        placements = []
+        for request_spec, filter_properties in zip(request_spec_list,
+                                                   filter_properties_list):
+            if filter_properties is None:
+                filter_properties = {}
+            try:
+                updated_volume, host = self._place_volume(
+                    context, request_spec, filter_properties, hosts=hosts)
+            except Exception as ex:
+                failures.append((request_spec, ex))
+            else:
+                placements.append((updated_volume, host, request_spec,
+                                   filter_properties))
+
+        for i, (updated_volume, host, request_spec,
+                filter_properties) in enumerate(placements):
+            try:
+                self.volume_rpcapi.create_volume(context, updated_volume,
+                                                 host, request_spec,
+                                                 filter_properties,
+                                                 allow_reschedule=True)
+            except Exception as ex:
+                # The volumes already cast are being created, only the
+                # others have failed.
+                failures.extend((placement[2], ex)
+                                for placement in placements[i:])
+                break
+        return failures
+
+    def _place_volume(self, context, request_spec, filter_properties,
+                      hosts=None):
+        """Selects a host for a volume and records it in the database.
+
+        :returns: A tuple of the updated volume and the selected host.
+        """
         weighed_host = self._schedule(context, request_spec,
-                                      filter_properties)
+                                      filter_properties, hosts=hosts)
 
         if not weighed_host:
             raise exception.NoValidHost(reason=_("No weighed hosts available"))
@@ -96,10 +153,7 @@ class FilterScheduler(driver.Scheduler):
 
         # context is not serializable
         filter_properties.pop('context', None)
-
-        self.volume_rpcapi.create_volume(context, updated_volume, host,
-                                         request_spec, filter_properties,
-                                         allow_reschedule=True)
+        return updated_volume, host
 
     def host_passes_filters(self, context, host, request_spec,
                             filter_properties):
@@ -169,6 +223,9 @@ class FilterScheduler(driver.Scheduler):
         # TODO(zhiteng) Add filters support
         return self.host_manager.get_pools(context)
 
+    def get_placement_stats(self, context):
+        return self.tracer.get_stats()
+
     def _post_select_populate_filter_properties(self, filter_properties,
                                                 host_state):
         """Populate filter properties with additional information.
@@ -249,10 +306,12 @@ class FilterScheduler(driver.Scheduler):
                  'volume_id': volume_id})
 
     def _get_weighted_candidates(self, context, request_spec,
-                                 filter_properties=None):
+                                 filter_properties=None, hosts=None,
+                                 trace=None):
         """Return a list of hosts that meet required specs.
 
-        Returned list is ordered by their fitness.
+        Returned list is ordered by their fitness.  The hosts are taken from
+        the host manager unless already fetched by the caller.
         """
         elevated = context.elevated()
 
@@ -298,11 +357,13 @@ class FilterScheduler(driver.Scheduler):
 
         # Note: remember, we are using an iterator here. So only
         # traverse this list once.
-        hosts = self.host_manager.get_all_host_states(elevated)
+        if hosts is None:
+            hosts = self.host_manager.get_all_host_states(elevated)
 
         # Filter local hosts based on requirements ...
         hosts = self.host_manager.get_filtered_hosts(hosts,
-                                                     filter_properties)
+                                                     filter_properties,
+                                                     trace=trace)
         if not hosts:
             return []
 
@@ -310,7 +371,8 @@ class FilterScheduler(driver.Scheduler):
         # weighted_host = WeightedHost() ... the best
         # host for the job.
         weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                                                            filter_properties)
+                                                            filter_properties,
+                                                            trace=trace)
         return weighed_hosts
 
     def _get_weighted_candidates_group(self, context, request_spec_list,
@@ -402,15 +464,25 @@ class FilterScheduler(driver.Scheduler):
 
         return weighed_hosts
 
-    def _schedule(self, context, request_spec, filter_properties=None):
-        weighed_hosts = self._get_weighted_candidates(context, request_spec,
-                                                      filter_properties)
-        if not weighed_hosts:
-            LOG.warning(_LW('No weighed hosts found for volume '
-                            'with properties: %s'),
-                        filter_properties['request_spec']['volume_type'])
-            return None
-        return self._choose_top_host(weighed_hosts, request_spec)
+    def _schedule(self, context, request_spec, filter_properties=None,
+                  hosts=None):
+        with self.tracer.trace(request_spec.get('volume_id')) as trace:
+            weighed_hosts = self._get_weighted_candidates(context,
+                                                          request_spec,
+                                                          filter_properties,
+                                                          hosts=hosts,
+                                                          trace=trace)
+            if not weighed_hosts:
+                LOG.warning(_LW('No weighed hosts found for volume '
+                                'with properties: %s'),
+                            filter_properties['request_spec']['volume_type'])
+                if trace is not None:
+                    trace.error = _('No weighed hosts available')
+                return None
+            top_host = self._choose_top_host(weighed_hosts, request_spec)
+            if trace is not None:
+                trace.chosen_host = top_host.obj.host
+            return top_host
 
     def _schedule_group(self, context, request_spec_list,
                         filter_properties_list=None):
@@ -14,6 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+
 from oslo_log import log as logging
 from oslo_utils import uuidutils
 
@@ -24,18 +26,40 @@ LOG = logging.getLogger(__name__)
 
 
 class AffinityFilter(filters.BaseHostFilter):
+    # Scheduler hint holding the volume UUIDs to check against.
+    hint_key = None
+
     def __init__(self):
         self.volume_api = volume.API()
 
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Yield the hosts that pass the affinity check.
 
-class DifferentBackendFilter(AffinityFilter):
-    """Schedule volume on a different back-end from a set of volumes."""
+        The hinted volumes are resolved to their back-ends with a single
+        query, and every host is then checked against that set in memory.
+        """
+        backend_passes = self._get_backend_check(filter_properties)
+        for host_state in filter_obj_list:
+            if backend_passes(host_state.host):
+                yield host_state
 
     def host_passes(self, host_state, filter_properties):
+        backend_passes = self._get_backend_check(filter_properties)
+        return backend_passes(host_state.host)
+
+    def _backend_passes(self, backends, host):
+        """Return True if host passes given the hinted volumes' back-ends.
+
+        Override this in a subclass.
+        """
+        raise NotImplementedError()
+
+    def _get_backend_check(self, filter_properties):
+        """Return a callable telling whether a given back-end passes."""
         context = filter_properties['context']
         scheduler_hints = filter_properties.get('scheduler_hints') or {}
 
-        affinity_uuids = scheduler_hints.get('different_host', [])
+        affinity_uuids = scheduler_hints.get(self.hint_key, [])
 
         # scheduler hint verification: affinity_uuids can be a list of uuids
         # or single uuid.  The checks here is to make sure every single string
@@ -47,56 +71,38 @@ class DifferentBackendFilter(AffinityFilter):
                 if uuidutils.is_uuid_like(uuid):
                     continue
                 else:
-                    return False
+                    return lambda host: False
         elif uuidutils.is_uuid_like(affinity_uuids):
             affinity_uuids = [affinity_uuids]
         else:
             # Not a list, not a string looks like uuid, don't pass it
             # to DB for query to avoid potential risk.
-            return False
+            return lambda host: False
 
-        if affinity_uuids:
-            return not self.volume_api.get_all(
-                context, filters={'host': host_state.host,
-                                  'id': affinity_uuids,
-                                  'deleted': False})
+        if not affinity_uuids:
+            # With no affinity hint
+            return lambda host: True
 
-        # With no different_host key
-        return True
+        volumes = self.volume_api.get_all(
+            context, filters={'id': affinity_uuids,
+                              'deleted': False})
+        backends = set(vol['host'] for vol in volumes)
+        return functools.partial(self._backend_passes, backends)
 
 
-class SameBackendFilter(AffinityFilter):
-    """Schedule volume on the same back-end as another volume."""
+class DifferentBackendFilter(AffinityFilter):
+    """Schedule volume on a different back-end from a set of volumes."""
 
-    def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
-        scheduler_hints = filter_properties.get('scheduler_hints') or {}
+    hint_key = 'different_host'
 
-        affinity_uuids = scheduler_hints.get('same_host', [])
+    def _backend_passes(self, backends, host):
+        return host not in backends
 
-        # scheduler hint verification: affinity_uuids can be a list of uuids
-        # or single uuid.  The checks here is to make sure every single string
-        # in the list looks like a uuid, otherwise, this filter will fail to
-        # pass.  Note that the filter does *NOT* ignore string doesn't look
-        # like a uuid, it is better to fail the request than serving it wrong.
-        if isinstance(affinity_uuids, list):
-            for uuid in affinity_uuids:
-                if uuidutils.is_uuid_like(uuid):
-                    continue
-                else:
-                    return False
-        elif uuidutils.is_uuid_like(affinity_uuids):
-            affinity_uuids = [affinity_uuids]
-        else:
-            # Not a list, not a string looks like uuid, don't pass it
-            # to DB for query to avoid potential risk.
-            return False
 
-        if affinity_uuids:
-            return self.volume_api.get_all(
-                context, filters={'host': host_state.host,
-                                  'id': affinity_uuids,
-                                  'deleted': False})
+class SameBackendFilter(AffinityFilter):
+    """Schedule volume on the same back-end as another volume."""
+
+    hint_key = 'same_host'
 
-        # With no same_host key
-        return True
+    def _backend_passes(self, backends, host):
+        return host in backends
@@ -122,6 +122,19 @@ class ScheduleCreateVolumeTask(flow_utils.CinderTask):
                               "payload %(payload)s"),
                           {'topic': self.FAILURE_TOPIC, 'payload': payload})
 
+    def error_out(self, context, request_spec, cause):
+        """Notifies and logs a scheduling failure, and errors the volume out.
+
+        Also used by the scheduler manager for the volumes of a batch, which
+        are scheduled without this task.
+        """
+        try:
+            self._handle_failure(context, request_spec, cause)
+        finally:
+            common.error_out_volume(context, self.db_api,
+                                    request_spec['volume_id'],
+                                    reason=cause)
+
     def execute(self, context, request_spec, filter_properties):
         try:
             self.driver_api.schedule_create_volume(context, request_spec,
@@ -133,12 +146,7 @@ class ScheduleCreateVolumeTask(flow_utils.CinderTask):
             # reraise (since what's the point?)
             with excutils.save_and_reraise_exception(
                     reraise=not isinstance(e, exception.NoValidHost)):
-                try:
-                    self._handle_failure(context, request_spec, e)
-                finally:
-                    common.error_out_volume(context, self.db_api,
-                                            request_spec['volume_id'],
-                                            reason=e)
+                self.error_out(context, request_spec, e)
 
 
 def get_flow(context, db_api, driver_api, request_spec=None,
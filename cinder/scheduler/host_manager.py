@@ -17,6 +17,9 @@
 Manage hosts in the current zone.
 """
 
+import collections
+import copy
+import time
 import UserDict
 
 from oslo_config import cfg
@@ -29,6 +32,8 @@ from cinder import exception
 from cinder.i18n import _LI, _LW
 from cinder.openstack.common.scheduler import filters
 from cinder.openstack.common.scheduler import weights
+from cinder.scheduler import capability_delta
+from cinder.scheduler import capability_index
 from cinder import utils
 from cinder.volume import utils as vol_utils
 
@@ -46,7 +51,14 @@ host_manager_opts = [
                 default=[
                     'CapacityWeigher'
                 ],
-                help='Which weigher class names to use for weighing hosts.')
+                help='Which weigher class names to use for weighing hosts.'),
+    cfg.IntOpt('scheduler_host_state_refresh_interval',
+               default=10,
+               help='Interval, in seconds, between reads of the volume '
+                    'services from the database to find which hosts are up. '
+                    'Capability updates are applied to the host states as '
+                    'they arrive in between. Set to 0 to read the services '
+                    'for every scheduling request.'),
 ]
 
 CONF = cfg.CONF
@@ -342,6 +354,14 @@ class PoolState(HostState):
         pass
 
 
+# The pools of all the hosts at a given version of the host states, and
+# the CapabilityIndex over them.  Both the snapshot and its tuple of pools
+# are immutable, the pools are the PoolState objects shared by all the
+# requests, that consume resources on them.
+HostStatesSnapshot = collections.namedtuple('HostStatesSnapshot',
+                                            ['version', 'pools', 'index'])
+
+
 class HostManager(object):
     """Base HostManager class."""
 
@@ -349,7 +369,13 @@ class HostManager(object):
 
     def __init__(self):
         self.service_states = {}  # { <host>: {<service>: {cap k : v}}}
+        # { <host>: (<seq>, <capabilities as reported>) } to merge deltas in
+        self._reported_capabilities = {}
         self.host_state_map = {}
+        self._active_services = {}  # { <host>: <service> } of up services
+        self._services_read_at = None
+        self._snapshot = None
+        self._snapshot_version = 0
         self.filter_handler = filters.HostFilterHandler('cinder.scheduler.'
                                                         'filters')
         self.filter_classes = self.filter_handler.get_all_classes()
@@ -416,44 +442,129 @@ class HostManager(object):
         return good_weighers
 
     def get_filtered_hosts(self, hosts, filter_properties,
-                           filter_class_names=None):
-        """Filter hosts and return only ones passing all filters."""
+                           filter_class_names=None, trace=None):
+        """Filter hosts and return only ones passing all filters.
+
+        When a PlacementTrace is given, the hosts each filter let through
+        and the time it took are recorded in it.
+        """
         filter_classes = self._choose_host_filters(filter_class_names)
-        return self.filter_handler.get_filtered_objects(filter_classes,
-                                                        hosts,
-                                                        filter_properties)
+        snapshot = self._snapshot
+        if snapshot is not None and hosts is snapshot.pools:
+            # Leave out the pools the index tells won't pass the filters
+            start = time.time()
+            hosts_in = hosts
+            hosts = snapshot.index.select(filter_properties, filter_classes)
+            if trace is not None:
+                trace.add_filter('CapabilityIndex', hosts_in, hosts,
+                                 (time.time() - start) * 1000)
+        if trace is None:
+            return self.filter_handler.get_filtered_objects(filter_classes,
+                                                            hosts,
+                                                            filter_properties)
+
+        # Same as the filter handler, one filter at a time to trace each
+        hosts = list(hosts)
+        for filter_cls in filter_classes:
+            start = time.time()
+            hosts_in = hosts
+            hosts = list(filter_cls().filter_all(hosts, filter_properties))
+            trace.add_filter(filter_cls.__name__, hosts_in, hosts,
+                             (time.time() - start) * 1000)
+        return hosts
 
     def get_weighed_hosts(self, hosts, weight_properties,
-                          weigher_class_names=None):
-        """Weigh the hosts."""
-        weigher_classes = self._choose_host_weighers(weigher_class_names)
-        return self.weight_handler.get_weighed_objects(weigher_classes,
-                                                       hosts,
-                                                       weight_properties)
+                          weigher_class_names=None, trace=None):
+        """Weigh the hosts.
 
-    def update_service_capabilities(self, service_name, host, capabilities):
-        """Update the per-service capabilities based on this notification."""
+        When a PlacementTrace is given, the time taken by each weigher is
+        recorded in it.
+        """
+        weigher_classes = self._choose_host_weighers(weigher_class_names)
+        if trace is None:
+            return self.weight_handler.get_weighed_objects(weigher_classes,
+                                                           hosts,
+                                                           weight_properties)
+
+        # Same as the weight handler, timing each weigher
+        if not hosts:
+            return []
+        weighed_hosts = [self.weight_handler.object_class(host, 0.0)
+                         for host in hosts]
+        for weigher_cls in weigher_classes:
+            start = time.time()
+            weigher_cls().weigh_objects(weighed_hosts, weight_properties)
+            trace.add_weigher(weigher_cls.__name__,
+                              (time.time() - start) * 1000)
+        return sorted(weighed_hosts, key=lambda x: x.weight, reverse=True)
+
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    seq=None, delta=None):
+        """Update the per-service capabilities based on this notification.
+
+        A delta is merged into the capabilities last received from the
+        host, only if it follows them in sequence.  Otherwise an update was
+        missed and the delta is ignored, the host keeping its current
+        capabilities until its next full update.
+        """
         if service_name != 'volume':
             LOG.debug('Ignoring %(service_name)s service update '
                       'from %(host)s',
                       {'service_name': service_name, 'host': host})
             return
 
-        # Copy the capabilities, so we don't modify the original dict
-        capab_copy = dict(capabilities)
+        if delta is not None:
+            last_seq, reported = self._reported_capabilities.get(
+                host, (None, None))
+            if seq is None or last_seq is None or seq != last_seq + 1:
+                LOG.debug("Ignoring %(service_name)s service update "
+                          "%(seq)s from %(host)s following %(last_seq)s, "
+                          "waiting for a full update.",
+                          {'service_name': service_name, 'host': host,
+                           'seq': seq, 'last_seq': last_seq})
+                return
+            capabilities = capability_delta.apply_delta(reported, delta)
+
+        if seq is None:
+            self._reported_capabilities.pop(host, None)
+            # Copy the capabilities, so we don't modify the original dict
+            capab_copy = dict(capabilities)
+        else:
+            self._reported_capabilities[host] = (seq, capabilities)
+            # The host state adds to the pools, keep the reported ones as
+            # they are for the next delta.
+            capab_copy = copy.deepcopy(capabilities)
         capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
         self.service_states[host] = capab_copy
 
         LOG.debug("Received %(service_name)s service update from "
                   "%(host)s: %(cap)s",
                   {'service_name': service_name, 'host': host,
-                   'cap': capabilities})
+                   'cap': capabilities if delta is None else delta})
 
         self._no_capabilities_hosts.discard(host)
 
+        # Apply the update right away to a host known to be up, the others
+        # wait for the next read of the services.
+        service = self._active_services.get(host)
+        if service is not None:
+            self._update_host_state(host, capab_copy, service)
+            self._invalidate_snapshot()
+
     def has_all_capabilities(self):
         return len(self._no_capabilities_hosts) == 0
 
+    def _update_host_state(self, host, capabilities, service):
+        host_state = self.host_state_map.get(host)
+        if not host_state:
+            host_state = self.host_state_cls(host,
+                                             capabilities=capabilities,
+                                             service=service)
+            self.host_state_map[host] = host_state
+        # update capabilities and attributes in host_state
+        host_state.update_from_volume_capability(capabilities,
+                                                 service=service)
+
     def _update_host_state_map(self, context):
 
         # Get resource usage across the available volume nodes:
@@ -461,7 +572,7 @@ class HostManager(object):
         volume_services = db.service_get_all_by_topic(context,
                                                       topic,
                                                       disabled=False)
-        active_hosts = set()
+        active_services = {}
         no_capabilities_hosts = set()
         for service in volume_services:
             host = service['host']
@@ -473,55 +584,70 @@ class HostManager(object):
                 no_capabilities_hosts.add(host)
                 continue
 
-            host_state = self.host_state_map.get(host)
-            if not host_state:
-                host_state = self.host_state_cls(host,
-                                                 capabilities=capabilities,
-                                                 service=
-                                                 dict(service))
-                self.host_state_map[host] = host_state
-            # update capabilities and attributes in host_state
-            host_state.update_from_volume_capability(capabilities,
-                                                     service=
-                                                     dict(service))
-            active_hosts.add(host)
+            active_services[host] = dict(service)
+            self._update_host_state(host, capabilities,
+                                    active_services[host])
 
+        self._active_services = active_services
         self._no_capabilities_hosts = no_capabilities_hosts
 
         # remove non-active hosts from host_state_map
-        nonactive_hosts = set(self.host_state_map.keys()) - active_hosts
+        nonactive_hosts = set(self.host_state_map.keys()) - set(
+            active_services)
         for host in nonactive_hosts:
             LOG.info(_LI("Removing non-active host: %(host)s from "
                          "scheduler cache."), {'host': host})
             del self.host_state_map[host]
 
-    def get_all_host_states(self, context):
-        """Returns a dict of all the hosts the HostManager knows about.
+        self._invalidate_snapshot()
 
-        Each of the consumable resources in HostState are
-        populated with capabilities scheduler received from RPC.
+    def _refresh_host_state_map(self, context):
+        """Reads the volume services again if they are out of date."""
+        interval = CONF.scheduler_host_state_refresh_interval
+        now = time.time()
+        if (self._services_read_at is None or interval <= 0 or
+                now - self._services_read_at >= interval):
+            self._update_host_state_map(context)
+            self._services_read_at = now
 
-        For example:
-          {'192.168.1.100': HostState(), ...}
+    def _invalidate_snapshot(self):
+        self._snapshot = None
+        self._snapshot_version += 1
+
+    def get_host_states_snapshot(self, context):
+        """Returns the current HostStatesSnapshot.
+
+        The snapshot is only rebuilt when a capability update or a read of
+        the volume services changed the host states, requests in between
+        share it without any database access.
         """
+        self._refresh_host_state_map(context)
+
+        if self._snapshot is None:
+            pools = []
+            for state in self.host_state_map.values():
+                pools.extend(state.pools.values())
+            pools = tuple(pools)
+            self._snapshot = HostStatesSnapshot(
+                self._snapshot_version, pools,
+                capability_index.CapabilityIndex(pools))
+        return self._snapshot
 
-        self._update_host_state_map(context)
+    def get_all_host_states(self, context):
+        """Returns the pools of all the hosts the HostManager knows about.
 
-        # build a pool_state map and return that map instead of host_state_map
-        all_pools = {}
-        for host, state in self.host_state_map.items():
-            for key in state.pools:
-                pool = state.pools[key]
-                # use host.pool_name to make sure key is unique
-                pool_key = '.'.join([host, pool.pool_name])
-                all_pools[pool_key] = pool
+        Each of the consumable resources in PoolState are
+        populated with capabilities scheduler received from RPC.
 
-        return all_pools.values()
+        For example:
+          (PoolState('192.168.1.100#pool1'), ...)
+        """
+        return self.get_host_states_snapshot(context).pools
 
     def get_pools(self, context):
         """Returns a dict of all pools on all hosts HostManager knows about."""
 
-        self._update_host_state_map(context)
+        self._refresh_host_state_map(context)
 
         all_pools = []
         for host, state in self.host_state_map.items():
@@ -55,7 +55,7 @@ LOG = logging.getLogger(__name__)
 class SchedulerManager(manager.Manager):
     """Chooses a host to create volumes."""
 
-    RPC_API_VERSION = '1.7'
+    RPC_API_VERSION = '1.10'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
@@ -75,13 +75,16 @@ class SchedulerManager(manager.Manager):
         self._startup_delay = False
 
     def update_service_capabilities(self, context, service_name=None,
-                                    host=None, capabilities=None, **kwargs):
+                                    host=None, capabilities=None, seq=None,
+                                    delta=None, **kwargs):
         """Process a capability update from a service node."""
-        if capabilities is None:
+        if capabilities is None and delta is None:
             capabilities = {}
         self.driver.update_service_capabilities(service_name,
                                                 host,
-                                                capabilities)
+                                                capabilities,
+                                                seq=seq,
+                                                delta=delta)
 
     def _wait_for_scheduler(self):
         # NOTE(dulek): We're waiting for scheduler to announce that it's ready
@@ -135,6 +138,31 @@ class SchedulerManager(manager.Manager):
         with flow_utils.DynamicLogListener(flow_engine, logger=LOG):
             flow_engine.run()
 
+    def create_volumes(self, context, topic, request_spec_list,
+                       filter_properties_list=None):
+        """Places a batch of volumes in one scheduler pass."""
+
+        self._wait_for_scheduler()
+
+        # The failures are handled as in the create_volume flow, so that
+        # they are notified on scheduler.create_volume the same way.
+        schedule_task = create_volume.ScheduleCreateVolumeTask(db,
+                                                               self.driver)
+
+        if filter_properties_list is None:
+            filter_properties_list = [{} for _spec in request_spec_list]
+
+        try:
+            failures = self.driver.schedule_create_volumes(
+                context, request_spec_list, filter_properties_list)
+        except Exception as ex:
+            with excutils.save_and_reraise_exception():
+                for request_spec in request_spec_list:
+                    schedule_task.error_out(context, request_spec, ex)
+
+        for request_spec, ex in failures:
+            schedule_task.error_out(context, request_spec, ex)
+
     def request_service_capabilities(self, context):
         volume_rpcapi.VolumeAPI().publish_service_capabilities(context)
 
@@ -260,6 +288,13 @@ class SchedulerManager(manager.Manager):
         """
         return self.driver.get_pools(context, filters)
 
+    def get_placement_stats(self, context):
+        """Get the placement traces and latency histograms.
+
+        They are the ones of this scheduler process only.
+        """
+        return self.driver.get_placement_stats(context)
+
     def _set_volume_state_and_notify(self, method, updates, context, ex,
                                      request_spec, msg=None):
         # TODO(harlowja): move into a task that just does this later.
@@ -41,6 +41,9 @@ class SchedulerAPI(object):
         1.5 - Add manage_existing method
         1.6 - Add create_consistencygroup method
         1.7 - Add get_active_pools method
+        1.8 - Add create_volumes method
+        1.9 - Add get_placement_stats method
+        1.10 - Add seq, delta arguments to update_service_capabilities()
     """
 
     RPC_API_VERSION = '1.0'
@@ -50,7 +53,7 @@ class SchedulerAPI(object):
         target = messaging.Target(topic=CONF.scheduler_topic,
                                   version=self.RPC_API_VERSION)
         serializer = objects_base.CinderObjectSerializer()
-        self.client = rpc.get_client(target, version_cap='1.7',
+        self.client = rpc.get_client(target, version_cap='1.10',
                                      serializer=serializer)
 
     def create_consistencygroup(self, ctxt, topic, group_id,
@@ -83,6 +86,20 @@ class SchedulerAPI(object):
                           request_spec=request_spec_p,
                           filter_properties=filter_properties)
 
+    def create_volumes(self, ctxt, topic, request_spec_list,
+                       filter_properties_list):
+
+        cctxt = self.client.prepare(version='1.8')
+        request_spec_p_list = []
+        for request_spec in request_spec_list:
+            request_spec_p = jsonutils.to_primitive(request_spec)
+            request_spec_p_list.append(request_spec_p)
+
+        return cctxt.cast(ctxt, 'create_volumes',
+                          topic=topic,
+                          request_spec_list=request_spec_p_list,
+                          filter_properties_list=filter_properties_list)
+
     def migrate_volume_to_host(self, ctxt, topic, volume_id, host,
                                force_host_copy=False, request_spec=None,
                                filter_properties=None):
@@ -123,11 +140,26 @@ class SchedulerAPI(object):
         return cctxt.call(ctxt, 'get_pools',
                           filters=filters)
 
+    def get_placement_stats(self, ctxt):
+        cctxt = self.client.prepare(version='1.9')
+        return cctxt.call(ctxt, 'get_placement_stats')
+
     def update_service_capabilities(self, ctxt,
                                     service_name, host,
-                                    capabilities):
-        # FIXME(flaper87): What to do with fanout?
-        cctxt = self.client.prepare(fanout=True)
+                                    capabilities, seq=None, delta=None):
+        # Schedulers older than 1.10 only understand full capabilities,
+        # which are always given so that we can fall back to them.
+        if seq is None or not self.client.can_send_version('1.10'):
+            # FIXME(flaper87): What to do with fanout?
+            cctxt = self.client.prepare(fanout=True)
+            cctxt.cast(ctxt, 'update_service_capabilities',
+                       service_name=service_name, host=host,
+                       capabilities=capabilities)
+            return
+
+        cctxt = self.client.prepare(fanout=True, version='1.10')
+        if delta is not None:
+            capabilities = None
         cctxt.cast(ctxt, 'update_service_capabilities',
                    service_name=service_name, host=host,
-                   capabilities=capabilities)
+                   capabilities=capabilities, seq=seq, delta=delta)
@@ -0,0 +1,176 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Traces of the scheduler placement decisions and latency histograms.
+"""
+
+import bisect
+import collections
+import contextlib
+import time
+
+from oslo_config import cfg
+from oslo_utils import timeutils
+import six
+
+
+tracing_opts = [
+    cfg.IntOpt('scheduler_trace_history_size',
+               default=100,
+               help='Number of the most recent placement traces kept by the '
+                    'scheduler. 0 keeps none, the latency histograms are '
+                    'always kept.'),
+    cfg.IntOpt('scheduler_trace_sample_rate',
+               default=100,
+               help='Trace one placement out of this many. Traced '
+                    'placements run the filters and weighers one at a time '
+                    'to time each of them, which costs more. 0 disables '
+                    'tracing, the latency of every placement is still '
+                    'recorded.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(tracing_opts)
+
+# Upper bounds of the histogram buckets, in milliseconds, the last bucket
+# holds everything above
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+                    10000)
+
+# Names of the hosts removed by a filter listed in a trace, the others are
+# only counted
+MAX_LISTED_HOSTS = 20
+
+
+class LatencyHistogram(object):
+    """Counts durations in buckets of fixed bounds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def to_dict(self):
+        bounds = list(BUCKET_BOUNDS_MS) + [None]
+        return {
+            'count': self.count,
+            'sum_ms': self.total_ms,
+            'max_ms': self.max_ms,
+            'buckets': [{'le_ms': bound, 'count': count}
+                        for bound, count in zip(bounds, self.counts)],
+        }
+
+
+class PlacementTrace(object):
+    """What happened while placing one volume.
+
+    Records the hosts each filter was given and let through, the time
+    taken by each filter and weigher, and the host that was chosen.
+    """
+
+    def __init__(self, volume_id=None):
+        self.volume_id = volume_id
+        self.started_at = timeutils.utcnow()
+        self.elapsed_ms = None
+        self.filters = []
+        self.weighers = []
+        self.chosen_host = None
+        self.error = None
+
+    def add_filter(self, name, hosts_in, hosts_out, elapsed_ms):
+        passed = set(host.host for host in hosts_out)
+        removed = [host.host for host in hosts_in if host.host not in passed]
+        self.filters.append({'name': name,
+                             'hosts_in': len(hosts_in),
+                             'hosts_out': len(hosts_out),
+                             'removed': removed[:MAX_LISTED_HOSTS],
+                             'elapsed_ms': elapsed_ms})
+
+    def add_weigher(self, name, elapsed_ms):
+        self.weighers.append({'name': name, 'elapsed_ms': elapsed_ms})
+
+    def to_dict(self):
+        return {'volume_id': self.volume_id,
+                'started_at': self.started_at.isoformat(),
+                'elapsed_ms': self.elapsed_ms,
+                'filters': self.filters,
+                'weighers': self.weighers,
+                'chosen_host': self.chosen_host,
+                'error': self.error}
+
+
+class PlacementTracer(object):
+    """Keeps the recent placement traces and the latency histograms.
+
+    Histograms are kept for whole placements ('schedule') and for each
+    filter ('filter:<name>') and weigher ('weigher:<name>').  They are
+    local to the scheduler process.
+    """
+
+    def __init__(self):
+        self.histograms = collections.defaultdict(LatencyHistogram)
+        self.traces = collections.deque(
+            maxlen=max(CONF.scheduler_trace_history_size, 0))
+        self._placements = 0
+
+    def _sampled(self):
+        rate = CONF.scheduler_trace_sample_rate
+        self._placements += 1
+        return rate > 0 and (self._placements - 1) % rate == 0
+
+    @contextlib.contextmanager
+    def trace(self, volume_id=None):
+        """Times a placement, and traces it if it is sampled.
+
+        Yields a PlacementTrace recorded once the block is left, or None if
+        the placement is not sampled.
+        """
+        trace = PlacementTrace(volume_id) if self._sampled() else None
+        start = time.time()
+        try:
+            yield trace
+        except Exception as ex:
+            if trace is not None:
+                trace.error = six.text_type(ex)
+            raise
+        finally:
+            elapsed_ms = (time.time() - start) * 1000
+            self.histograms['schedule'].observe(elapsed_ms)
+            if trace is not None:
+                trace.elapsed_ms = elapsed_ms
+                self._record(trace)
+
+    def _record(self, trace):
+        for stage in trace.filters:
+            self.histograms['filter:' + stage['name']].observe(
+                stage['elapsed_ms'])
+        for stage in trace.weighers:
+            self.histograms['weigher:' + stage['name']].observe(
+                stage['elapsed_ms'])
+        self.traces.append(trace)
+
+    def get_stats(self):
+        return {'histograms': {name: histogram.to_dict()
+                               for name, histogram in
+                               six.iteritems(self.histograms)},
+                'traces': [trace.to_dict() for trace in self.traces]}
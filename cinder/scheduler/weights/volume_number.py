@@ -58,3 +58,13 @@ class VolumeNumberWeigher(weights.BaseHostWeigher):
                                                     host=host_state.host,
                                                     count_only=True)
         return volume_number
+
+    def weigh_objects(self, weighed_obj_list, weight_properties):
+        """Weigh all the hosts with a single volume count query."""
+        context = weight_properties['context'].elevated()
+        hosts = [weighed_obj.obj.host for weighed_obj in weighed_obj_list]
+        volume_numbers = db.volume_count_get_for_hosts(context, hosts)
+        constant = self._weight_multiplier()
+        for weighed_obj in weighed_obj_list:
+            weighed_obj.weight += (constant *
+                                   volume_numbers[weighed_obj.obj.host])
@@ -43,6 +43,7 @@ from cinder.db import migration
 from cinder.db.sqlalchemy import api as sqla_api
 from cinder import i18n
 from cinder import objects
+from cinder import quota
 from cinder import rpc
 from cinder import service
 from cinder.tests.unit import conf_fixture
@@ -209,6 +210,10 @@ class TestCase(testtools.TestCase):
                                  sqlite_clean_db=CONF.sqlite_clean_db)
         self.useFixture(_DB_CACHE)
 
+        # Quota resources are cached until the volume types in the database
+        # change, tests that stub out volume types must not see old ones.
+        quota.QUOTAS.clear_resources_cache()
+
         # emulate some of the mox stuff, we can't use the metaclass
         # because it screws with our generators
         mox_fixture = self.useFixture(moxstubout.MoxStubout())
@@ -22,10 +22,12 @@ from xml.dom import minidom
 
 import mock
 from oslo_utils import timeutils
+from six.moves import urllib
 import webob
 
 # needed for stubs to work
 import cinder.backup
+from cinder.common import sqlalchemyutils
 from cinder import context
 from cinder import db
 from cinder import exception
@@ -253,6 +255,39 @@ class BackupsAPITestCase(test.TestCase):
         db.backup_destroy(context.get_admin_context(), backup_id2)
         db.backup_destroy(context.get_admin_context(), backup_id1)
 
+    def test_list_backups_with_limit_and_marker(self):
+        backup_id1 = self._create_backup()
+        backup_id2 = self._create_backup()
+
+        req = webob.Request.blank('/v2/fake/backups?limit=1')
+        req.method = 'GET'
+        req.headers['Content-Type'] = 'application/json'
+        res = req.get_response(fakes.wsgi_app())
+        res_dict = json.loads(res.body)
+
+        self.assertEqual(200, res.status_int)
+        self.assertEqual(1, len(res_dict['backups']))
+        first_id = res_dict['backups'][0]['id']
+        href_parts = urllib.parse.urlparse(
+            res_dict['backups_links'][0]['href'])
+        # The next link holds the sort keys of the last backup, not its id
+        marker = urllib.parse.parse_qs(href_parts.query)['marker'][0]
+        self.assertTrue(marker.startswith(sqlalchemyutils.MARKER_PREFIX))
+
+        req = webob.Request.blank('/v2/fake/backups?%s' % href_parts.query)
+        req.method = 'GET'
+        req.headers['Content-Type'] = 'application/json'
+        res = req.get_response(fakes.wsgi_app())
+        res_dict = json.loads(res.body)
+
+        self.assertEqual(200, res.status_int)
+        self.assertEqual(1, len(res_dict['backups']))
+        self.assertEqual(set([backup_id1, backup_id2]),
+                         set([first_id, res_dict['backups'][0]['id']]))
+
+        db.backup_destroy(context.get_admin_context(), backup_id2)
+        db.backup_destroy(context.get_admin_context(), backup_id1)
+
     def test_list_backups_detail_using_filters(self):
         backup_id1 = self._create_backup(display_name='test2')
         backup_id2 = self._create_backup(status='available')
@@ -108,3 +108,17 @@ class SchedulerStatsAPITest(test.TestCase):
         }
 
         self.assertDictMatch(res, expected)
+
+    @mock.patch('cinder.scheduler.rpcapi.SchedulerAPI.get_placement_stats')
+    def test_get_placement_stats(self, mock_get_placement_stats):
+        stats = {'histograms': {'schedule': {'count': 1}},
+                 'traces': [{'volume_id': 'fake-id',
+                             'chosen_host': 'host1#pool1'}]}
+        mock_get_placement_stats.return_value = stats
+        req = fakes.HTTPRequest.blank(
+            '/v2/fake/scheduler_stats/get_placement_stats')
+        req.environ['cinder.context'] = self.ctxt
+        res = self.controller.get_placement_stats(req)
+
+        mock_get_placement_stats.assert_called_once_with(self.ctxt)
+        self.assertEqual({'placement_stats': stats}, res)
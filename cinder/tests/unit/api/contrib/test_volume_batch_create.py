@@ -0,0 +1,108 @@
+#   Copyright 2015 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+import mock
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+import webob
+
+from cinder import context
+from cinder import test
+from cinder.tests.unit.api import fakes
+
+
+CONF = cfg.CONF
+
+
+def app():
+    # no auth, just let environ['cinder.context'] pass through
+    api = fakes.router.APIRouter()
+    mapper = fakes.urlmap.URLMap()
+    mapper['/v2'] = api
+    return mapper
+
+
+def api_create_batch(context, count, size, name, description, **kwargs):
+    """Replacement for cinder.volume.api.API.create_batch."""
+    return [{'status': 'creating',
+             'display_name': name,
+             'display_description': description,
+             'availability_zone': 'nova',
+             'tenant_id': 'fake',
+             'created_at': 'DONTCARE',
+             'id': 'ffffffff-0000-ffff-0000-%012d' % i,
+             'volume_type': None,
+             'volume_type_id': None,
+             'snapshot_id': None,
+             'source_volid': None,
+             'user_id': 'fake',
+             'launched_at': 'DONTCARE',
+             'size': size,
+             'attach_status': 'detached',
+             'volume_attachment': [],
+             'volume_metadata': [],
+             'volume_admin_metadata': [],
+             'bootable': False,
+             'encryption_key_id': None,
+             'consistencygroup_id': None,
+             'multiattach': False}
+            for i in range(count)]
+
+
+class VolumeBatchCreateTest(test.TestCase):
+    """Test cases for cinder/api/contrib/volume_batch_create.py"""
+
+    def _get_resp(self, body):
+        """Helper to execute an os-volume-batch-create API call."""
+        req = webob.Request.blank('/v2/fake/os-volume-batch-create')
+        req.method = 'POST'
+        req.headers['Content-Type'] = 'application/json'
+        req.environ['cinder.context'] = context.RequestContext('fake_user',
+                                                               'fake')
+        req.body = jsonutils.dumps(body)
+        res = req.get_response(app())
+        return res
+
+    @mock.patch('cinder.volume.api.API.create_batch',
+                side_effect=api_create_batch)
+    def test_create_batch_ok(self, mock_create_batch):
+        body = {'volume_batch': {'count': 3,
+                                 'size': 1,
+                                 'name': 'job',
+                                 'availability_zone': 'nova'}}
+        res = self._get_resp(body)
+        self.assertEqual(202, res.status_int, res)
+
+        mock_create_batch.assert_called_once_with(
+            mock.ANY, 3, 1, 'job', None, metadata=None,
+            availability_zone='nova', scheduler_hints=None,
+            multiattach=False)
+        volumes = jsonutils.loads(res.body)['volumes']
+        self.assertEqual(3, len(volumes))
+        self.assertEqual('job', volumes[0]['name'])
+
+    def test_create_batch_invalid_count(self):
+        for count in (None, 0, -1, 'abc', CONF.osapi_max_limit + 1):
+            body = {'volume_batch': {'count': count, 'size': 1}}
+            res = self._get_resp(body)
+            self.assertEqual(400, res.status_int, count)
+
+    def test_create_batch_missing_size(self):
+        body = {'volume_batch': {'count': 2}}
+        res = self._get_resp(body)
+        self.assertEqual(400, res.status_int)
+
+    def test_create_batch_missing_body(self):
+        res = self._get_resp({'volume': {'count': 2, 'size': 1}})
+        self.assertEqual(400, res.status_int)
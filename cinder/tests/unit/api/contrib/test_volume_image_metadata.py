@@ -16,6 +16,7 @@ import json
 import uuid
 from xml.dom import minidom
 
+import mock
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 import webob
@@ -115,6 +116,9 @@ class VolumeImageMetadataTest(test.TestCase):
             for volume in json.loads(body)['volumes']
         ]
 
+    def _get_volume_ids(self, body):
+        return [volume['id'] for volume in json.loads(body)['volumes']]
+
     def test_get_volume(self):
         res = self._make_request('/v2/fake/volumes/%s' % self.UUID)
         self.assertEqual(200, res.status_int)
@@ -127,6 +131,16 @@ class VolumeImageMetadataTest(test.TestCase):
         self.assertEqual(self._get_image_metadata_list(res.body)[0],
                          fake_image_metadata)
 
+    def test_list_detail_volumes_page_metadata(self):
+        with mock.patch.object(
+                volume.API, 'get_volumes_image_metadata',
+                side_effect=fake_get_volumes_image_metadata) as mock_get:
+            res = self._make_request('/v2/fake/volumes/detail')
+        self.assertEqual(200, res.status_int)
+        volume_ids = self._get_volume_ids(res.body)
+        self.assertTrue(volume_ids)
+        mock_get.assert_called_once_with(mock.ANY, volume_ids=volume_ids)
+
     def test_create_image_metadata(self):
         self.stubs.Set(volume.API, 'get_volume_image_metadata',
                        return_empty_image_metadata)
@@ -296,3 +310,10 @@ class VolumeImageMetadataXMLTest(VolumeImageMetadataTest):
             for volume in volume_list]
         return map(wsgi.MetadataXMLDeserializer().extract_metadata,
                    image_metadata_list)
+
+    def _get_volume_ids(self, body):
+        deserializer = wsgi.XMLDeserializer()
+        volumes = deserializer.find_first_child_named(
+            minidom.parseString(body), 'volumes')
+        return [volume.getAttribute('id') for volume in
+                deserializer.find_children_named(volumes, 'volume')]
@@ -127,7 +127,7 @@ def stub_volume_get_db(context, volume_id):
 
 def stub_volume_get_all(context, search_opts=None, marker=None, limit=None,
                         sort_keys=None, sort_dirs=None, filters=None,
-                        viewable_admin_meta=False):
+                        viewable_admin_meta=False, joined_load=True):
     return [stub_volume(100, project_id='fake'),
             stub_volume(101, project_id='superfake'),
             stub_volume(102, project_id='superduperfake')]
@@ -136,7 +136,8 @@ def stub_volume_get_all(context, search_opts=None, marker=None, limit=None,
 def stub_volume_get_all_by_project(self, context, marker, limit,
                                    sort_keys=None, sort_dirs=None,
                                    filters=None,
-                                   viewable_admin_meta=False):
+                                   viewable_admin_meta=False,
+                                   joined_load=True):
     filters = filters or {}
     return [stub_volume_get(self, context, '1')]
 
@@ -156,13 +157,16 @@ def stub_snapshot(id, **kwargs):
     return snapshot
 
 
-def stub_snapshot_get_all(self, search_opts=None):
+def stub_snapshot_get_all(self, search_opts=None, marker=None, limit=None,
+                          sort_keys=None, sort_dirs=None):
     return [stub_snapshot(100, project_id='fake'),
             stub_snapshot(101, project_id='superfake'),
             stub_snapshot(102, project_id='superduperfake')]
 
 
-def stub_snapshot_get_all_by_project(self, context, search_opts=None):
+def stub_snapshot_get_all_by_project(self, context, search_opts=None,
+                                     marker=None, limit=None, sort_keys=None,
+                                     sort_dirs=None):
     return [stub_snapshot(1)]
 
 
@@ -27,6 +27,7 @@ import webob
 
 from cinder.api import extensions
 from cinder.api.v2 import volumes
+from cinder.common import sqlalchemyutils
 from cinder import consistencygroup as consistencygroupAPI
 from cinder import context
 from cinder import db
@@ -1055,7 +1056,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           joined_load=True):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -1078,7 +1080,7 @@ class VolumeApiTest(test.TestCase):
 
         req = fakes.HTTPRequest.blank('/v2/volumes'
                                       '?limit=1&name=foo'
-                                      '&sort=id1:asc')
+                                      '&sort=size:asc')
         res_dict = self.controller.index(req)
         volumes = res_dict['volumes']
         self.assertEqual(len(volumes), 1)
@@ -1093,10 +1095,12 @@ class VolumeApiTest(test.TestCase):
         href_parts = urllib.parse.urlparse(links[0]['href'])
         self.assertEqual('/v2/fakeproject/volumes', href_parts.path)
         params = urllib.parse.parse_qs(href_parts.query)
-        self.assertEqual(str(volumes[0]['id']), params['marker'][0])
+        marker = sqlalchemyutils.decode_marker(params['marker'][0],
+                                               ['size', 'created_at', 'id'])
+        self.assertEqual(volumes[0]['id'], marker[2])
         self.assertEqual('1', params['limit'][0])
         self.assertEqual('foo', params['name'][0])
-        self.assertEqual('id1:asc', params['sort'][0])
+        self.assertEqual('size:asc', params['sort'][0])
 
     def test_volume_index_limit_negative(self):
         req = fakes.HTTPRequest.blank('/v2/volumes?limit=-1')
@@ -1125,7 +1129,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           joined_load=True):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -1154,7 +1159,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           joined_load=True):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -1216,7 +1222,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           joined_load=True):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -1274,7 +1281,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all(context, marker, limit,
                                 sort_keys=None, sort_dirs=None,
                                 filters=None,
-                                viewable_admin_meta=False):
+                                viewable_admin_meta=False,
+                                joined_load=True):
             vols = [stubs.stub_volume(i)
                     for i in range(CONF.osapi_max_limit)]
             if limit is None or limit >= len(vols):
@@ -1292,7 +1300,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all2(context, marker, limit,
                                  sort_keys=None, sort_dirs=None,
                                  filters=None,
-                                 viewable_admin_meta=False):
+                                 viewable_admin_meta=False,
+                                 joined_load=True):
             vols = [stubs.stub_volume(i)
                     for i in range(100)]
             if limit is None or limit >= len(vols):
@@ -1310,7 +1319,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all3(context, marker, limit,
                                  sort_keys=None, sort_dirs=None,
                                  filters=None,
-                                 viewable_admin_meta=False):
+                                 viewable_admin_meta=False,
+                                 joined_load=True):
             vols = [stubs.stub_volume(i)
                     for i in range(CONF.osapi_max_limit + 100)]
             if limit is None or limit >= len(vols):
@@ -1351,7 +1361,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_keys=None, sort_dirs=None,
                                            filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           joined_load=True):
             self.assertEqual(filters['no_migration_targets'], True)
             self.assertFalse('all_tenants' in filters)
             return [stubs.stub_volume(1, display_name='vol1')]
@@ -1359,7 +1370,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all(context, marker, limit,
                                 sort_keys=None, sort_dirs=None,
                                 filters=None,
-                                viewable_admin_meta=False):
+                                viewable_admin_meta=False,
+                                joined_load=True):
             return []
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
@@ -1377,14 +1389,16 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all_by_project2(context, project_id, marker, limit,
                                             sort_keys=None, sort_dirs=None,
                                             filters=None,
-                                            viewable_admin_meta=False):
+                                            viewable_admin_meta=False,
+                                            joined_load=True):
             self.assertFalse('no_migration_targets' in filters)
             return [stubs.stub_volume(1, display_name='vol2')]
 
         def stub_volume_get_all2(context, marker, limit,
                                  sort_keys=None, sort_dirs=None,
                                  filters=None,
-                                 viewable_admin_meta=False):
+                                 viewable_admin_meta=False,
+                                 joined_load=True):
             return []
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project2)
@@ -1400,13 +1414,15 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all_by_project3(context, project_id, marker, limit,
                                             sort_keys=None, sort_dirs=None,
                                             filters=None,
-                                            viewable_admin_meta=False):
+                                            viewable_admin_meta=False,
+                                            joined_load=True):
             return []
 
         def stub_volume_get_all3(context, marker, limit,
                                  sort_keys=None, sort_dirs=None,
                                  filters=None,
-                                 viewable_admin_meta=False):
+                                 viewable_admin_meta=False,
+                                 joined_load=True):
             self.assertFalse('no_migration_targets' in filters)
             self.assertFalse('all_tenants' in filters)
             return [stubs.stub_volume(1, display_name='vol3')]
@@ -1692,10 +1708,11 @@ class VolumeApiTest(test.TestCase):
         self.controller._view_builder.detail_list = mock.Mock()
         self.controller._get_volumes(req, True)
         get_all.assert_called_once_with(
-            context, None, None,
+            context, None, CONF.osapi_max_limit + 1,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'display_name': 'Volume-573108026'},
-            viewable_admin_meta=True)
+            viewable_admin_meta=True,
+            joined_load=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_list(self, get_all):
@@ -1706,9 +1723,10 @@ class VolumeApiTest(test.TestCase):
         self.controller._view_builder.detail_list = mock.Mock()
         self.controller._get_volumes(req, True)
         get_all.assert_called_once_with(
-            context, None, None,
+            context, None, CONF.osapi_max_limit + 1,
             sort_keys=['created_at'], sort_dirs=['desc'],
-            filters={'id': ['1', '2', '3']}, viewable_admin_meta=True)
+            filters={'id': ['1', '2', '3']}, viewable_admin_meta=True,
+            joined_load=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_expression(self, get_all):
@@ -1719,9 +1737,10 @@ class VolumeApiTest(test.TestCase):
         self.controller._view_builder.detail_list = mock.Mock()
         self.controller._get_volumes(req, True)
         get_all.assert_called_once_with(
-            context, None, None,
+            context, None, CONF.osapi_max_limit + 1,
             sort_keys=['created_at'], sort_dirs=['desc'],
-            filters={'display_name': 'd-'}, viewable_admin_meta=True)
+            filters={'display_name': 'd-'}, viewable_admin_meta=True,
+            joined_load=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_status(self, get_all):
@@ -1732,9 +1751,10 @@ class VolumeApiTest(test.TestCase):
         self.controller._view_builder.detail_list = mock.Mock()
         self.controller._get_volumes(req, True)
         get_all.assert_called_once_with(
-            ctxt, None, None,
+            ctxt, None, CONF.osapi_max_limit + 1,
             sort_keys=['created_at'], sort_dirs=['desc'],
-            filters={'status': 'available'}, viewable_admin_meta=True)
+            filters={'status': 'available'}, viewable_admin_meta=True,
+            joined_load=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_metadata(self, get_all):
@@ -1745,10 +1765,11 @@ class VolumeApiTest(test.TestCase):
         self.controller._view_builder.detail_list = mock.Mock()
         self.controller._get_volumes(req, True)
         get_all.assert_called_once_with(
-            ctxt, None, None,
+            ctxt, None, CONF.osapi_max_limit + 1,
             sort_keys=['created_at'], sort_dirs=['desc'],
             filters={'metadata': {'fake_key': 'fake_value'}},
-            viewable_admin_meta=True)
+            viewable_admin_meta=True,
+            joined_load=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_availability_zone(self, get_all):
@@ -1759,9 +1780,10 @@ class VolumeApiTest(test.TestCase):
         self.controller._view_builder.detail_list = mock.Mock()
         self.controller._get_volumes(req, True)
         get_all.assert_called_once_with(
-            ctxt, None, None,
+            ctxt, None, CONF.osapi_max_limit + 1,
             sort_keys=['created_at'], sort_dirs=['desc'],
-            filters={'availability_zone': 'nova'}, viewable_admin_meta=True)
+            filters={'availability_zone': 'nova'}, viewable_admin_meta=True,
+            joined_load=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_filter_with_invalid_filter(self, get_all):
@@ -1773,9 +1795,10 @@ class VolumeApiTest(test.TestCase):
         self.controller._view_builder.detail_list = mock.Mock()
         self.controller._get_volumes(req, True)
         get_all.assert_called_once_with(
-            ctxt, None, None,
+            ctxt, None, CONF.osapi_max_limit + 1,
             sort_keys=['created_at'], sort_dirs=['desc'],
-            filters={'availability_zone': 'nova'}, viewable_admin_meta=True)
+            filters={'availability_zone': 'nova'}, viewable_admin_meta=True,
+            joined_load=True)
 
     @mock.patch('cinder.volume.api.API.get_all')
     def test_get_volumes_sort_by_name(self, get_all):
@@ -1788,9 +1811,32 @@ class VolumeApiTest(test.TestCase):
         self.controller._view_builder.detail_list = mock.Mock()
         self.controller._get_volumes(req, True)
         get_all.assert_called_once_with(
-            ctxt, None, None,
+            ctxt, None, CONF.osapi_max_limit + 1,
             sort_dirs=['desc'], viewable_admin_meta=True,
-            sort_keys=['display_name'], filters={})
+            sort_keys=['display_name'], filters={},
+            joined_load=True)
+
+    @mock.patch('cinder.volume.api.API.get_all')
+    def test_get_volumes_summary_db_limit(self, get_all):
+        req = mock.MagicMock()
+        ctxt = context.RequestContext('fake', 'fake', auth_token=True)
+        req.environ = {'cinder.context': ctxt}
+        req.params = {'offset': '10', 'limit': '20'}
+        self.controller._view_builder.summary_list = mock.Mock()
+        self.controller._get_volumes(req, False)
+        get_all.assert_called_once_with(
+            ctxt, None, 30,
+            sort_keys=['created_at'], sort_dirs=['desc'], filters={},
+            viewable_admin_meta=True, joined_load=False)
+
+        get_all.reset_mock()
+        req.params = {'offset': '10',
+                      'limit': '%d' % (CONF.osapi_max_limit * 2)}
+        self.controller._get_volumes(req, False)
+        get_all.assert_called_once_with(
+            ctxt, None, CONF.osapi_max_limit + 11,
+            sort_keys=['created_at'], sort_dirs=['desc'], filters={},
+            viewable_admin_meta=True, joined_load=False)
 
     def test_get_volume_filter_options_using_config(self):
         self.override_config('query_volume_filters', ['name', 'status',
@@ -28,6 +28,7 @@ import mock
 from os_brick.remotefs import remotefs as remotefs_brick
 from oslo_config import cfg
 
+from cinder.backup import chunkeddriver
 from cinder.backup.drivers import nfs
 from cinder import context
 from cinder import db
@@ -507,6 +508,49 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
             self.assertTrue(filecmp.cmp(self.volume_file.name,
                             restored_file.name))
 
+    def test_backup_restore_objects_in_flight(self):
+        self._create_backup_db_entry()
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 3))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_max_objects_in_flight=4)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        metadata = service._read_metadata(backup)
+        offsets = [list(obj.values())[0]['offset']
+                   for obj in metadata['objects']]
+        self.assertEqual(sorted(offsets), offsets)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(backup, '1234-5678-1234-8888', restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+    @mock.patch('os.fsync')
+    def test_restore_fsync_interval(self, mock_fsync):
+        self._create_backup_db_entry()
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_restore_fsync_interval=(1024 * 64))
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            backup = objects.Backup.get_by_id(self.ctxt, 123)
+            service.restore(backup, '1234-5678-1234-8888', restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+        # 16 objects of 8KB each, synced every 64KB.
+        self.assertEqual(2, mock_fsync.call_count)
+
     def test_restore_delta(self):
 
         def _fake_generate_object_name_prefix(self, backup):
@@ -552,6 +596,165 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
             self.assertTrue(filecmp.cmp(self.volume_file.name,
                             restored_file.name))
 
+    def test_backup_restore_skip_zero_blocks(self):
+        self._create_backup_db_entry()
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_skip_zero_blocks=True)
+        self.volume_file.seek(4 * 1024)
+        self.volume_file.write(b'\0' * 1024 * 20)
+        self.volume_file.flush()
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        metadata = service._read_metadata(backup)
+        self.assertEqual('1.1.0', metadata['version'])
+        self.assertEqual([{'offset': 4 * 1024, 'length': 20 * 1024}],
+                         metadata['holes'])
+        for obj in metadata['objects']:
+            obj = list(obj.values())[0]
+            self.assertFalse(4 * 1024 <= obj['offset'] < 24 * 1024)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            restored_file.write(os.urandom(128 * 1024))
+            restored_file.flush()
+            service.restore(backup, '1234-5678-1234-8888', restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+    def test_backup_restore_delete_dedup(self):
+
+        def _fake_generate_object_name_prefix(self, backup):
+            az = 'az_fake'
+            backup_name = '%s_backup_%s' % (az, backup['id'])
+            volume = 'volume_%s' % (backup['volume_id'])
+            prefix = volume + '_' + backup_name
+            return prefix
+
+        # The backups must not share the objects of their prefix.
+        self.stubs.Set(nfs.NFSBackupDriver,
+                       '_generate_object_name_prefix',
+                       _fake_generate_object_name_prefix)
+
+        self._create_backup_db_entry(backup_id=123)
+        self._create_backup_db_entry(backup_id=124)
+        self.flags(backup_compression_algorithm='zlib')
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        self.flags(backup_dedup=True)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        path = os.path.join(service.backup_path, 'test-container')
+
+        def _dedup_objects():
+            return sorted(name for name in os.listdir(path)
+                          if name.startswith('dedup-'))
+
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+        dedup_objects = _dedup_objects()
+        self.assertEqual(16, len(dedup_objects))
+
+        # A second backup of the same data only takes references.
+        self.volume_file.seek(0)
+        backup2 = objects.Backup.get_by_id(self.ctxt, 124)
+        service.backup(backup2, self.volume_file)
+        self.assertEqual(dedup_objects, _dedup_objects())
+        metadata = service._read_metadata(backup2)
+        self.assertEqual('1.1.0', metadata['version'])
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(backup2, '1234-5678-1234-8888', restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+        service.delete(backup)
+        self.assertEqual(dedup_objects, _dedup_objects())
+        service.delete(backup2)
+        self.assertEqual([], _dedup_objects())
+
+    def test_backup_delta_binary_sha256file(self):
+
+        def _fake_generate_object_name_prefix(self, backup):
+            az = 'az_fake'
+            backup_name = '%s_backup_%s' % (az, backup['id'])
+            volume = 'volume_%s' % (backup['volume_id'])
+            prefix = volume + '_' + backup_name
+            return prefix
+
+        # The backups must not share the objects of their prefix.
+        self.stubs.Set(nfs.NFSBackupDriver,
+                       '_generate_object_name_prefix',
+                       _fake_generate_object_name_prefix)
+
+        self._create_backup_db_entry(backup_id=123)
+        self.flags(backup_file_size=(1024 * 8))
+        self.flags(backup_sha_block_size_bytes=1024)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = objects.Backup.get_by_id(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        # An incremental backup in the binary format of a json parent.
+        self.volume_file.seek(16 * 1024)
+        self.volume_file.write(os.urandom(1024))
+        self.volume_file.flush()
+        self.flags(backup_sha256file_format='binary')
+        self._create_backup_db_entry(backup_id=124, parent_id=123)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        deltabackup = objects.Backup.get_by_id(self.ctxt, 124)
+        service.backup(deltabackup, self.volume_file)
+
+        filename = service._sha256_filename(deltabackup)
+        with service.get_object_reader('test-container',
+                                       filename) as reader:
+            self.assertTrue(reader.read().startswith(
+                chunkeddriver.SHA256FILE_BINARY_MAGIC))
+        content1 = service._read_sha256file(backup)
+        content2 = service._read_sha256file(deltabackup)
+        self.assertEqual(128, len(content2['sha256s']))
+        changed = [i for i in range(128)
+                   if content1['sha256s'][i] != content2['sha256s'][i]]
+        self.assertEqual([16], changed)
+        metadata = service._read_metadata(deltabackup)
+        self.assertEqual([(16 * 1024, 1024)],
+                         [(obj['offset'], obj['length']) for obj in
+                          (list(o.values())[0] for o in metadata['objects'])])
+
+        # And an incremental backup of the binary one.
+        self._create_backup_db_entry(backup_id=125, parent_id=124)
+        self.volume_file.seek(0)
+        deltabackup2 = objects.Backup.get_by_id(self.ctxt, 125)
+        service.backup(deltabackup2, self.volume_file)
+        self.assertEqual([], service._read_metadata(deltabackup2)['objects'])
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(deltabackup2, '1234-5678-1234-8888',
+                            restored_file)
+            self.assertTrue(filecmp.cmp(self.volume_file.name,
+                            restored_file.name))
+
+    def test_get_restore_extents(self):
+        service = nfs.NFSBackupDriver(self.ctxt)
+        full = {'objects': [{'full-1': {'offset': 0, 'length': 4096}},
+                            {'full-2': {'offset': 4096, 'length': 4096}}]}
+        incr1 = {'objects': [{'incr1-1': {'offset': 1024, 'length': 1024}},
+                             {'incr1-2': {'offset': 4096, 'length': 4096}}]}
+        incr2 = {'objects': [{'incr2-1': {'offset': 1536, 'length': 3072}}]}
+
+        extents = service._get_restore_extents([incr2, incr1, full])
+
+        self.assertEqual([({'incr2-1': [(1536, 4608)]}, []),
+                          ({'incr1-1': [(1024, 1536)],
+                            'incr1-2': [(4608, 8192)]}, []),
+                          ({'full-1': [(0, 1024)]}, [])],
+                         extents)
+
     def test_delete(self):
         self._create_backup_db_entry()
         service = nfs.NFSBackupDriver(self.ctxt)
@@ -600,3 +803,45 @@ class BackupNFSSwiftBasedTestCase(test.TestCase):
 
         self.assertEqual('none', result[0])
         self.assertEqual(already_compressed_data, result[1])
+
+    def test_prepare_output_data_adaptive_compression_skipped(self):
+        self.flags(backup_adaptive_compression=True)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        fake_data = os.urandom(1024 * 1024)
+
+        with mock.patch.object(service, 'compressor',
+                               wraps=service.compressor) as compressor:
+            result = service._prepare_output_data(fake_data)
+
+        self.assertEqual('none', result[0])
+        self.assertEqual(fake_data, result[1])
+        # Only the sample was compressed.
+        compressor.compress.assert_called_once_with(
+            fake_data[:chunkeddriver.ADAPTIVE_COMPRESSION_SAMPLE_SIZE])
+
+    def test_prepare_output_data_adaptive_compression(self):
+        self.flags(backup_adaptive_compression=True)
+        service = nfs.NFSBackupDriver(self.ctxt)
+        fake_data = b'\0' * 1024 * 1024
+
+        result = service._prepare_output_data(fake_data)
+
+        self.assertEqual('zlib', result[0])
+        self.assertEqual(fake_data, zlib.decompress(result[1]))
+
+    @mock.patch.object(chunkeddriver, 'ZstdCompressor')
+    def test_get_compressor_zstd(self, mock_zstd):
+        self.flags(backup_compression_threads=4)
+        service = nfs.NFSBackupDriver(self.ctxt)
+
+        compressor = service._get_compressor('zstd')
+
+        self.assertEqual(mock_zstd.return_value, compressor)
+        mock_zstd.assert_called_once_with(threads=4)
+
+    @mock.patch.object(chunkeddriver, 'ZstdCompressor',
+                       side_effect=ImportError)
+    def test_get_compressor_zstd_unavailable(self, mock_zstd):
+        service = nfs.NFSBackupDriver(self.ctxt)
+
+        self.assertRaises(ValueError, service._get_compressor, 'zstd')
@@ -0,0 +1,140 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from cinder import context
+from cinder import exception
+from cinder.image import cache as image_cache
+from cinder import test
+
+
+class ImageVolumeCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ImageVolumeCacheTestCase, self).setUp()
+        self.mock_db = mock.MagicMock()
+        self.mock_volume_rpcapi = mock.MagicMock()
+        self.context = context.get_admin_context()
+        self.volume = {'id': 'fake_volume_id', 'host': 'host@backend#pool',
+                       'size': 10}
+        self.image_meta = {'id': 'fake_image_id', 'checksum': 'fake_sum'}
+
+    def _build_cache(self, max_gb=0, max_count=0):
+        return image_cache.ImageVolumeCache(self.mock_db,
+                                            self.mock_volume_rpcapi,
+                                            max_gb, max_count)
+
+    def _entry(self, entry_id, size=10, host='host@backend#pool',
+               checksum='fake_sum'):
+        return {'id': entry_id, 'host': host, 'image_id': 'fake_image_id',
+                'image_checksum': checksum, 'volume_id': 'volume%s' % entry_id,
+                'size': size}
+
+    def test_get_entry(self):
+        cache = self._build_cache()
+        entries = [self._entry(1), self._entry(2)]
+        self.mock_db.image_volume_cache_get_all_for_host.return_value = (
+            entries)
+
+        entry = cache.get_entry(self.context, self.volume, 'fake_image_id',
+                                self.image_meta)
+
+        self.assertEqual(entries[1], entry)
+        self.mock_db.image_volume_cache_get_all_for_host.\
+            assert_called_once_with(self.context, 'host@backend',
+                                    image_id='fake_image_id')
+        self.mock_db.image_volume_cache_update_last_used.\
+            assert_called_once_with(self.context, 2)
+
+    def test_get_entry_miss(self):
+        cache = self._build_cache()
+        self.mock_db.image_volume_cache_get_all_for_host.return_value = [
+            self._entry(1, size=20),
+            self._entry(2, host='host@backend#other_pool')]
+
+        self.assertIsNone(cache.get_entry(self.context, self.volume,
+                                          'fake_image_id', self.image_meta))
+        self.assertFalse(
+            self.mock_db.image_volume_cache_update_last_used.called)
+        self.assertFalse(self.mock_volume_rpcapi.delete_volume.called)
+
+    def test_get_entry_evicts_outdated(self):
+        cache = self._build_cache()
+        self.mock_db.image_volume_cache_get_all_for_host.return_value = [
+            self._entry(1, checksum='old_sum')]
+
+        self.assertIsNone(cache.get_entry(self.context, self.volume,
+                                          'fake_image_id', self.image_meta))
+        self.mock_db.image_volume_cache_delete.assert_called_once_with(
+            self.context, 'volume1')
+        self.mock_db.volume_update.assert_called_once_with(
+            self.context, 'volume1', {'status': 'deleting'})
+        self.mock_volume_rpcapi.delete_volume.assert_called_once_with(
+            self.context, self.mock_db.volume_update.return_value)
+
+    def test_create_cache_entry(self):
+        cache = self._build_cache()
+        cache.create_cache_entry(self.context, self.volume, 'fake_image_id',
+                                 self.image_meta)
+        self.mock_db.image_volume_cache_create.assert_called_once_with(
+            self.context, 'host@backend#pool', 'fake_image_id', 'fake_sum',
+            'fake_volume_id', 10)
+
+    def test_ensure_space_unlimited(self):
+        cache = self._build_cache()
+        self.assertTrue(cache.ensure_space(self.context, 1000, 'host'))
+        self.assertFalse(
+            self.mock_db.image_volume_cache_get_all_for_host.called)
+
+    def test_ensure_space_too_large(self):
+        cache = self._build_cache(max_gb=10)
+        self.assertFalse(cache.ensure_space(self.context, 11, 'host'))
+
+    def test_ensure_space_evicts_lru(self):
+        cache = self._build_cache(max_gb=30)
+        self.mock_db.image_volume_cache_get_all_for_host.return_value = [
+            self._entry(1), self._entry(2), self._entry(3)]
+
+        self.assertTrue(cache.ensure_space(self.context, 15,
+                                           'host@backend#pool'))
+
+        self.mock_db.image_volume_cache_get_all_for_host.\
+            assert_called_once_with(self.context, 'host@backend')
+        self.assertEqual(
+            [mock.call(self.context, 'volume1'),
+             mock.call(self.context, 'volume2')],
+            self.mock_db.image_volume_cache_delete.call_args_list)
+
+    def test_ensure_space_max_count(self):
+        cache = self._build_cache(max_count=2)
+        self.mock_db.image_volume_cache_get_all_for_host.return_value = [
+            self._entry(1), self._entry(2)]
+
+        self.assertTrue(cache.ensure_space(self.context, 15, 'host@backend'))
+
+        self.mock_db.image_volume_cache_delete.assert_called_once_with(
+            self.context, 'volume1')
+
+    def test_evict_volume_not_found(self):
+        cache = self._build_cache()
+        self.mock_db.volume_update.side_effect = exception.VolumeNotFound(
+            volume_id='volume1')
+
+        cache.evict(self.context, self._entry(1))
+
+        self.mock_db.image_volume_cache_delete.assert_called_once_with(
+            self.context, 'volume1')
+        self.assertFalse(self.mock_volume_rpcapi.delete_volume.called)
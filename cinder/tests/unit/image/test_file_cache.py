@@ -0,0 +1,104 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import time
+
+import fixtures
+import mock
+
+from cinder.image import file_cache
+from cinder import test
+
+
+class ImageFileCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ImageFileCacheTestCase, self).setUp()
+        self.cache_dir = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                      'cache')
+        self.cache = file_cache.ImageFileCache(self.cache_dir, 1024 * 1024)
+
+    def _write(self, data):
+        def _create(path):
+            with open(path, 'w') as f:
+                f.write(data)
+        return mock.Mock(side_effect=_create)
+
+    def _read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_get_miss_then_hit(self):
+        create = self._write('image data')
+
+        with self.cache.get('image1', create) as path:
+            self.assertEqual('image data', self._read(path))
+            link = path
+        with self.cache.get('image1', create) as path:
+            self.assertEqual('image data', self._read(path))
+
+        self.assertEqual(1, create.call_count)
+        self.assertFalse(os.path.exists(link))
+        self.assertEqual(['image1'], os.listdir(self.cache_dir))
+
+    def test_get_create_failure(self):
+        create = mock.Mock(side_effect=test.TestingException)
+
+        def _get():
+            with self.cache.get('image1', create):
+                pass
+
+        self.assertRaises(test.TestingException, _get)
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+    def test_evict_least_recently_used(self):
+        with self.cache.get('image1', self._write('1')):
+            pass
+        path = os.path.join(self.cache_dir, 'image1')
+        # Room for one entry only
+        self.cache.max_size = os.stat(path).st_blocks * 512
+        old = time.time() - 60
+        os.utime(path, (old, old))
+
+        with self.cache.get('image2', self._write('2')) as path:
+            self.assertEqual('2', self._read(path))
+
+        self.assertEqual(['image2'], os.listdir(self.cache_dir))
+
+    def test_evict_entry_in_use(self):
+        self.cache.max_size = 0
+
+        with self.cache.get('image1', self._write('image data')) as path:
+            self.assertEqual([os.path.basename(path)],
+                             os.listdir(self.cache_dir))
+            self.assertEqual('image data', self._read(path))
+
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+    def test_evict_stale_temp_files(self):
+        os.makedirs(self.cache_dir)
+        stale = os.path.join(self.cache_dir, file_cache.TEMP_PREFIX + 'old')
+        recent = os.path.join(self.cache_dir, file_cache.TEMP_PREFIX + 'new')
+        for path in (stale, recent):
+            open(path, 'w').close()
+        old = time.time() - file_cache.STALE_TEMP_FILE_AGE - 60
+        os.utime(stale, (old, old))
+
+        with self.cache.get('image1', self._write('1')):
+            pass
+
+        self.assertEqual(sorted(['image1', os.path.basename(recent)]),
+                         sorted(os.listdir(self.cache_dir)))
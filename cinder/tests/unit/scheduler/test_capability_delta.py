@@ -0,0 +1,90 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For capability delta encoding.
+"""
+
+import copy
+
+from cinder.scheduler import capability_delta
+from cinder import test
+
+
+class CapabilityDeltaTestCase(test.TestCase):
+    """Test case for capability delta encoding."""
+
+    def setUp(self):
+        super(CapabilityDeltaTestCase, self).setUp()
+        self.old = {
+            'volume_backend_name': 'lvm',
+            'reserved_percentage': 0,
+            'pools': [
+                {'pool_name': 'pool1', 'free_capacity_gb': 100,
+                 'thin_provisioning_support': True},
+                {'pool_name': 'pool2', 'free_capacity_gb': 200},
+            ],
+        }
+
+    def test_make_delta_unchanged(self):
+        self.assertEqual({}, capability_delta.make_delta(
+            self.old, copy.deepcopy(self.old)))
+
+    def test_make_delta(self):
+        new = copy.deepcopy(self.old)
+        new['driver_version'] = '1.0'
+        del new['reserved_percentage']
+        new['pools'][0]['free_capacity_gb'] = 90
+        del new['pools'][0]['thin_provisioning_support']
+        del new['pools'][1]
+        new['pools'].append({'pool_name': 'pool3', 'free_capacity_gb': 300})
+
+        delta = capability_delta.make_delta(self.old, new)
+
+        self.assertEqual(
+            {'updated': {'driver_version': '1.0'},
+             'removed': ['reserved_percentage'],
+             'pools': {
+                 'changed': {'pool1': {
+                     'updated': {'free_capacity_gb': 90},
+                     'removed': ['thin_provisioning_support']}},
+                 'added': [{'pool_name': 'pool3',
+                            'free_capacity_gb': 300}],
+                 'removed': ['pool2']}},
+            delta)
+        self.assertEqual(new, capability_delta.apply_delta(self.old, delta))
+
+    def test_make_delta_pools_without_names(self):
+        new = copy.deepcopy(self.old)
+        new['pools'] = [{'free_capacity_gb': 90}]
+
+        delta = capability_delta.make_delta(self.old, new)
+
+        self.assertEqual({'updated': {'pools': [{'free_capacity_gb': 90}]}},
+                         delta)
+        self.assertEqual(new, capability_delta.apply_delta(self.old, delta))
+
+    def test_apply_delta_keeps_capabilities(self):
+        old = copy.deepcopy(self.old)
+        delta = {'updated': {'reserved_percentage': 5},
+                 'pools': {'changed': {'pool2': {
+                     'updated': {'free_capacity_gb': 150}}}}}
+
+        new = capability_delta.apply_delta(old, delta)
+
+        self.assertEqual(self.old, old)
+        self.assertEqual(5, new['reserved_percentage'])
+        self.assertEqual(['pool1', 'pool2'],
+                         [pool['pool_name'] for pool in new['pools']])
+        self.assertEqual(150, new['pools'][1]['free_capacity_gb'])
@@ -0,0 +1,99 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For CapabilityIndex.
+"""
+
+from cinder.openstack.common.scheduler.filters import availability_zone_filter
+from cinder.openstack.common.scheduler.filters import capabilities_filter
+from cinder.scheduler import capability_index
+from cinder.scheduler.filters import capacity_filter
+from cinder import test
+from cinder.tests.unit.scheduler import fakes
+
+
+AZ_FILTER = availability_zone_filter.AvailabilityZoneFilter
+CAPS_FILTER = capabilities_filter.CapabilitiesFilter
+
+
+class CapabilityIndexTestCase(test.TestCase):
+    """Test case for CapabilityIndex class."""
+
+    def setUp(self):
+        super(CapabilityIndexTestCase, self).setUp()
+        self.pools = tuple(
+            fakes.FakeHostState(
+                'host%d' % i,
+                {'capabilities': {'volume_backend_name': 'lvm%d' % (i % 2),
+                                  'multiattach': i % 3 == 0,
+                                  'custom': [i]},
+                 'service': {'availability_zone': 'zone%d' % (i % 2)}})
+            for i in range(6))
+        self.index = capability_index.CapabilityIndex(self.pools)
+
+    def _select(self, extra_specs, availability_zone=None,
+                filter_classes=(AZ_FILTER, CAPS_FILTER)):
+        filter_properties = {
+            'resource_type': {'extra_specs': extra_specs},
+            'request_spec': {'resource_properties':
+                             {'availability_zone': availability_zone}}}
+        result = self.index.select(filter_properties, filter_classes)
+        return [pool.host for pool in result]
+
+    def test_select_exact_match(self):
+        self.assertEqual(['host1', 'host3', 'host5'],
+                         self._select({'volume_backend_name': 'lvm1'}))
+        self.assertEqual(['host0', 'host2', 'host4'],
+                         self._select({'capabilities:volume_backend_name':
+                                       'lvm0'}))
+        self.assertEqual([], self._select({'volume_backend_name': 'lvm2'}))
+
+    def test_select_is(self):
+        self.assertEqual(['host0', 'host3'],
+                         self._select({'multiattach': '<is> True'}))
+        self.assertEqual(['host3'],
+                         self._select({'multiattach': '<is> True',
+                                       'volume_backend_name': 'lvm1'}))
+
+    def test_select_availability_zone(self):
+        self.assertEqual(['host0', 'host2', 'host4'],
+                         self._select({}, availability_zone='zone0'))
+        self.assertEqual(['host0'],
+                         self._select({'multiattach': '<is> True'},
+                                      availability_zone='zone0'))
+
+    def test_select_not_indexed(self):
+        # Other operators, scopes and nested capabilities are left to the
+        # filters
+        for extra_specs in ({'volume_backend_name': '<in> lvm'},
+                            {'volume_backend_name': '<or> lvm0 <or> lvm1'},
+                            {'custom': 's== [0]'},
+                            {'qos:volume_backend_name': 'lvm3'},
+                            {'capabilities:custom:nested': 'value'}):
+            self.assertIs(self.pools, self.index.select(
+                {'resource_type': {'extra_specs': extra_specs}},
+                [AZ_FILTER, CAPS_FILTER]))
+
+    def test_select_only_for_run_filters(self):
+        extra_specs = {'volume_backend_name': 'lvm1'}
+        self.assertEqual(6, len(self._select(
+            extra_specs, availability_zone='zone0',
+            filter_classes=[capacity_filter.CapacityFilter])))
+        self.assertEqual(['host1', 'host3', 'host5'],
+                         self._select(extra_specs, availability_zone='zone0',
+                                      filter_classes=[CAPS_FILTER]))
+        self.assertEqual(['host0', 'host2', 'host4'],
+                         self._select(extra_specs, availability_zone='zone0',
+                                      filter_classes=[AZ_FILTER]))
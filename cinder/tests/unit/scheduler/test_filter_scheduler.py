@@ -162,6 +162,128 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertIsNotNone(weighed_host.obj)
         self.assertTrue(_mock_service_get_all_by_topic.called)
 
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_schedule_traced(self, _mock_service_get_all_by_topic):
+        # A traced placement shows in the placement stats.
+        self.flags(scheduler_trace_sample_rate=1)
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+
+        request_spec = {'volume_id': 'fake-id',
+                        'volume_type': {'name': 'LVM_iSCSI'},
+                        'volume_properties': {'project_id': 1,
+                                              'size': 1}}
+        weighed_host = sched._schedule(fake_context, request_spec, {})
+
+        stats = sched.get_placement_stats(fake_context)
+        trace = stats['traces'][-1]
+        self.assertEqual('fake-id', trace['volume_id'])
+        self.assertEqual(weighed_host.obj.host, trace['chosen_host'])
+        self.assertEqual(['CapabilityIndex', 'AvailabilityZoneFilter',
+                          'CapacityFilter', 'CapabilitiesFilter'],
+                         [stage['name'] for stage in trace['filters']])
+        self.assertEqual(['CapacityWeigher'],
+                         [stage['name'] for stage in trace['weighers']])
+        self.assertIn('filter:CapacityFilter', stats['histograms'])
+        self.assertEqual(1, stats['histograms']['schedule']['count'])
+
+    def test_schedule_traced_no_valid_host(self):
+        self.flags(scheduler_trace_sample_rate=1)
+        sched = fakes.FakeFilterScheduler()
+        fake_context = context.RequestContext('user', 'project')
+        request_spec = {'volume_id': 'fake-id'}
+        filter_properties = {'request_spec': {'volume_type': None}}
+
+        with mock.patch.object(sched, '_get_weighted_candidates',
+                               return_value=[]):
+            self.assertIsNone(sched._schedule(fake_context, request_spec,
+                                              filter_properties))
+
+        trace = sched.get_placement_stats(fake_context)['traces'][-1]
+        self.assertIsNone(trace['chosen_host'])
+        self.assertIsNotNone(trace['error'])
+
+    @mock.patch('cinder.scheduler.driver.volume_update_db')
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_schedule_create_volumes(self, _mock_service_get_all_by_topic,
+                                     _mock_volume_update_db):
+        # Volumes of a batch consume the capacity of the pools they are
+        # placed on, the creates are cast once all of them are placed.
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+
+        request_spec_list = [
+            {'volume_id': 'fake-id%d' % i,
+             'volume_type': {'name': 'LVM_iSCSI',
+                             'extra_specs': {'volume_backend_name': 'lvm3'}},
+             'volume_properties': {'project_id': 1,
+                                   'size': 100}}
+            for i in range(3)]
+        filter_properties_list = [{}, None, {}]
+
+        def _fake_create_volume(*args, **kwargs):
+            self.assertEqual(2, _mock_volume_update_db.call_count)
+
+        with mock.patch.object(sched.volume_rpcapi,
+                               'create_volume') as _mock_create_volume, \
+                mock.patch.object(
+                    sched.host_manager, 'get_all_host_states',
+                    wraps=sched.host_manager.get_all_host_states) as \
+                _mock_get_all_host_states:
+            _mock_create_volume.side_effect = _fake_create_volume
+            failures = sched.schedule_create_volumes(fake_context,
+                                                     request_spec_list,
+                                                     filter_properties_list)
+
+        # host3 has 256 GB free, so only two volumes fit
+        self.assertEqual(1, len(failures))
+        self.assertIs(request_spec_list[2], failures[0][0])
+        self.assertIsInstance(failures[0][1], exception.NoValidHost)
+        self.assertEqual(2, _mock_create_volume.call_count)
+        _mock_volume_update_db.assert_has_calls(
+            [mock.call(fake_context, 'fake-id0', 'host3#lvm3'),
+             mock.call(fake_context, 'fake-id1', 'host3#lvm3')])
+        _mock_get_all_host_states.assert_called_once_with(mock.ANY)
+
+    @mock.patch('cinder.scheduler.driver.volume_update_db')
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_schedule_create_volumes_cast_failure(
+            self, _mock_service_get_all_by_topic, _mock_volume_update_db):
+        # Only the volumes whose create was not cast are failures
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+
+        request_spec_list = [
+            {'volume_id': 'fake-id%d' % i,
+             'volume_type': {'name': 'LVM_iSCSI'},
+             'volume_properties': {'project_id': 1,
+                                   'size': 1}}
+            for i in range(3)]
+        ex = exception.CinderException()
+
+        with mock.patch.object(sched.volume_rpcapi,
+                               'create_volume') as _mock_create_volume:
+            _mock_create_volume.side_effect = [None, ex]
+            failures = sched.schedule_create_volumes(fake_context,
+                                                     request_spec_list,
+                                                     [{}, {}, {}])
+
+        self.assertEqual([(request_spec_list[1], ex),
+                          (request_spec_list[2], ex)], failures)
+        self.assertEqual(2, _mock_create_volume.call_count)
+
     def test_max_attempts(self):
         self.flags(scheduler_max_attempts=4)
 
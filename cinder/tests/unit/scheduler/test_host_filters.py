@@ -700,6 +700,55 @@ class AffinityFilterTestCase(HostFiltersTestCase):
 
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
+    def test_same_filter_filter_all_single_query(self):
+        filt_cls = self.class_map['SameBackendFilter']()
+        hosts = [fakes.FakeHostState('host1#pool%d' % i, {})
+                 for i in range(5)]
+        volume = utils.create_volume(self.context, host='host1#pool3')
+        vol_id = volume.id
+
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+            'same_host': [vol_id], }}
+
+        with mock.patch.object(filt_cls.volume_api, 'get_all',
+                               wraps=filt_cls.volume_api.get_all) as get_all:
+            result = list(filt_cls.filter_all(hosts, filter_properties))
+
+        self.assertEqual(1, get_all.call_count)
+        self.assertEqual(['host1#pool3'], [h.host for h in result])
+
+    def test_different_filter_filter_all_single_query(self):
+        filt_cls = self.class_map['DifferentBackendFilter']()
+        hosts = [fakes.FakeHostState('host1#pool%d' % i, {})
+                 for i in range(5)]
+        volume = utils.create_volume(self.context, host='host1#pool3')
+        vol_id = volume.id
+
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+            'different_host': [vol_id], }}
+
+        with mock.patch.object(filt_cls.volume_api, 'get_all',
+                               wraps=filt_cls.volume_api.get_all) as get_all:
+            result = list(filt_cls.filter_all(hosts, filter_properties))
+
+        self.assertEqual(1, get_all.call_count)
+        self.assertEqual(['host1#pool0', 'host1#pool1', 'host1#pool2',
+                          'host1#pool4'], [h.host for h in result])
+
+    def test_different_filter_filter_all_nonuuid_hint(self):
+        filt_cls = self.class_map['DifferentBackendFilter']()
+        hosts = [fakes.FakeHostState('host1', {}),
+                 fakes.FakeHostState('host2', {})]
+
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+            'different_host': "NOT-a-valid-UUID", }}
+
+        self.assertEqual([], list(filt_cls.filter_all(hosts,
+                                                      filter_properties)))
+
 
 class DriverFilterTestCase(HostFiltersTestCase):
     def test_passing_function(self):
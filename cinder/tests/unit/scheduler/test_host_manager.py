@@ -23,6 +23,8 @@ from oslo_utils import timeutils
 from cinder import exception
 from cinder.openstack.common.scheduler import filters
 from cinder.scheduler import host_manager
+from cinder.scheduler import tracing
+from cinder.scheduler.weights import capacity
 from cinder import test
 
 
@@ -84,6 +86,40 @@ class HostManagerTestCase(test.TestCase):
         self.assertEqual(expected, mock_func.call_args_list)
         self.assertEqual(set(result), set(self.fake_hosts))
 
+    @mock.patch('cinder.scheduler.host_manager.HostManager.'
+                '_choose_host_weighers')
+    @mock.patch('cinder.scheduler.host_manager.HostManager.'
+                '_choose_host_filters')
+    def test_get_filtered_and_weighed_hosts_traced(
+            self, _mock_choose_host_filters, _mock_choose_host_weighers):
+        _mock_choose_host_filters.return_value = [FakeFilterClass1,
+                                                  FakeFilterClass2]
+        _mock_choose_host_weighers.return_value = [
+            capacity.AllocatedCapacityWeigher]
+        trace = tracing.PlacementTrace('fake-id')
+
+        with mock.patch.object(FakeFilterClass1, '_filter_one',
+                               side_effect=[True, True, False, True]), \
+                mock.patch.object(FakeFilterClass2, '_filter_one',
+                                  side_effect=[False, True, True]):
+            hosts = self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                                         {}, trace=trace)
+        self.assertEqual(self.fake_hosts[1:2] + self.fake_hosts[3:], hosts)
+        self.assertEqual(
+            [('FakeFilterClass1', 4, 3, ['fake_host3']),
+             ('FakeFilterClass2', 3, 2, ['fake_host1'])],
+            [(stage['name'], stage['hosts_in'], stage['hosts_out'],
+              stage['removed']) for stage in trace.filters])
+
+        for host_state, allocated in zip(hosts, [20, 10]):
+            host_state.allocated_capacity_gb = allocated
+        weighed_hosts = self.host_manager.get_weighed_hosts(hosts, {},
+                                                            trace=trace)
+        self.assertEqual(['fake_host4', 'fake_host2'],
+                         [weighed.obj.host for weighed in weighed_hosts])
+        self.assertEqual(['AllocatedCapacityWeigher'],
+                         [stage['name'] for stage in trace.weighers])
+
     @mock.patch('oslo_utils.timeutils.utcnow')
     def test_update_service_capabilities(self, _mock_utcnow):
         service_states = self.host_manager.service_states
@@ -116,6 +152,58 @@ class HostManagerTestCase(test.TestCase):
                     'host3': host3_volume_capabs}
         self.assertDictMatch(service_states, expected)
 
+    @mock.patch('oslo_utils.timeutils.utcnow')
+    def test_update_service_capabilities_delta(self, _mock_utcnow):
+        _mock_utcnow.side_effect = [31337, 31338]
+        capabs = dict(total_capacity_gb=8192,
+                      pools=[dict(pool_name='pool1', free_capacity_gb=4321),
+                             dict(pool_name='pool2', free_capacity_gb=5432)])
+        delta = {'updated': {'total_capacity_gb': 4096},
+                 'pools': {'changed': {'pool1': {
+                           'updated': {'free_capacity_gb': 1234}}},
+                           'removed': ['pool2']}}
+
+        self.host_manager.update_service_capabilities('volume', 'host1',
+                                                      capabs, seq=1)
+        self.host_manager.update_service_capabilities('volume', 'host1',
+                                                      None, seq=2,
+                                                      delta=delta)
+
+        expected = dict(total_capacity_gb=4096, timestamp=31338,
+                        pools=[dict(pool_name='pool1',
+                                    free_capacity_gb=1234)])
+        self.assertEqual(expected, self.host_manager.service_states['host1'])
+        # The capabilities first received are left untouched
+        self.assertEqual(2, len(capabs['pools']))
+
+    @mock.patch('oslo_utils.timeutils.utcnow')
+    def test_update_service_capabilities_delta_out_of_sequence(
+            self, _mock_utcnow):
+        _mock_utcnow.side_effect = [31337, 31338]
+        capabs = dict(free_capacity_gb=4321)
+        delta = {'updated': {'free_capacity_gb': 1234}}
+
+        # No capabilities to merge into yet
+        self.host_manager.update_service_capabilities('volume', 'host1',
+                                                      None, seq=3,
+                                                      delta=delta)
+        self.assertNotIn('host1', self.host_manager.service_states)
+
+        self.host_manager.update_service_capabilities('volume', 'host1',
+                                                      capabs, seq=1)
+        # Update 2 was missed
+        self.host_manager.update_service_capabilities('volume', 'host1',
+                                                      None, seq=3,
+                                                      delta=delta)
+        self.assertEqual(dict(free_capacity_gb=4321, timestamp=31337),
+                         self.host_manager.service_states['host1'])
+
+        # A full update starts the sequence again
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(free_capacity_gb=5432), seq=4)
+        self.assertEqual(dict(free_capacity_gb=5432, timestamp=31338),
+                         self.host_manager.service_states['host1'])
+
     @mock.patch('cinder.utils.service_is_up')
     @mock.patch('cinder.db.service_get_all_by_topic')
     def test_has_all_capabilities(self, _mock_service_get_all_by_topic,
@@ -206,6 +294,8 @@ class HostManagerTestCase(test.TestCase):
                                  _mock_service_get_all_by_topic):
         context = 'fake_context'
         topic = CONF.volume_topic
+        # Read the services for each request
+        self.flags(scheduler_host_state_refresh_interval=0)
 
         services = [
             dict(id=1, host='host1', topic='volume', disabled=False,
@@ -286,6 +376,63 @@ class HostManagerTestCase(test.TestCase):
             self.assertEqual(host_state_map[host].service,
                              volume_node)
 
+    @mock.patch.object(host_manager, 'time')
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    @mock.patch('cinder.utils.service_is_up')
+    def test_get_host_states_snapshot(self, _mock_service_is_up,
+                                      _mock_service_get_all_by_topic,
+                                      _mock_time):
+        context = 'fake_context'
+        self.flags(scheduler_host_state_refresh_interval=10)
+
+        services = [
+            dict(id=1, host='host1', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+            dict(id=2, host='host2', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+        ]
+        _mock_service_get_all_by_topic.return_value = services
+        _mock_service_is_up.return_value = True
+        _mock_time.time.return_value = 100
+
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(volume_backend_name='AAA',
+                                    free_capacity_gb=200))
+        snapshot = self.host_manager.get_host_states_snapshot(context)
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+        self.assertEqual(['host1#AAA'],
+                         [pool.host for pool in snapshot.pools])
+
+        # Until the services are out of date, the same snapshot is returned
+        # without reading them again
+        _mock_time.time.return_value = 105
+        self.assertIs(snapshot,
+                      self.host_manager.get_host_states_snapshot(context))
+        self.assertEqual(snapshot.pools,
+                         self.host_manager.get_all_host_states(context))
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+
+        # Updates from a host known to be up are applied right away
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(volume_backend_name='AAA',
+                                    free_capacity_gb=100))
+        new_snapshot = self.host_manager.get_host_states_snapshot(context)
+        self.assertGreater(new_snapshot.version, snapshot.version)
+        self.assertEqual(100, new_snapshot.pools[0].free_capacity_gb)
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+
+        # The others wait for the next read of the services
+        self.host_manager.update_service_capabilities(
+            'volume', 'host2', dict(volume_backend_name='BBB',
+                                    free_capacity_gb=300))
+        self.assertEqual(
+            1, len(self.host_manager.get_host_states_snapshot(context).pools))
+        _mock_time.time.return_value = 110
+        snapshot = self.host_manager.get_host_states_snapshot(context)
+        self.assertEqual(2, _mock_service_get_all_by_topic.call_count)
+        self.assertEqual(['host1#AAA', 'host2#BBB'],
+                         sorted(pool.host for pool in snapshot.pools))
+
     @mock.patch('cinder.db.service_get_all_by_topic')
     @mock.patch('cinder.utils.service_is_up')
     def test_get_pools(self, _mock_service_is_up,
@@ -87,6 +87,49 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  capabilities='fake_capabilities',
                                  fanout=True)
 
+    @mock.patch('oslo_messaging.RPCClient.can_send_version',
+                return_value=True)
+    def test_update_service_capabilities_full(self, can_send_version):
+        self._test_scheduler_api('update_service_capabilities',
+                                 rpc_method='cast',
+                                 service_name='fake_name',
+                                 host='fake_host',
+                                 capabilities='fake_capabilities',
+                                 seq=1,
+                                 delta=None,
+                                 fanout=True,
+                                 version='1.10')
+        can_send_version.assert_called_once_with('1.10')
+
+    @mock.patch('oslo_messaging.RPCClient.can_send_version',
+                return_value=True)
+    def test_update_service_capabilities_delta(self, can_send_version):
+        self._test_scheduler_api('update_service_capabilities',
+                                 rpc_method='cast',
+                                 service_name='fake_name',
+                                 host='fake_host',
+                                 capabilities=None,
+                                 seq=2,
+                                 delta={'updated': {'fake': 'fake_value'}},
+                                 fanout=True,
+                                 version='1.10')
+        can_send_version.assert_called_once_with('1.10')
+
+    @mock.patch('oslo_messaging.RPCClient.can_send_version',
+                return_value=False)
+    def test_update_service_capabilities_old_scheduler(self,
+                                                       can_send_version):
+        # Only the full capabilities are sent, with the default version.
+        self._test_scheduler_api('update_service_capabilities',
+                                 rpc_method='cast',
+                                 service_name='fake_name',
+                                 host='fake_host',
+                                 capabilities='fake_capabilities',
+                                 seq=2,
+                                 delta={'updated': {'fake': 'fake_value'}},
+                                 fanout=True)
+        can_send_version.assert_called_once_with('1.10')
+
     def test_create_volume(self):
         self._test_scheduler_api('create_volume',
                                  rpc_method='cast',
@@ -98,6 +141,14 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  filter_properties='filter_properties',
                                  version='1.2')
 
+    def test_create_volumes(self):
+        self._test_scheduler_api('create_volumes',
+                                 rpc_method='cast',
+                                 topic='topic',
+                                 request_spec_list=['fake_request_spec'],
+                                 filter_properties_list=['filter_properties'],
+                                 version='1.8')
+
     def test_migrate_volume_to_host(self):
         self._test_scheduler_api('migrate_volume_to_host',
                                  rpc_method='cast',
@@ -127,6 +178,11 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  filter_properties='filter_properties',
                                  version='1.5')
 
+    def test_get_placement_stats(self):
+        self._test_scheduler_api('get_placement_stats',
+                                 rpc_method='call',
+                                 version='1.9')
+
     def test_get_pools(self):
         self._test_scheduler_api('get_pools',
                                  rpc_method='call',
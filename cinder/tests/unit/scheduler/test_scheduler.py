@@ -76,7 +76,8 @@ class SchedulerManagerTestCase(test.TestCase):
         self.manager.update_service_capabilities(self.context,
                                                  service_name=service,
                                                  host=host)
-        _mock_update_cap.assert_called_once_with(service, host, {})
+        _mock_update_cap.assert_called_once_with(service, host, {},
+                                                 seq=None, delta=None)
 
     @mock.patch('cinder.scheduler.driver.Scheduler.'
                 'update_service_capabilities')
@@ -90,7 +91,24 @@ class SchedulerManagerTestCase(test.TestCase):
                                                  service_name=service,
                                                  host=host,
                                                  capabilities=capabilities)
-        _mock_update_cap.assert_called_once_with(service, host, capabilities)
+        _mock_update_cap.assert_called_once_with(service, host, capabilities,
+                                                 seq=None, delta=None)
+
+    @mock.patch('cinder.scheduler.driver.Scheduler.'
+                'update_service_capabilities')
+    def test_update_service_capabilities_delta(self, _mock_update_cap):
+        # Test a delta is not replaced by empty capabilities
+        service = 'fake_service'
+        host = 'fake_host'
+        delta = {'updated': {'fake_capability': 'fake_value'}}
+
+        self.manager.update_service_capabilities(self.context,
+                                                 service_name=service,
+                                                 host=host,
+                                                 seq=2,
+                                                 delta=delta)
+        _mock_update_cap.assert_called_once_with(service, host, None,
+                                                 seq=2, delta=delta)
 
     @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
     @mock.patch('cinder.db.volume_update')
@@ -112,6 +130,34 @@ class SchedulerManagerTestCase(test.TestCase):
         _mock_sched_create.assert_called_once_with(self.context, request_spec,
                                                    {})
 
+    @mock.patch('cinder.rpc.get_notifier')
+    @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
+    @mock.patch('cinder.db.volume_update')
+    def test_create_volumes_puts_failed_volumes_in_error_state(
+            self, _mock_volume_update, _mock_sched_create, _mock_notifier):
+        # Test a batch where one of the volumes can't be placed.
+        # Only that volume is put in 'error' state.
+        _mock_sched_create.side_effect = [
+            None, exception.NoValidHost(reason=""), None]
+        topic = 'fake_topic'
+        request_spec_list = [{'volume_id': 1}, {'volume_id': 2},
+                             {'volume_id': 3}]
+
+        self.manager.create_volumes(self.context, topic, request_spec_list,
+                                    filter_properties_list=[{}, None, {}])
+        _mock_volume_update.assert_called_once_with(self.context, 2,
+                                                    {'status': 'error'})
+        _mock_sched_create.assert_has_calls(
+            [mock.call(self.context, {'volume_id': 1}, {}),
+             mock.call(self.context, {'volume_id': 2}, {}),
+             mock.call(self.context, {'volume_id': 3}, {})])
+        # Notified like a failed create_volume
+        _mock_notifier.return_value.error.assert_called_once_with(
+            self.context, 'scheduler.create_volume', mock.ANY)
+        payload = _mock_notifier.return_value.error.call_args[0][2]
+        self.assertEqual(2, payload['volume_id'])
+        self.assertEqual('error', payload['state'])
+
     @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
     @mock.patch('eventlet.sleep')
     def test_create_volume_no_delay(self, _mock_sleep, _mock_sched_create):
@@ -308,6 +354,10 @@ class SchedulerDriverBaseTestCase(SchedulerTestCase):
                           self.context, self.topic, 'schedule_something',
                           *fake_args, **fake_kwargs)
 
+    def test_get_placement_stats(self):
+        self.assertEqual({'histograms': {}, 'traces': []},
+                         self.driver.get_placement_stats(self.context))
+
 
 class SchedulerDriverModuleTestCase(test.TestCase):
     """Test case for scheduler driver module methods."""
@@ -0,0 +1,124 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For scheduler placement tracing.
+"""
+
+from cinder import exception
+from cinder.scheduler import host_manager
+from cinder.scheduler import tracing
+from cinder import test
+
+
+class LatencyHistogramTestCase(test.TestCase):
+    """Test case for LatencyHistogram class."""
+
+    def test_observe(self):
+        histogram = tracing.LatencyHistogram()
+        for elapsed_ms in (0.5, 1, 1.5, 30, 20000):
+            histogram.observe(elapsed_ms)
+
+        result = histogram.to_dict()
+        self.assertEqual(5, result['count'])
+        self.assertEqual(20033, result['sum_ms'])
+        self.assertEqual(20000, result['max_ms'])
+        counts = {bucket['le_ms']: bucket['count']
+                  for bucket in result['buckets']}
+        self.assertEqual(2, counts[1])
+        self.assertEqual(1, counts[2])
+        self.assertEqual(1, counts[50])
+        self.assertEqual(1, counts[None])
+        self.assertEqual(5, sum(counts.values()))
+
+
+class PlacementTracerTestCase(test.TestCase):
+    """Test case for PlacementTracer class."""
+
+    def setUp(self):
+        super(PlacementTracerTestCase, self).setUp()
+        self.hosts = [host_manager.HostState('host%d' % i)
+                      for i in range(3)]
+
+    def test_trace(self):
+        tracer = tracing.PlacementTracer()
+        with tracer.trace('fake-id') as trace:
+            trace.add_filter('FakeFilter', self.hosts, self.hosts[1:], 2.0)
+            trace.add_weigher('FakeWeigher', 1.0)
+            trace.chosen_host = 'host1'
+
+        stats = tracer.get_stats()
+        self.assertEqual(1, len(stats['traces']))
+        result = stats['traces'][0]
+        self.assertEqual('fake-id', result['volume_id'])
+        self.assertEqual('host1', result['chosen_host'])
+        self.assertIsNone(result['error'])
+        self.assertEqual([{'name': 'FakeFilter', 'hosts_in': 3,
+                           'hosts_out': 2, 'removed': ['host0'],
+                           'elapsed_ms': 2.0}], result['filters'])
+        self.assertEqual([{'name': 'FakeWeigher', 'elapsed_ms': 1.0}],
+                         result['weighers'])
+        self.assertEqual(set(['schedule', 'filter:FakeFilter',
+                              'weigher:FakeWeigher']),
+                         set(stats['histograms']))
+        self.assertEqual(1, stats['histograms']['schedule']['count'])
+
+    def test_trace_error(self):
+        tracer = tracing.PlacementTracer()
+
+        def _schedule():
+            with tracer.trace('fake-id'):
+                raise exception.NoValidHost(reason='fake reason')
+
+        self.assertRaises(exception.NoValidHost, _schedule)
+        result = tracer.get_stats()['traces'][0]
+        self.assertIn('fake reason', result['error'])
+        self.assertIsNone(result['chosen_host'])
+
+    def test_trace_history_size(self):
+        self.flags(scheduler_trace_history_size=2)
+        self.flags(scheduler_trace_sample_rate=1)
+        tracer = tracing.PlacementTracer()
+        for i in range(3):
+            with tracer.trace('fake-id%d' % i):
+                pass
+
+        stats = tracer.get_stats()
+        self.assertEqual(['fake-id1', 'fake-id2'],
+                         [trace['volume_id'] for trace in stats['traces']])
+        self.assertEqual(3, stats['histograms']['schedule']['count'])
+
+    def test_trace_sampled(self):
+        self.flags(scheduler_trace_sample_rate=2)
+        tracer = tracing.PlacementTracer()
+        traces = []
+        for i in range(3):
+            with tracer.trace('fake-id%d' % i) as trace:
+                traces.append(trace)
+
+        self.assertIsNone(traces[1])
+        stats = tracer.get_stats()
+        self.assertEqual(['fake-id0', 'fake-id2'],
+                         [t['volume_id'] for t in stats['traces']])
+        self.assertEqual(3, stats['histograms']['schedule']['count'])
+
+    def test_trace_disabled(self):
+        self.flags(scheduler_trace_sample_rate=0)
+        tracer = tracing.PlacementTracer()
+        with tracer.trace('fake-id') as trace:
+            self.assertIsNone(trace)
+
+        stats = tracer.get_stats()
+        self.assertEqual([], stats['traces'])
+        self.assertEqual(['schedule'], list(stats['histograms']))
@@ -46,6 +46,11 @@ def fake_volume_data_get_for_host(context, host, count_only=False):
         return 6
 
 
+def fake_volume_count_get_for_hosts(context, hosts):
+    return {host: fake_volume_data_get_for_host(context, host)
+            for host in hosts}
+
+
 class VolumeNumberWeigherTestCase(test.TestCase):
     def setUp(self):
         super(VolumeNumberWeigherTestCase, self).setUp()
@@ -82,8 +87,8 @@ class VolumeNumberWeigherTestCase(test.TestCase):
         # host4: 4 volumes
         # host5: 5 volumes
         # so, host1 should win:
-        with mock.patch.object(api, 'volume_data_get_for_host',
-                               fake_volume_data_get_for_host):
+        with mock.patch.object(api, 'volume_count_get_for_hosts',
+                               fake_volume_count_get_for_hosts):
             weighed_host = self._get_weighed_host(hostinfo_list)
             self.assertEqual(weighed_host.weight, -1.0)
             self.assertEqual(utils.extract_host(weighed_host.obj.host),
@@ -99,9 +104,19 @@ class VolumeNumberWeigherTestCase(test.TestCase):
         # host4: 4 volumes
         # host5: 5 volumes
         # so, host5 should win:
-        with mock.patch.object(api, 'volume_data_get_for_host',
-                               fake_volume_data_get_for_host):
+        with mock.patch.object(api, 'volume_count_get_for_hosts',
+                               fake_volume_count_get_for_hosts):
             weighed_host = self._get_weighed_host(hostinfo_list)
             self.assertEqual(weighed_host.weight, 5.0)
             self.assertEqual(utils.extract_host(weighed_host.obj.host),
                              'host5')
+
+    def test_volume_number_single_query(self):
+        hostinfo_list = self._get_all_hosts()
+
+        with mock.patch.object(
+                api, 'volume_count_get_for_hosts',
+                side_effect=fake_volume_count_get_for_hosts) as mock_count:
+            self._get_weighed_host(hostinfo_list)
+        mock_count.assert_called_once_with(
+            mock.ANY, [host_state.host for host_state in hostinfo_list])
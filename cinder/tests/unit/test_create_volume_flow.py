@@ -123,6 +123,30 @@ class CreateVolumeFlowTestCase(test.TestCase):
 
         task._cast_create_volume(self.ctxt, spec, props)
 
+    def test_cast_create_volume_batch(self):
+
+        props = {}
+        spec = {'volume_id': 1,
+                'source_volid': None,
+                'snapshot_id': None,
+                'image_id': None,
+                'source_replicaid': None,
+                'consistencygroup_id': None,
+                'cgsnapshot_id': None}
+        scheduler_rpcapi = mock.Mock()
+        scheduler_batch = []
+
+        task = create_volume.VolumeCastTask(
+            scheduler_rpcapi,
+            fake_volume_api(spec, self),
+            fake_db(),
+            scheduler_batch=scheduler_batch)
+
+        task._cast_create_volume(self.ctxt, spec, props)
+
+        self.assertEqual([(spec, props)], scheduler_batch)
+        self.assertFalse(scheduler_rpcapi.create_volume.called)
+
 
 class CreateVolumeFlowManagerTestCase(test.TestCase):
 
@@ -170,3 +194,95 @@ class CreateVolumeFlowManagerTestCase(test.TestCase):
                           volume, snapshot_obj.id)
         fake_driver.create_volume_from_snapshot.assert_called_once_with(
             volume, snapshot_obj)
+
+
+class CreateVolumeFromImageCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(CreateVolumeFromImageCacheTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        self.internal_ctxt = context.RequestContext('internal_user',
+                                                    'internal_project',
+                                                    is_admin=True)
+        self.mock_db = mock.MagicMock()
+        self.mock_driver = mock.MagicMock()
+        self.mock_driver.clone_image.return_value = (None, False)
+        self.mock_cache = mock.MagicMock()
+        self.task = create_volume_manager.CreateVolumeFromSpecTask(
+            self.mock_db, self.mock_driver, self.mock_cache)
+        self.volume = fake_volume.fake_db_volume(host='host@backend#pool',
+                                                 size=10,
+                                                 volume_type_id=None)
+        self.image_meta = {'id': 'fake_image_id', 'checksum': 'fake_sum'}
+
+        patcher = mock.patch('cinder.context.get_internal_tenant_context',
+                             return_value=self.internal_ctxt)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(create_volume_manager.
+                                    CreateVolumeFromSpecTask,
+                                    '_handle_bootable_volume_glance_meta')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create_from_image(self):
+        return self.task._create_from_image(self.ctxt, self.volume,
+                                            'fake_location', 'fake_image_id',
+                                            self.image_meta,
+                                            mock.sentinel.image_service)
+
+    def test_create_from_image_cache_hit(self):
+        cache_entry = {'id': 1, 'volume_id': 'image_volume_id'}
+        image_volume = {'id': 'image_volume_id', 'status': 'available'}
+        self.mock_cache.get_entry.return_value = cache_entry
+        self.mock_db.image_volume_cache_get_by_volume_id.return_value = (
+            cache_entry)
+        self.mock_db.volume_get.return_value = image_volume
+
+        self._create_from_image()
+
+        self.mock_cache.get_entry.assert_called_once_with(
+            self.internal_ctxt, self.volume, 'fake_image_id', self.image_meta)
+        self.mock_driver.create_cloned_volume.assert_called_once_with(
+            self.volume, image_volume)
+        self.assertFalse(self.mock_driver.create_volume.called)
+        self.assertFalse(self.mock_cache.create_cache_entry.called)
+
+    @mock.patch.object(create_volume_manager, 'QUOTAS')
+    @mock.patch.object(create_volume_manager.CreateVolumeFromSpecTask,
+                       '_copy_image_to_volume')
+    def test_create_from_image_cache_miss(self, mock_copy, mock_quotas):
+        self.mock_cache.get_entry.return_value = None
+        self.mock_cache.ensure_space.return_value = True
+        self.mock_db.volume_update.side_effect = [self.volume,
+                                                  mock.sentinel.image_volume]
+        image_volume = {'id': 'image_volume_id'}
+        self.mock_db.volume_create.return_value = image_volume
+
+        self._create_from_image()
+
+        self.mock_driver.create_volume.assert_called_once_with(self.volume)
+        self.assertTrue(mock_copy.called)
+        self.mock_cache.ensure_space.assert_called_once_with(
+            self.internal_ctxt, 10, 'host@backend#pool')
+        values = self.mock_db.volume_create.call_args[0][1]
+        self.assertEqual('internal_project', values['project_id'])
+        self.assertEqual('host@backend#pool', values['host'])
+        self.mock_driver.create_cloned_volume.assert_called_once_with(
+            image_volume, self.volume)
+        self.mock_cache.create_cache_entry.assert_called_once_with(
+            self.internal_ctxt, mock.sentinel.image_volume, 'fake_image_id',
+            self.image_meta)
+        self.assertTrue(mock_quotas.commit.called)
+
+    @mock.patch.object(create_volume_manager.CreateVolumeFromSpecTask,
+                       '_copy_image_to_volume')
+    def test_create_from_image_cache_full(self, mock_copy):
+        self.mock_cache.get_entry.return_value = None
+        self.mock_cache.ensure_space.return_value = False
+
+        self._create_from_image()
+
+        self.assertTrue(mock_copy.called)
+        self.assertFalse(self.mock_db.volume_create.called)
+        self.assertFalse(self.mock_driver.create_cloned_volume.called)
@@ -17,11 +17,14 @@
 import datetime
 
 import enum
+import mock
 from oslo_config import cfg
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 import six
 
 from cinder.api import common
+from cinder.common import sqlalchemyutils
 from cinder import context
 from cinder import db
 from cinder.db.sqlalchemy import api as sqlalchemy_api
@@ -295,6 +298,22 @@ class DBAPIVolumeTestCase(BaseTest):
                              db.volume_data_get_for_host(
                                  self.ctxt, 'h%d@lvmdriver-1' % i))
 
+    def test_volume_count_get_for_hosts(self):
+        for host in ('h1@lvm#pool1', 'h1@lvm#pool1', 'h1@lvm#pool2',
+                     'h1@lvm', 'h2@lvm#pool1', 'h1@lvm#pool1#sub'):
+            db.volume_create(self.ctxt, {'host': host})
+        db.volume_create(self.ctxt, {'host': None})
+
+        hosts = ['h1@lvm', 'h1@lvm#pool1', 'h1@lvm#pool2', 'h2@lvm#pool1',
+                 'h3@lvm#pool1']
+        counts = db.volume_count_get_for_hosts(self.ctxt, hosts)
+        self.assertEqual({'h1@lvm': 5, 'h1@lvm#pool1': 3, 'h1@lvm#pool2': 1,
+                          'h2@lvm#pool1': 1, 'h3@lvm#pool1': 0}, counts)
+        for host in hosts:
+            self.assertEqual(db.volume_data_get_for_host(self.ctxt, host,
+                                                         count_only=True),
+                             counts[host])
+
     def test_volume_data_get_for_project(self):
         for i in range(THREE):
             for j in range(THREE):
@@ -360,6 +379,17 @@ class DBAPIVolumeTestCase(BaseTest):
         self._assertEqualListsOfObjects(volumes, db.volume_get_all(
                                         self.ctxt, None, None, ['host'], None))
 
+    def test_volume_get_all_without_joined_load(self):
+        volume = db.volume_create(self.ctxt, {'host': 'h1',
+                                              'metadata': {'k': 'v'}})
+        volumes = db.volume_get_all(self.ctxt, None, None,
+                                    filters={'metadata': {'k': 'v'}},
+                                    joined_load=False)
+        self.assertEqual([volume['id']], [v['id'] for v in volumes])
+        # The metadata matched, but is not loaded along with the volume
+        self.assertEqual([], volumes[0].volume_metadata)
+        self.assertNotIn('volume_type', volumes[0].__dict__)
+
     def test_volume_get_all_marker_passed(self):
         volumes = [
             db.volume_create(self.ctxt, {'id': 1}),
@@ -873,6 +903,25 @@ class DBAPIVolumeTestCase(BaseTest):
                     marker = vols[-1]['id']
                     self.assertEqual(correct[-1]['id'], marker)
 
+    def test_volume_get_all_paginate_encoded_marker(self):
+        volumes = [db.volume_create(self.ctxt, {'id': str(i), 'size': i % 2})
+                   for i in range(4)]
+        sort_keys, sort_dirs = sqlalchemy_api.process_sort_params(
+            ['size', 'id'], ['asc', 'asc'])
+
+        marker = sqlalchemyutils.encode_marker(volumes[2], sort_keys)
+        self.assertTrue(marker.startswith(sqlalchemyutils.MARKER_PREFIX))
+        result = db.volume_get_all(self.ctxt, marker, None,
+                                   sort_keys=sort_keys, sort_dirs=sort_dirs)
+        self.assertEqual(['1', '3'], [vol['id'] for vol in result])
+
+        # The marker is only valid for the sort keys it was built for
+        self.assertRaises(exception.InvalidInput, db.volume_get_all,
+                          self.ctxt, marker, None, sort_keys=['id'])
+        self.assertRaises(exception.InvalidInput, db.volume_get_all,
+                          self.ctxt, sqlalchemyutils.MARKER_PREFIX + '!',
+                          None)
+
     def test_volume_get_all_invalid_sort_key(self):
         for keys in (['foo'], ['display_name', 'foo']):
             self.assertRaises(exception.InvalidInput, db.volume_get_all,
@@ -1116,6 +1165,26 @@ class DBAPISnapshotTestCase(BaseTest):
                                             filters),
                                         ignored_keys=['metadata', 'volume'])
 
+    def test_snapshot_get_all_paginate(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        snapshots = [db.snapshot_create(self.ctxt, {'id': str(i),
+                                                    'volume_id': 1,
+                                                    'project_id': 'p1'})
+                     for i in range(3)]
+
+        result = db.snapshot_get_all(self.ctxt, marker='0', limit=1,
+                                     sort_keys=['id'], sort_dirs=['asc'])
+        self.assertEqual(['1'], [snap['id'] for snap in result])
+
+        sort_keys, sort_dirs = sqlalchemy_api.process_sort_params(
+            ['id'], ['asc'])
+        marker = sqlalchemyutils.encode_marker(snapshots[1], sort_keys)
+        result = db.snapshot_get_all_by_project(self.ctxt, 'p1',
+                                                marker=marker,
+                                                sort_keys=sort_keys,
+                                                sort_dirs=sort_dirs)
+        self.assertEqual(['2'], [snap['id'] for snap in result])
+
     def test_snapshot_get_by_host(self):
         db.volume_create(self.ctxt, {'id': 1, 'host': 'host1'})
         db.volume_create(self.ctxt, {'id': 2, 'host': 'host2'})
@@ -1238,6 +1307,23 @@ class DBAPICgsnapshotTestCase(BaseTest):
                                                 project_id,
                                                 filters))
 
+    def test_cgsnapshot_get_all_by_project_paginate(self):
+        cgsnapshots = [db.cgsnapshot_create(self.ctxt,
+                                            {'id': i,
+                                             'consistencygroup_id': 'g1',
+                                             'project_id': 'p1'})
+                       for i in range(1, 4)]
+        db.cgsnapshot_create(self.ctxt, {'id': 4,
+                                         'consistencygroup_id': 'g2',
+                                         'project_id': 'p2'})
+
+        self._assertEqualListsOfObjects(
+            cgsnapshots, db.cgsnapshot_get_all_by_project(self.ctxt, 'p1'))
+        self._assertEqualListsOfObjects(
+            cgsnapshots[1:], db.cgsnapshot_get_all_by_project(
+                self.ctxt, 'p1', marker=1, sort_keys=['id'],
+                sort_dirs=['asc']))
+
 
 class DBAPIVolumeTypeTestCase(BaseTest):
 
@@ -1277,6 +1363,28 @@ class DBAPIVolumeTypeTestCase(BaseTest):
             actual_specs[spec.key] = spec.value
         self.assertEqual(vt_extra_specs, actual_specs)
 
+    def test_volume_type_version_get(self):
+        vt = db.volume_type_create(self.ctxt, {'name': 'n1'})
+        version1 = db.volume_type_version_get(self.ctxt)
+
+        # Renames made within the same second still change the version
+        with mock.patch('oslo_utils.timeutils.utcnow',
+                        return_value=datetime.datetime(2015, 1, 1)):
+            db.volume_type_update(self.ctxt, vt['id'],
+                                  {'name': 'n2', 'description': None})
+            version2 = db.volume_type_version_get(self.ctxt)
+            db.volume_type_update(self.ctxt, vt['id'],
+                                  {'name': 'n3', 'description': None})
+            version3 = db.volume_type_version_get(self.ctxt)
+
+        self.assertEqual(((vt['id'], 'n1'),), version1)
+        self.assertEqual(((vt['id'], 'n2'),), version2)
+        self.assertEqual(((vt['id'], 'n3'),), version3)
+        self.assertEqual('n3', db.volume_type_get(self.ctxt, vt['id'])['name'])
+
+        db.volume_type_destroy(self.ctxt, vt['id'])
+        self.assertEqual((), db.volume_type_version_get(self.ctxt))
+
 
 class DBAPIEncryptionTestCase(BaseTest):
 
@@ -1775,6 +1883,13 @@ class DBAPIBackupTestCase(BaseTest):
                                               self.created[1]['project_id'])
         self._assertEqualObjects(self.created[1], byproj[0])
 
+    def test_backup_get_all_paginate(self):
+        ordered = sorted(self.created, key=lambda backup: backup['id'])
+        result = db.backup_get_all(self.ctxt, marker=ordered[0]['id'],
+                                   limit=1, sort_keys=['id'],
+                                   sort_dirs=['asc'])
+        self._assertEqualListsOfObjects(ordered[1:2], result)
+
     def test_backup_update_nonexistent(self):
         self.assertRaises(exception.BackupNotFound,
                           db.backup_update,
@@ -1811,6 +1926,98 @@ class DBAPIBackupTestCase(BaseTest):
                           'notinbase')
 
 
+class DBAPIBackupDedupChunkTestCase(BaseTest):
+
+    """Tests for db.api.backup_dedup_chunk_* methods."""
+
+    def _create_chunk(self, **kwargs):
+        values = {'container': 'container',
+                  'sha256': 'fake_sha256',
+                  'object_name': 'dedup-fake_sha256-1',
+                  'compression': 'zlib',
+                  'length': 1024,
+                  'refcount': 1,
+                  'status': 'available'}
+        values.update(kwargs)
+        return db.backup_dedup_chunk_create(self.ctxt, values)
+
+    def test_backup_dedup_chunk_reference(self):
+        chunk = self._create_chunk()
+        referenced = db.backup_dedup_chunk_reference(self.ctxt, 'container',
+                                                     'fake_sha256')
+        self.assertEqual(chunk.id, referenced.id)
+        self.assertEqual('dedup-fake_sha256-1', referenced.object_name)
+        self.assertFalse(db.backup_dedup_chunk_release(self.ctxt, chunk.id))
+        self.assertTrue(db.backup_dedup_chunk_release(self.ctxt, chunk.id))
+
+    def test_backup_dedup_chunk_reference_not_found(self):
+        self._create_chunk()
+        self.assertIsNone(db.backup_dedup_chunk_reference(
+            self.ctxt, 'other_container', 'fake_sha256'))
+        self.assertIsNone(db.backup_dedup_chunk_reference(
+            self.ctxt, 'container', 'other_sha256'))
+
+    def test_backup_dedup_chunk_reference_creating(self):
+        chunk = self._create_chunk(status='creating')
+        self.assertIsNone(db.backup_dedup_chunk_reference(
+            self.ctxt, 'container', 'fake_sha256'))
+        db.backup_dedup_chunk_update(self.ctxt, chunk.id,
+                                     {'status': 'available'})
+        self.assertIsNotNone(db.backup_dedup_chunk_reference(
+            self.ctxt, 'container', 'fake_sha256'))
+
+    def test_backup_dedup_chunk_release_last_reference(self):
+        chunk = self._create_chunk()
+        self.assertTrue(db.backup_dedup_chunk_release(self.ctxt, chunk.id))
+        self.assertIsNone(db.backup_dedup_chunk_reference(
+            self.ctxt, 'container', 'fake_sha256'))
+        # Releasing a chunk that is already gone is harmless.
+        self.assertFalse(db.backup_dedup_chunk_release(self.ctxt, chunk.id))
+
+
+class DBAPIImageVolumeCacheTestCase(BaseTest):
+
+    """Tests for db.api.image_volume_cache_* methods."""
+
+    def test_image_volume_cache_get_all_for_host(self):
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        for i, host in enumerate(('host@backend#pool1',
+                                  'host@backend#pool2',
+                                  'host@other#pool1')):
+            db.image_volume_cache_create(self.ctxt, host, 'image%d' % i,
+                                         'sum', 'volume%d' % i, i + 1)
+            timeutils.advance_time_seconds(1)
+
+        entries = db.image_volume_cache_get_all_for_host(self.ctxt,
+                                                         'host@backend')
+        self.assertEqual(['volume0', 'volume1'],
+                         [entry.volume_id for entry in entries])
+
+        entries = db.image_volume_cache_get_all_for_host(
+            self.ctxt, 'host@backend', image_id='image0')
+        self.assertEqual(['volume0'], [entry.volume_id for entry in entries])
+        self.assertEqual(1, entries[0].size)
+        self.assertEqual('sum', entries[0].image_checksum)
+
+        db.image_volume_cache_update_last_used(self.ctxt, entries[0].id)
+        entries = db.image_volume_cache_get_all_for_host(self.ctxt,
+                                                         'host@backend')
+        self.assertEqual(['volume1', 'volume0'],
+                         [entry.volume_id for entry in entries])
+
+    def test_image_volume_cache_delete(self):
+        db.image_volume_cache_create(self.ctxt, 'host', 'image', 'sum',
+                                     'volume', 1)
+        self.assertEqual('image', db.image_volume_cache_get_by_volume_id(
+            self.ctxt, 'volume').image_id)
+
+        db.image_volume_cache_delete(self.ctxt, 'volume')
+
+        self.assertIsNone(db.image_volume_cache_get_by_volume_id(
+            self.ctxt, 'volume'))
+
+
 class DBAPIProcessSortParamTestCase(test.TestCase):
 
     def test_process_sort_params_defaults(self):
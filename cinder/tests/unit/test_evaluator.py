@@ -13,6 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
+import mock
+
 from cinder import exception
 from cinder.scheduler.evaluator import evaluator
 from cinder import test
@@ -137,3 +141,27 @@ class EvaluatorTestCase(test.TestCase):
         self.assertRaises(exception.EvaluatorParseException,
                           evaluator.evaluate,
                           "7 / 0")
+
+    def test_compile_expression_cached(self):
+        compiled = evaluator.compile_expression("stats.iops * 2")
+        self.assertIs(compiled,
+                      evaluator.compile_expression("stats.iops * 2"))
+        self.assertEqual(2000, compiled.eval({'stats': {'iops': 1000}}))
+        self.assertEqual(10, compiled.eval({'stats': {'iops': 5}}))
+
+    @mock.patch.object(evaluator, 'EXPRESSION_CACHE_SIZE', 2)
+    @mock.patch.object(evaluator, '_expression_cache',
+                       collections.OrderedDict())
+    def test_compile_expression_cache_bounded(self):
+        first = evaluator.compile_expression("1 + 1")
+        evaluator.compile_expression("2 + 2")
+        self.assertIs(first, evaluator.compile_expression("1 + 1"))
+        evaluator.compile_expression("3 + 3")
+        self.assertEqual(2, len(evaluator._expression_cache))
+        self.assertNotIn("2 + 2", evaluator._expression_cache)
+        self.assertIn("1 + 1", evaluator._expression_cache)
+
+    def test_compile_expression_bad_expression(self):
+        self.assertRaises(exception.EvaluatorParseException,
+                          evaluator.compile_expression,
+                          "1/*1")
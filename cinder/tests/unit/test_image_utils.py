@@ -15,6 +15,8 @@
 #    under the License.
 """Unit tests for image utils."""
 
+import contextlib
+import hashlib
 import math
 
 import mock
@@ -579,6 +581,7 @@ class TestFetchToVolumeFormat(test.TestCase):
                       mock_is_xen, mock_repl_xen, mock_copy, mock_convert):
         ctxt = mock.sentinel.context
         image_service = mock.Mock()
+        mock_conf.image_conversion_cache_size_gb = 0
         image_id = mock.sentinel.image_id
         dest = mock.sentinel.dest
         volume_format = mock.sentinel.volume_format
@@ -622,6 +625,7 @@ class TestFetchToVolumeFormat(test.TestCase):
                     mock_is_xen, mock_repl_xen, mock_copy, mock_convert):
         ctxt = mock.sentinel.context
         image_service = mock.Mock()
+        mock_conf.image_conversion_cache_size_gb = 0
         image_id = mock.sentinel.image_id
         dest = mock.sentinel.dest
         volume_format = mock.sentinel.volume_format
@@ -802,6 +806,7 @@ class TestFetchToVolumeFormat(test.TestCase):
                         mock_is_xen, mock_repl_xen, mock_copy, mock_convert):
         ctxt = mock.sentinel.context
         image_service = mock.Mock()
+        mock_conf.image_conversion_cache_size_gb = 0
         image_id = mock.sentinel.image_id
         dest = mock.sentinel.dest
         volume_format = mock.sentinel.volume_format
@@ -850,6 +855,7 @@ class TestFetchToVolumeFormat(test.TestCase):
                                   mock_copy, mock_convert):
         ctxt = mock.sentinel.context
         image_service = mock.Mock()
+        mock_conf.image_conversion_cache_size_gb = 0
         image_id = mock.sentinel.image_id
         dest = mock.sentinel.dest
         volume_format = mock.sentinel.volume_format
@@ -898,6 +904,7 @@ class TestFetchToVolumeFormat(test.TestCase):
                                 mock_copy, mock_convert):
         ctxt = mock.sentinel.context
         image_service = mock.Mock()
+        mock_conf.image_conversion_cache_size_gb = 0
         image_id = mock.sentinel.image_id
         dest = mock.sentinel.dest
         volume_format = mock.sentinel.volume_format
@@ -947,6 +954,7 @@ class TestFetchToVolumeFormat(test.TestCase):
                                    legacy_format_name=False):
         ctxt = mock.sentinel.context
         image_service = mock.Mock()
+        mock_conf.image_conversion_cache_size_gb = 0
         image_id = mock.sentinel.image_id
         dest = mock.sentinel.dest
         volume_format = 'vhd'
@@ -1011,6 +1019,7 @@ class TestFetchToVolumeFormat(test.TestCase):
                               mock_copy, mock_convert):
         ctxt = mock.sentinel.context
         image_service = mock.Mock()
+        mock_conf.image_conversion_cache_size_gb = 0
         image_id = mock.sentinel.image_id
         dest = mock.sentinel.dest
         volume_format = mock.sentinel.volume_format
@@ -1045,6 +1054,190 @@ class TestFetchToVolumeFormat(test.TestCase):
         mock_convert.assert_called_once_with(tmp, dest, volume_format,
                                              run_as_root=run_as_root)
 
+    @mock.patch('cinder.image.image_utils.file_cache.ImageFileCache')
+    @mock.patch('cinder.image.image_utils.convert_image')
+    @mock.patch('cinder.image.image_utils.is_xenserver_image',
+                return_value=False)
+    @mock.patch('cinder.image.image_utils.fetch')
+    @mock.patch('cinder.image.image_utils.qemu_img_info')
+    @mock.patch('cinder.image.image_utils.temporary_file')
+    @mock.patch('cinder.image.image_utils.CONF')
+    def test_conversion_cache(self, mock_conf, mock_temp, mock_info,
+                              mock_fetch, mock_is_xen, mock_convert,
+                              mock_cache_cls):
+        ctxt = mock.sentinel.context
+        image_service = mock.Mock()
+        image_service.show.return_value = {'checksum': 'abc123'}
+        mock_conf.image_conversion_dir = '/conversion'
+        mock_conf.image_conversion_cache_size_gb = 10
+        dest = mock.sentinel.dest
+        blocksize = mock.sentinel.blocksize
+        entry = mock.sentinel.entry
+        cached = mock.sentinel.cached
+
+        data = mock_info.return_value
+        data.file_format = 'raw'
+        data.backing_file = None
+        data.virtual_size = units.Gi
+        tmp = mock_temp.return_value.__enter__.return_value
+
+        @contextlib.contextmanager
+        def fake_get(name, create):
+            create(entry)
+            yield cached
+
+        mock_cache_cls.return_value.get.side_effect = fake_get
+
+        output = image_utils.fetch_to_volume_format(ctxt, image_service,
+                                                    'image-id', dest, 'raw',
+                                                    blocksize, size=1)
+
+        self.assertIsNone(output)
+        mock_cache_cls.assert_called_once_with('/conversion/cache',
+                                               10 * units.Gi)
+        mock_cache_cls.return_value.get.assert_called_once_with(
+            'image-id-abc123.raw', mock.ANY)
+        mock_fetch.assert_called_once_with(ctxt, image_service, 'image-id',
+                                           tmp, None, None)
+        mock_convert.assert_has_calls([
+            mock.call(tmp, entry, 'raw', run_as_root=True),
+            mock.call(cached, dest, 'raw', run_as_root=True)])
+        mock_info.assert_has_calls([
+            mock.call(tmp, run_as_root=True),
+            mock.call(tmp, run_as_root=True),
+            mock.call(entry, run_as_root=True),
+            mock.call(cached, run_as_root=True),
+            mock.call(dest, run_as_root=True)])
+
+    @mock.patch('cinder.image.image_utils.file_cache.ImageFileCache')
+    @mock.patch('cinder.image.image_utils.convert_image')
+    @mock.patch('cinder.image.image_utils.fetch')
+    @mock.patch('cinder.image.image_utils.qemu_img_info')
+    @mock.patch('cinder.image.image_utils.temporary_file')
+    @mock.patch('cinder.image.image_utils.CONF')
+    def test_conversion_cache_size_error(self, mock_conf, mock_temp,
+                                         mock_info, mock_fetch, mock_convert,
+                                         mock_cache_cls):
+        ctxt = mock.sentinel.context
+        image_service = mock.Mock()
+        image_service.show.return_value = {'checksum': 'abc123'}
+        mock_conf.image_conversion_dir = '/conversion'
+        mock_conf.image_conversion_cache_size_gb = 10
+        cached = mock.sentinel.cached
+
+        data = mock_info.return_value
+        data.file_format = 'raw'
+        data.backing_file = None
+        data.virtual_size = 2 * units.Gi
+
+        @contextlib.contextmanager
+        def fake_get(name, create):
+            yield cached
+
+        mock_cache_cls.return_value.get.side_effect = fake_get
+
+        self.assertRaises(exception.ImageUnacceptable,
+                          image_utils.fetch_to_volume_format,
+                          ctxt, image_service, 'image-id',
+                          mock.sentinel.dest, 'raw',
+                          mock.sentinel.blocksize, size=1)
+
+        self.assertFalse(mock_fetch.called)
+        self.assertFalse(mock_convert.called)
+
+
+class TestStreamRawImage(test.TestCase):
+    def setUp(self):
+        super(TestStreamRawImage, self).setUp()
+        self.ctxt = mock.sentinel.context
+        self.image_service = mock.Mock()
+        self.dest = mock.sentinel.dest
+        self.written = []
+
+        def fake_copy_stream(chunks, dest, blocksize, sync=False):
+            for chunk in chunks:
+                self.written.append(chunk)
+            return len(b''.join(self.written))
+
+        patcher = mock.patch('cinder.image.image_utils.volume_utils.'
+                             'copy_stream', side_effect=fake_copy_stream)
+        self.mock_copy_stream = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('cinder.image.image_utils.os.path.exists',
+                             return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _set_image(self, chunks, checksum=None, size=None):
+        data = b''.join(chunks)
+        self.image_service.show.return_value = {
+            'disk_format': 'raw',
+            'checksum': checksum or hashlib.md5(data).hexdigest(),
+            'size': len(data) if size is None else size}
+        self.image_service.download.return_value = iter(chunks)
+
+    def _fetch(self, size=1):
+        image_utils.fetch_to_volume_format(self.ctxt, self.image_service,
+                                           'image-id', self.dest, 'raw',
+                                           mock.sentinel.blocksize,
+                                           size=size)
+
+    @mock.patch('cinder.image.image_utils.temporary_file')
+    @mock.patch('cinder.image.image_utils.qemu_img_info')
+    @mock.patch('cinder.utils.temporary_chown')
+    def test_stream(self, mock_chown, mock_info, mock_temp):
+        chunks = [b'a' * 100, b'b' * 1000, b'c' * 10]
+        self._set_image(chunks)
+
+        self._fetch()
+
+        self.assertEqual(b''.join(chunks), b''.join(self.written))
+        self.image_service.download.assert_called_once_with(self.ctxt,
+                                                            'image-id')
+        self.mock_copy_stream.assert_called_once_with(
+            mock.ANY, self.dest, mock.sentinel.blocksize, sync=True)
+        mock_chown.assert_called_once_with(self.dest)
+        self.assertFalse(mock_info.called)
+        self.assertFalse(mock_temp.called)
+
+    @mock.patch('cinder.utils.temporary_chown')
+    def test_stream_small_image(self, mock_chown):
+        chunks = [b'a' * 10, b'b' * 10]
+        self._set_image(chunks)
+
+        self._fetch()
+
+        self.assertEqual(b''.join(chunks), b''.join(self.written))
+
+    @mock.patch('cinder.utils.temporary_chown')
+    def test_stream_other_format(self, mock_chown):
+        chunks = [b'QFI\xfb' + b'a' * 100, b'b' * 1000]
+        self._set_image(chunks)
+
+        self.assertRaises(exception.ImageUnacceptable, self._fetch)
+        self.assertEqual([], self.written)
+
+    @mock.patch('cinder.utils.temporary_chown')
+    def test_stream_checksum_error(self, mock_chown):
+        chunks = [b'a' * 1000]
+        self._set_image(chunks, checksum='bad')
+
+        self.assertRaises(exception.ImageUnacceptable, self._fetch)
+
+    @mock.patch('cinder.utils.temporary_chown')
+    def test_stream_more_data_than_size(self, mock_chown):
+        chunks = [b'a' * 1000, b'b' * 1000]
+        self._set_image(chunks, size=1000)
+
+        self.assertRaises(exception.ImageUnacceptable, self._fetch)
+        self.assertEqual([b'a' * 1000], self.written)
+
+    def test_stream_size_error(self):
+        self._set_image([b'a' * 1000], size=2 * units.Gi)
+
+        self.assertRaises(exception.ImageUnacceptable, self._fetch)
+        self.assertFalse(self.image_service.download.called)
+
 
 class TestXenserverUtils(test.TestCase):
     @mock.patch('cinder.image.image_utils.is_xenserver_format')
@@ -847,6 +847,91 @@ class MigrationsMixin(test_migrations.WalkVersionsMixin):
         volumes = db_utils.get_table(engine, 'volumes')
         self.assertNotIn('previous_status', volumes.c)
 
+    def _check_051(self, engine, data):
+        """Test adding and removing backup_dedup_chunks table."""
+
+        has_table = engine.dialect.has_table(engine.connect(),
+                                             "backup_dedup_chunks")
+        self.assertTrue(has_table)
+
+        dedup_chunks = db_utils.get_table(engine, 'backup_dedup_chunks')
+
+        self.assertIsInstance(dedup_chunks.c.created_at.type,
+                              self.TIME_TYPE)
+        self.assertIsInstance(dedup_chunks.c.updated_at.type,
+                              self.TIME_TYPE)
+        self.assertIsInstance(dedup_chunks.c.id.type,
+                              sqlalchemy.types.INTEGER)
+        self.assertIsInstance(dedup_chunks.c.container.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(dedup_chunks.c.sha256.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(dedup_chunks.c.object_name.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(dedup_chunks.c.compression.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(dedup_chunks.c.length.type,
+                              sqlalchemy.types.INTEGER)
+        self.assertIsInstance(dedup_chunks.c.refcount.type,
+                              sqlalchemy.types.INTEGER)
+        self.assertIsInstance(dedup_chunks.c.status.type,
+                              sqlalchemy.types.VARCHAR)
+
+    def _post_downgrade_051(self, engine):
+        has_table = engine.dialect.has_table(engine.connect(),
+                                             "backup_dedup_chunks")
+        self.assertFalse(has_table)
+
+    def _check_052(self, engine, data):
+        """Test that adding the pagination indexes works correctly."""
+        for table_name in ('volumes', 'snapshots', 'backups', 'cgsnapshots'):
+            table = db_utils.get_table(engine, table_name)
+            index_name = '%s_project_created_idx' % table_name
+            index_columns = []
+            for idx in table.indexes:
+                if idx.name == index_name:
+                    index_columns = idx.columns.keys()
+                    break
+
+            self.assertEqual(['project_id', 'deleted', 'created_at', 'id'],
+                             index_columns)
+
+    def _post_downgrade_052(self, engine):
+        for table_name in ('volumes', 'snapshots', 'backups', 'cgsnapshots'):
+            table = db_utils.get_table(engine, table_name)
+            index_names = [idx.name for idx in table.indexes]
+            self.assertNotIn('%s_project_created_idx' % table_name,
+                             index_names)
+
+    def _check_053(self, engine, data):
+        """Test adding and removing image_volume_cache_entries table."""
+
+        has_table = engine.dialect.has_table(engine.connect(),
+                                             "image_volume_cache_entries")
+        self.assertTrue(has_table)
+
+        entries = db_utils.get_table(engine, 'image_volume_cache_entries')
+
+        self.assertIsInstance(entries.c.id.type,
+                              sqlalchemy.types.INTEGER)
+        self.assertIsInstance(entries.c.host.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(entries.c.image_id.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(entries.c.image_checksum.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(entries.c.volume_id.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(entries.c.size.type,
+                              sqlalchemy.types.INTEGER)
+        self.assertIsInstance(entries.c.last_used.type,
+                              self.TIME_TYPE)
+
+    def _post_downgrade_053(self, engine):
+        has_table = engine.dialect.has_table(engine.connect(),
+                                             "image_volume_cache_entries")
+        self.assertFalse(has_table)
+
     def test_walk_versions(self):
         self.walk_versions(True, False)
 
@@ -871,6 +871,31 @@ class VolumeTypeQuotaEngineTestCase(test.TestCase):
         db.volume_type_destroy(ctx, vtype['id'])
         db.volume_type_destroy(ctx, vtype2['id'])
 
+    def test_volume_type_resources_cached(self):
+        ctx = context.RequestContext('admin', 'admin', is_admin=True)
+        engine = quota.VolumeTypeQuotaEngine()
+        vtype = db.volume_type_create(ctx, {'name': 'type1'})
+
+        with mock.patch.object(db, 'volume_type_get_all',
+                               wraps=db.volume_type_get_all) as mock_vtga:
+            self.assertIn('volumes_type1', engine.resources)
+            self.assertIn('volumes_type1', engine.resources)
+            self.assertEqual(1, mock_vtga.call_count)
+
+            db.volume_type_update(ctx, vtype['id'],
+                                  {'name': 'type2', 'description': None})
+            self.assertIn('volumes_type2', engine.resources)
+            self.assertNotIn('volumes_type1', engine.resources)
+            self.assertEqual(2, mock_vtga.call_count)
+
+            db.volume_type_destroy(ctx, vtype['id'])
+            self.assertNotIn('volumes_type2', engine.resources)
+            self.assertEqual(3, mock_vtga.call_count)
+
+            engine.clear_resources_cache()
+            self.assertNotIn('volumes_type2', engine.resources)
+            self.assertEqual(4, mock_vtga.call_count)
+
 
 class DbQuotaDriverTestCase(test.TestCase):
     def setUp(self):
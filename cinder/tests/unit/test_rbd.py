@@ -20,6 +20,7 @@ import math
 import os
 import tempfile
 
+from eventlet import tpool
 import mock
 from oslo_utils import timeutils
 from oslo_utils import units
@@ -137,6 +138,8 @@ class RBDTestCase(test.TestCase):
         self.cfg.rbd_user = None
         self.cfg.volume_dd_blocksize = '1M'
         self.cfg.rbd_store_chunk_size = 4
+        self.cfg.rados_connection_pool_size = 4
+        self.cfg.rados_native_threads = 20
 
         mock_exec = mock.Mock()
         mock_exec.return_value = ('', '')
@@ -863,6 +866,31 @@ class RBDTestCase(test.TestCase):
         self.assertTrue(self.driver.retype(context, fake_volume,
                                            fake_type, diff, host))
 
+    @mock.patch('cinder.volume.drivers.rbd.tpool.set_num_threads')
+    def test_native_threads(self, mock_set_num_threads):
+        self.cfg.rados_native_threads = 40
+        driver.RBDDriver(configuration=self.cfg)
+        mock_set_num_threads.assert_called_once_with(40)
+
+    @common_mocks
+    def test_open_image(self):
+        image = self.driver._open_image(mock.sentinel.ioctx, 'name',
+                                        read_only=True)
+
+        self.assertIsInstance(image, tpool.Proxy)
+        self.mock_rbd.Image.assert_called_once_with(mock.sentinel.ioctx,
+                                                    'name', read_only=True)
+        image.flatten()
+        self.mock_rbd.Image.return_value.flatten.assert_called_once_with()
+
+    @common_mocks
+    def test_connect_to_rados_native_threads(self):
+        self.cfg.rados_connect_timeout = -1
+
+        client, _ioctx = self.driver._connect_to_rados()
+
+        self.assertIsInstance(client, tpool.Proxy)
+
     def test_rbd_volume_proxy_init(self):
         mock_driver = mock.Mock(name='driver')
         mock_driver._connect_to_rados.return_value = (None, None)
@@ -927,6 +955,120 @@ class RBDTestCase(test.TestCase):
         self.assertEqual(
             3, self.mock_rados.Rados.return_value.shutdown.call_count)
 
+    @common_mocks
+    def test_connect_to_rados_reuses_connection(self):
+        self.cfg.rados_connect_timeout = -1
+        mock_client = self.mock_rados.Rados.return_value
+        mock_client.state = 'connected'
+
+        client, ioctx = self.driver._connect_to_rados()
+        self.driver._disconnect_from_rados(client, ioctx)
+        self.assertEqual((client, ioctx), self.driver._connect_to_rados())
+
+        self.assertEqual(1, self.mock_rados.Rados.call_count)
+        mock_client.open_ioctx.assert_called_once_with(self.cfg.rbd_pool)
+        self.assertFalse(mock_client.shutdown.called)
+
+    def test_rados_client_discards_connection_on_error(self):
+        mock_driver = mock.Mock(name='driver')
+        mock_driver.rados.Error = MockException
+        mock_driver._connect_to_rados.return_value = (mock.sentinel.client,
+                                                      mock.sentinel.ioctx)
+
+        def _use_client():
+            with driver.RADOSClient(mock_driver):
+                raise MockException()
+
+        self.assertRaises(MockException, _use_client)
+        mock_driver._disconnect_from_rados.assert_called_once_with(
+            mock.sentinel.client, mock.sentinel.ioctx, discard=True)
+
+    def test_rados_client_mocked_rados(self):
+        mock_driver = mock.Mock(name='driver')
+        mock_driver._connect_to_rados.return_value = (mock.sentinel.client,
+                                                      mock.sentinel.ioctx)
+
+        def _use_client():
+            with driver.RADOSClient(mock_driver):
+                raise MockException()
+
+        self.assertRaises(MockException, _use_client)
+        mock_driver._disconnect_from_rados.assert_called_once_with(
+            mock.sentinel.client, mock.sentinel.ioctx, discard=False)
+
+
+class RADOSConnectionPoolTestCase(test.TestCase):
+    def setUp(self):
+        super(RADOSConnectionPoolTestCase, self).setUp()
+        self.pool = driver.RADOSConnectionPool(1)
+        self.connect = mock.Mock(side_effect=self._connect)
+
+    def _connect(self):
+        client = mock.Mock()
+        client.state = 'connected'
+        return client
+
+    def test_get_reuses_idle_client(self):
+        client, ioctx = self.pool.get(self.connect, 'pool1')
+        self.pool.put(client, ioctx)
+
+        self.assertEqual((client, ioctx), self.pool.get(self.connect,
+                                                        'pool1'))
+        self.assertEqual(1, self.connect.call_count)
+        client.open_ioctx.assert_called_once_with('pool1')
+
+    def test_get_opens_ioctx_of_other_pool(self):
+        client, ioctx = self.pool.get(self.connect, 'pool1')
+        self.pool.put(client, ioctx)
+
+        client2, ioctx2 = self.pool.get(self.connect, 'pool2')
+
+        self.assertEqual(client, client2)
+        self.assertEqual(2, client.open_ioctx.call_count)
+        self.pool.put(client2, ioctx2)
+        self.pool.clear()
+        self.assertEqual(2, client.open_ioctx.return_value.close.call_count)
+        client.shutdown.assert_called_once_with()
+
+    def test_get_connects_when_all_in_use(self):
+        client, ioctx = self.pool.get(self.connect, 'pool1')
+        client2, ioctx2 = self.pool.get(self.connect, 'pool1')
+
+        self.assertNotEqual(client, client2)
+        self.pool.put(client, ioctx)
+        self.pool.put(client2, ioctx2)
+        # Only one client is kept
+        self.assertFalse(client.shutdown.called)
+        client2.shutdown.assert_called_once_with()
+
+    def test_get_drops_disconnected_client(self):
+        client, ioctx = self.pool.get(self.connect, 'pool1')
+        self.pool.put(client, ioctx)
+        client.state = 'shutdown'
+
+        client2, ioctx2 = self.pool.get(self.connect, 'pool1')
+
+        self.assertNotEqual(client, client2)
+        client.shutdown.assert_called_once_with()
+        ioctx.close.assert_called_once_with()
+
+    def test_get_open_ioctx_error(self):
+        client = self._connect()
+        client.open_ioctx.side_effect = MockException
+        self.connect.side_effect = [client]
+
+        self.assertRaises(MockException, self.pool.get, self.connect,
+                          'pool1')
+        client.shutdown.assert_called_once_with()
+
+    def test_put_discard(self):
+        client, ioctx = self.pool.get(self.connect, 'pool1')
+        self.pool.put(client, ioctx, discard=True)
+
+        client.shutdown.assert_called_once_with()
+        ioctx.close.assert_called_once_with()
+        self.assertNotEqual(client, self.pool.get(self.connect, 'pool1')[0])
+
 
 class RBDImageIOWrapperTestCase(test.TestCase):
     def setUp(self):
@@ -719,6 +719,26 @@ class VolumeTestCase(BaseVolumeTestCase):
                                    'description')
         self.assertEqual('default-az', volume['availability_zone'])
 
+    def test_create_volume_batch(self):
+        """Test the volumes of a batch are scheduled in one request."""
+        volume_api = cinder.volume.api.API()
+
+        with mock.patch.object(volume_api.scheduler_rpcapi,
+                               'create_volume') as mock_create_volume, \
+                mock.patch.object(volume_api.scheduler_rpcapi,
+                                  'create_volumes') as mock_create_volumes:
+            volumes = volume_api.create_batch(self.context, 3, 1, 'name',
+                                              'description')
+
+        self.assertEqual(3, len(volumes))
+        self.assertFalse(mock_create_volume.called)
+        mock_create_volumes.assert_called_once_with(self.context,
+                                                    CONF.volume_topic,
+                                                    mock.ANY, mock.ANY)
+        request_spec_list = mock_create_volumes.call_args[0][2]
+        self.assertEqual([volume['id'] for volume in volumes],
+                         [spec['volume_id'] for spec in request_spec_list])
+
     @mock.patch('cinder.quota.QUOTAS.rollback', new=mock.MagicMock())
     @mock.patch('cinder.quota.QUOTAS.commit', new=mock.MagicMock())
     @mock.patch('cinder.quota.QUOTAS.reserve', return_value=["RESERVATION"])
@@ -861,6 +881,61 @@ class VolumeTestCase(BaseVolumeTestCase):
             self.assertRaises(exception.CinderException,
                               vol_manager.VolumeManager)
 
+    def test_publish_service_capabilities_delta(self):
+        self.flags(capabilities_full_report_interval=3)
+        manager = self.volume
+        manager.last_capabilities = {'free_capacity_gb': 100,
+                                     'total_capacity_gb': 200}
+        with mock.patch.object(manager.scheduler_rpcapi,
+                               'update_service_capabilities') as mock_update:
+            manager._publish_service_capabilities(self.context)
+            mock_update.assert_called_once_with(
+                self.context, 'volume', manager.host,
+                manager.last_capabilities, seq=1, delta=None)
+
+            # Drivers may change their stats in place
+            manager.last_capabilities['free_capacity_gb'] = 90
+            mock_update.reset_mock()
+            manager._publish_service_capabilities(self.context)
+            mock_update.assert_called_once_with(
+                self.context, 'volume', manager.host,
+                manager.last_capabilities, seq=2,
+                delta={'updated': {'free_capacity_gb': 90}})
+
+            # Nothing changed, nothing sent
+            mock_update.reset_mock()
+            manager._publish_service_capabilities(self.context)
+            self.assertFalse(mock_update.called)
+
+            # Every third report is sent in full
+            manager._publish_service_capabilities(self.context)
+            mock_update.assert_called_once_with(
+                self.context, 'volume', manager.host,
+                manager.last_capabilities, seq=3, delta=None)
+
+    @mock.patch('eventlet.spawn_after')
+    @mock.patch.object(vol_manager.VolumeManager,
+                       '_publish_service_capabilities')
+    @mock.patch.object(vol_manager.VolumeManager, '_report_driver_status')
+    def test_report_capabilities_change_coalesced(self, mock_report,
+                                                  mock_publish,
+                                                  mock_spawn_after):
+        self.flags(capabilities_report_delay=2)
+        manager = self.volume
+        for _i in range(3):
+            manager._report_capabilities_change(self.context)
+        mock_spawn_after.assert_called_once_with(
+            2, manager._delayed_capabilities_report)
+        self.assertFalse(mock_report.called)
+
+        manager._delayed_capabilities_report()
+        self.assertEqual(1, mock_report.call_count)
+        mock_publish.assert_called_once_with(mock.ANY)
+
+        # The next change waits for a new report
+        manager._report_capabilities_change(self.context)
+        self.assertEqual(2, mock_spawn_after.call_count)
+
     @mock.patch.object(db, 'volume_get_all_by_host')
     def test_update_replication_rel_status(self, m_get_by_host):
         m_get_by_host.return_value = [mock.sentinel.vol]
@@ -17,6 +17,11 @@
 
 
 import datetime
+import errno
+import filecmp
+import os
+import tempfile
+
 import mock
 
 from oslo_concurrency import processutils
@@ -598,6 +603,119 @@ class CopyVolumeTestCase(test.TestCase):
                                           'iflag=direct', 'oflag=direct',
                                           'conv=sparse', run_as_root=True)
 
+    def test_copy_volume_native(self):
+        self.flags(volume_copy_method='native')
+        with tempfile.NamedTemporaryFile() as src:
+            src.write(os.urandom(100 * 1024))
+            src.seek(512 * 1024)
+            src.write(os.urandom(1000))
+            src.flush()
+            with tempfile.NamedTemporaryFile() as dest:
+                dest.write(os.urandom(1024 * 1024))
+                dest.flush()
+                for sparse in (False, True):
+                    volume_utils.copy_volume(src.name, dest.name, 1, '64K',
+                                             sync=True, sparse=sparse)
+                    self.assertTrue(filecmp.cmp(src.name, dest.name,
+                                                shallow=False))
+
+    def test_copy_volume_native_sparse_tail(self):
+        self.flags(volume_copy_method='native')
+        for tail in (b'', b'\0' * 64 * 1024):
+            with tempfile.NamedTemporaryFile() as src:
+                src.write(os.urandom(100 * 1024))
+                src.write(tail)
+                # The source ends with a hole
+                src.truncate(512 * 1024)
+                src.flush()
+                with tempfile.NamedTemporaryFile() as dest:
+                    volume_utils.copy_volume(src.name, dest.name, 1, '64K',
+                                             sparse=True)
+                    self.assertEqual(512 * 1024,
+                                     os.path.getsize(dest.name))
+                    self.assertTrue(filecmp.cmp(src.name, dest.name,
+                                                shallow=False))
+
+    @mock.patch('cinder.volume.utils._copy_volume')
+    @mock.patch('cinder.volume.utils._copy_volume_native')
+    def test_copy_volume_native_uses_dd(self, mock_native, mock_copy):
+        self.flags(volume_copy_method='native')
+        volume_utils.copy_volume('/dev/zero', '/dev/null', 1024, 1,
+                                 ionice='-c3')
+        self.assertFalse(mock_native.called)
+        self.assertEqual(1, mock_copy.call_count)
+
+        mock_copy.reset_mock()
+        fake_throttle = throttling.Throttle(['fake_throttle'])
+        volume_utils.copy_volume('/dev/zero', '/dev/null', 1024, 1,
+                                 throttle=fake_throttle)
+        self.assertFalse(mock_native.called)
+        self.assertEqual(1, mock_copy.call_count)
+
+        mock_copy.reset_mock()
+        mock_native.side_effect = OSError(errno.EACCES, 'Permission denied')
+        volume_utils.copy_volume('/dev/zero', '/dev/null', 1024, 1)
+        mock_native.assert_called_once_with('/dev/zero', '/dev/null', 1024,
+                                            1, sync=False, sparse=False)
+        mock_copy.assert_called_once_with([], '/dev/zero', '/dev/null', 1024,
+                                          1, sync=False,
+                                          execute=utils.execute,
+                                          ionice=None, sparse=False)
+
+    @mock.patch('cinder.volume.utils._copy_volume')
+    @mock.patch('cinder.volume.utils._copy_volume_native')
+    def test_copy_volume_native_error(self, mock_native, mock_copy):
+        self.flags(volume_copy_method='native')
+        mock_native.side_effect = OSError(errno.ENOSPC, 'No space left')
+        self.assertRaises(OSError, volume_utils.copy_volume, '/dev/zero',
+                          '/dev/null', 1024, 1)
+        self.assertFalse(mock_copy.called)
+
+    def test_copy_stream(self):
+        data = os.urandom(100 * 1024 + 100)
+        chunks = [data[:10], data[10:5000], data[5000:]]
+        with tempfile.NamedTemporaryFile() as dest:
+            dest.write(b'\0' * 1024 * 1024)
+            dest.flush()
+
+            written = volume_utils.copy_stream(iter(chunks), dest.name, '4K',
+                                               sync=True)
+
+            self.assertEqual(len(data), written)
+            with open(dest.name, 'rb') as f:
+                self.assertEqual(data, f.read(len(data)))
+                self.assertEqual(b'\0' * (1024 * 1024 - len(data)),
+                                 f.read())
+
+    def test_copy_stream_sparse(self):
+        data = os.urandom(4096) + b'\0' * 64 * 1024 + os.urandom(100)
+        with tempfile.NamedTemporaryFile() as dest:
+            # All of the destination is a hole
+            dest.truncate(1024 * 1024)
+            dest.flush()
+
+            written = volume_utils.copy_stream(iter([data]), dest.name,
+                                               '4K')
+
+            self.assertEqual(len(data), written)
+            with open(dest.name, 'rb') as f:
+                self.assertEqual(data, f.read(len(data)))
+            # The blocks of zeros are not allocated
+            self.assertLess(os.stat(dest.name).st_blocks * 512, len(data))
+
+    def test_copy_stream_zeros_over_data(self):
+        data = b'\0' * 64 * 1024 + os.urandom(100)
+        with tempfile.NamedTemporaryFile() as dest:
+            dest.write(os.urandom(4096))
+            dest.flush()
+
+            written = volume_utils.copy_stream(iter([data]), dest.name,
+                                               '4K')
+
+            self.assertEqual(len(data), written)
+            with open(dest.name, 'rb') as f:
+                self.assertEqual(data, f.read())
+
 
 class VolumeUtilsTestCase(test.TestCase):
     def test_null_safe_str(self):
@@ -190,6 +190,61 @@ class API(base.Base):
                scheduler_hints=None,
                source_replica=None, consistencygroup=None,
                cgsnapshot=None, multiattach=False):
+        return self._create(context, size, name, description,
+                            snapshot=snapshot, image_id=image_id,
+                            volume_type=volume_type, metadata=metadata,
+                            availability_zone=availability_zone,
+                            source_volume=source_volume,
+                            scheduler_hints=scheduler_hints,
+                            source_replica=source_replica,
+                            consistencygroup=consistencygroup,
+                            cgsnapshot=cgsnapshot, multiattach=multiattach)
+
+    def create_batch(self, context, count, size, name, description,
+                     **kwargs):
+        """Creates count identical volumes, scheduled in a single request.
+
+        Takes the arguments of create().  Each volume has its own quota
+        reservation and database entry, but the volumes that need a host
+        are sent to the scheduler together, which places them in one pass.
+        If a volume fails to be created, the ones created before it are
+        still scheduled before the error is raised.
+        """
+        volumes = []
+        scheduler_batch = []
+        try:
+            for _index in range(count):
+                volumes.append(self._create(context, size, name, description,
+                                            scheduler_batch=scheduler_batch,
+                                            **kwargs))
+        finally:
+            if scheduler_batch:
+                self._cast_create_volumes(context, scheduler_batch)
+        return volumes
+
+    def _cast_create_volumes(self, context, scheduler_batch):
+        request_spec_list = [spec for spec, _props in scheduler_batch]
+        filter_properties_list = [props for _spec, props in scheduler_batch]
+        try:
+            self.scheduler_rpcapi.create_volumes(context,
+                                                 CONF.volume_topic,
+                                                 request_spec_list,
+                                                 filter_properties_list)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.exception(_LE("Failed to schedule a batch of %d "
+                                  "volumes."), len(request_spec_list))
+                for request_spec in request_spec_list:
+                    self.db.volume_update(context,
+                                          request_spec['volume_id'],
+                                          {'status': 'error'})
+
+    def _create(self, context, size, name, description, snapshot=None,
+                image_id=None, volume_type=None, metadata=None,
+                availability_zone=None, source_volume=None,
+                scheduler_hints=None,
+                source_replica=None, consistencygroup=None,
+                cgsnapshot=None, multiattach=False, scheduler_batch=None):
 
         # NOTE(jdg): we can have a create without size if we're
         # doing a create from snap or volume.  Currently
@@ -283,7 +338,8 @@ class API(base.Base):
                                                  availability_zones,
                                                  create_what,
                                                  sched_rpcapi,
-                                                 volume_rpcapi)
+                                                 volume_rpcapi,
+                                                 scheduler_batch)
         except Exception:
             msg = _('Failed to create api volume flow.')
             LOG.exception(msg)
@@ -434,7 +490,8 @@ class API(base.Base):
         return b
 
     def get_all(self, context, marker=None, limit=None, sort_keys=None,
-                sort_dirs=None, filters=None, viewable_admin_meta=False):
+                sort_dirs=None, filters=None, viewable_admin_meta=False,
+                joined_load=True):
         check_policy(context, 'get_all')
 
         if filters is None:
@@ -462,13 +519,17 @@ class API(base.Base):
         if filters:
             LOG.debug("Searching by: %s.", six.text_type(filters))
 
+        # Only pass joined_load down when set, leaving the calls of those
+        # that need the whole volumes unchanged.
+        db_kwargs = {} if joined_load else {'joined_load': False}
         if context.is_admin and allTenants:
             # Need to remove all_tenants to pass the filtering below.
             del filters['all_tenants']
             volumes = self.db.volume_get_all(context, marker, limit,
                                              sort_keys=sort_keys,
                                              sort_dirs=sort_dirs,
-                                             filters=filters)
+                                             filters=filters,
+                                             **db_kwargs)
         else:
             if viewable_admin_meta:
                 context = context.elevated()
@@ -477,7 +538,8 @@ class API(base.Base):
                                                         marker, limit,
                                                         sort_keys=sort_keys,
                                                         sort_dirs=sort_dirs,
-                                                        filters=filters)
+                                                        filters=filters,
+                                                        **db_kwargs)
 
         LOG.info(_LI("Get all volumes completed successfully."))
         return volumes
@@ -498,7 +560,8 @@ class API(base.Base):
         LOG.info(_LI("Volume retrieved successfully."), resource=vref)
         return dict(vref)
 
-    def get_all_snapshots(self, context, search_opts=None):
+    def get_all_snapshots(self, context, search_opts=None, marker=None,
+                          limit=None, sort_keys=None, sort_dirs=None):
         check_policy(context, 'get_all_snapshots')
 
         search_opts = search_opts or {}
@@ -506,11 +569,13 @@ class API(base.Base):
         if (context.is_admin and 'all_tenants' in search_opts):
             # Need to remove all_tenants to pass the filtering below.
             del search_opts['all_tenants']
-            snapshots = objects.SnapshotList.get_all(context,
-                                                     search_opts)
+            snapshots = objects.SnapshotList.get_all(context, search_opts,
+                                                     marker, limit,
+                                                     sort_keys, sort_dirs)
         else:
             snapshots = objects.SnapshotList.get_all_by_project(
-                context, context.project_id, search_opts)
+                context, context.project_id, search_opts, marker, limit,
+                sort_keys, sort_dirs)
 
         LOG.info(_LI("Get all snaphsots completed successfully."))
         return snapshots
@@ -1096,9 +1161,18 @@ class API(base.Base):
         # FIXME(jdg): Huh?  Pass?
         pass
 
-    def get_volumes_image_metadata(self, context):
+    def get_volumes_image_metadata(self, context, volume_ids=None):
+        """Get the image metadata of volumes, by volume id.
+
+        If volume_ids is given, only the metadata of those volumes is
+        loaded, e.g. for the volumes of one page of a listing.
+        """
         check_policy(context, 'get_volumes_image_metadata')
-        db_data = self.db.volume_glance_metadata_get_all(context)
+        if volume_ids is None:
+            db_data = self.db.volume_glance_metadata_get_all(context)
+        else:
+            db_data = self.db.volume_glance_metadata_get_all_by_volume_ids(
+                context, volume_ids)
         results = collections.defaultdict(dict)
         for meta_entry in db_data:
             results[meta_entry['volume_id']].update({meta_entry['key']:
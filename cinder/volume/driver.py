@@ -130,6 +130,18 @@ volume_opts = [
                default=0,
                help='The upper limit of bandwidth of volume copy. '
                     '0 => unlimited'),
+    cfg.StrOpt('volume_copy_method',
+               default='dd',
+               choices=['dd', 'native'],
+               help='Method used to copy and clear volumes. dd runs dd '
+                    'as root, native copies within the volume service, '
+                    'which requires read and write access to the devices. '
+                    'Copies that are throttled with a blkio cgroup or run '
+                    'with ionice always use dd.'),
+    cfg.IntOpt('volume_copy_io_depth',
+               default=4,
+               help='Number of blocks read and written concurrently by the '
+                    'native volume copy method.'),
     cfg.StrOpt('iscsi_write_cache',
                default='on',
                choices=['on', 'off'],
@@ -23,6 +23,7 @@ import tempfile
 from eventlet import tpool
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_utils import excutils
 from oslo_utils import units
 from six.moves import urllib
 
@@ -88,7 +89,16 @@ rbd_opts = [
                       'failed.')),
     cfg.IntOpt('rados_connection_interval', default=5,
                help=_('Interval value (in seconds) between connection '
-                      'retries to ceph cluster.'))
+                      'retries to ceph cluster.')),
+    cfg.IntOpt('rados_connection_pool_size', default=4,
+               help=_('Maximum number of idle connections to the ceph '
+                      'cluster kept open to be reused by the next '
+                      'operations. 0 disables the reuse of connections.')),
+    cfg.IntOpt('rados_native_threads', default=20,
+               help=_('Number of native threads the blocking librados and '
+                      'librbd calls are run in, so that the service keeps '
+                      'serving other requests meanwhile. The threads are '
+                      'shared by the whole service process.')),
 ]
 
 CONF = cfg.CONF
@@ -136,7 +146,7 @@ class RBDImageIOWrapper(io.RawIOBase):
 
     def read(self, length=None):
         offset = self._offset
-        total = self._rbd_meta.image.size()
+        total = tpool.execute(self._rbd_meta.image.size)
 
         # NOTE(dosaboy): posix files do not barf if you read beyond their
         # length (they just return nothing) but rbd images do so we need to
@@ -151,10 +161,11 @@ class RBDImageIOWrapper(io.RawIOBase):
             length = total - offset
 
         self._inc_offset(length)
-        return self._rbd_meta.image.read(int(offset), int(length))
+        return tpool.execute(self._rbd_meta.image.read, int(offset),
+                             int(length))
 
     def write(self, data):
-        self._rbd_meta.image.write(data, self._offset)
+        tpool.execute(self._rbd_meta.image.write, data, self._offset)
         self._inc_offset(len(data))
 
     def seekable(self):
@@ -166,7 +177,7 @@ class RBDImageIOWrapper(io.RawIOBase):
         elif whence == 1:
             new_offset = self._offset + offset
         elif whence == 2:
-            new_offset = self._rbd_meta.image.size()
+            new_offset = tpool.execute(self._rbd_meta.image.size)
             new_offset += offset
         else:
             raise IOError(_("Invalid argument - whence=%s not supported") %
@@ -182,7 +193,7 @@ class RBDImageIOWrapper(io.RawIOBase):
 
     def flush(self):
         try:
-            self._rbd_meta.image.flush()
+            tpool.execute(self._rbd_meta.image.flush)
         except AttributeError:
             LOG.warning(_LW("flush() not supported in "
                             "this version of librbd"))
@@ -219,10 +230,10 @@ class RBDVolumeProxy(object):
             snapshot = utils.convert_str(snapshot)
 
         try:
-            self.volume = driver.rbd.Image(ioctx,
-                                           utils.convert_str(name),
-                                           snapshot=snapshot,
-                                           read_only=read_only)
+            self.volume = driver._open_image(ioctx,
+                                             utils.convert_str(name),
+                                             snapshot=snapshot,
+                                             read_only=read_only)
         except driver.rbd.Error:
             LOG.exception(_LE("error opening rbd image %s"), name)
             driver._disconnect_from_rados(client, ioctx)
@@ -238,7 +249,9 @@ class RBDVolumeProxy(object):
         try:
             self.volume.close()
         finally:
-            self.driver._disconnect_from_rados(self.client, self.ioctx)
+            self.driver._disconnect_from_rados(
+                self.client, self.ioctx,
+                discard=_is_rados_error(self.driver, value))
 
     def __getattr__(self, attrib):
         return getattr(self.volume, attrib)
@@ -254,7 +267,9 @@ class RADOSClient(object):
         return self
 
     def __exit__(self, type_, value, traceback):
-        self.driver._disconnect_from_rados(self.cluster, self.ioctx)
+        self.driver._disconnect_from_rados(
+            self.cluster, self.ioctx,
+            discard=_is_rados_error(self.driver, value))
 
     @property
     def features(self):
@@ -264,6 +279,81 @@ class RADOSClient(object):
         return int(features)
 
 
+def _is_rados_error(driver, error):
+    """Whether the error may come from the connection used."""
+    # rados.Error is not a class when the rados module is mocked out.
+    error_class = driver.rados.Error
+    return (error is not None and isinstance(error_class, type) and
+            isinstance(error, error_class))
+
+
+class RADOSConnectionPool(object):
+    """Pool of connected RADOS clients, and of the ioctxs they opened.
+
+    Connecting a client to a cluster takes round trips to its monitors,
+    which costs more than many short operations.  Clients released are
+    kept connected, with the ioctxs they opened, to be reused by the next
+    operations.  A client is used by one operation at a time; when none is
+    idle, a new one is connected.
+
+    At most max_idle clients are kept.  Clients not connected anymore,
+    failing to open an ioctx or released after a RADOS error are shut down
+    instead of being reused.
+    """
+
+    def __init__(self, max_idle):
+        self.max_idle = max_idle
+        self._idle = []
+        self._in_use = {}
+
+    def get(self, connect, pool):
+        """Returns a connected client and an ioctx of the pool.
+
+        :param connect: called to get a new connected client when no idle
+                        client can be reused
+        """
+        client = None
+        while self._idle:
+            client, ioctxs = self._idle.pop()
+            if client.state == 'connected':
+                break
+            self._shutdown(client, ioctxs)
+            client = None
+        if client is None:
+            client, ioctxs = connect(), {}
+
+        ioctx = ioctxs.get(pool)
+        if ioctx is None:
+            try:
+                ioctx = client.open_ioctx(pool)
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    self._shutdown(client, ioctxs)
+            ioctxs[pool] = ioctx
+        self._in_use[client] = ioctxs
+        return client, ioctx
+
+    def put(self, client, ioctx, discard=False):
+        """Releases a client and ioctx returned by get()."""
+        ioctxs = self._in_use.pop(client, {None: ioctx})
+        if discard or len(self._idle) >= self.max_idle:
+            self._shutdown(client, ioctxs)
+        else:
+            self._idle.append((client, ioctxs))
+
+    def clear(self):
+        """Shuts down the idle clients."""
+        while self._idle:
+            self._shutdown(*self._idle.pop())
+
+    @staticmethod
+    def _shutdown(client, ioctxs):
+        # closing an ioctx cannot raise an exception
+        for ioctx in ioctxs.values():
+            ioctx.close()
+        client.shutdown()
+
+
 class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
                 driver.CloneableVD, driver.CloneableImageVD, driver.SnapshotVD,
                 driver.BaseVD):
@@ -278,6 +368,10 @@ class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
         # allow overrides for testing
         self.rados = kwargs.get('rados', rados)
         self.rbd = kwargs.get('rbd', rbd)
+        self._rados_pool = RADOSConnectionPool(
+            self.configuration.rados_connection_pool_size)
+        # The librados and librbd calls run in the threads of tpool.
+        tpool.set_num_threads(self.configuration.rados_native_threads)
 
         # All string args used with librbd must be None or utf-8 otherwise
         # librbd will break.
@@ -302,6 +396,11 @@ class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
     def RBDProxy(self):
         return tpool.Proxy(self.rbd.RBD())
 
+    def _open_image(self, ioctx, name, **kwargs):
+        """Opens an rbd image whose methods run in native threads."""
+        return tpool.Proxy(tpool.execute(self.rbd.Image, ioctx, name,
+                                         **kwargs))
+
     def _ceph_args(self):
         args = []
         if self.configuration.rbd_user:
@@ -312,40 +411,45 @@ class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
             args.extend(['--cluster', self.configuration.rbd_cluster_name])
         return args
 
-    @utils.retry(exception.VolumeBackendAPIException,
-                 CONF.rados_connection_interval,
-                 CONF.rados_connection_retries)
-    def _connect_to_rados(self, pool=None):
+    def _connect_to_cluster(self):
         LOG.debug("opening connection to ceph cluster (timeout=%s).",
                   self.configuration.rados_connect_timeout)
 
-        client = self.rados.Rados(
+        # Connecting, and the other calls of a client, wait on the monitors
+        # of the cluster, they run in native threads.
+        client = tpool.Proxy(self.rados.Rados(
             rados_id=self.configuration.rbd_user,
             clustername=self.configuration.rbd_cluster_name,
-            conffile=self.configuration.rbd_ceph_conf)
-        if pool is not None:
-            pool = utils.convert_str(pool)
-        else:
-            pool = self.configuration.rbd_pool
-
+            conffile=self.configuration.rbd_ceph_conf))
         try:
             if self.configuration.rados_connect_timeout >= 0:
                 client.connect(timeout=
                                self.configuration.rados_connect_timeout)
             else:
                 client.connect()
-            ioctx = client.open_ioctx(pool)
-            return client, ioctx
+        except self.rados.Error:
+            with excutils.save_and_reraise_exception():
+                client.shutdown()
+        return client
+
+    @utils.retry(exception.VolumeBackendAPIException,
+                 CONF.rados_connection_interval,
+                 CONF.rados_connection_retries)
+    def _connect_to_rados(self, pool=None):
+        if pool is not None:
+            pool = utils.convert_str(pool)
+        else:
+            pool = self.configuration.rbd_pool
+
+        try:
+            return self._rados_pool.get(self._connect_to_cluster, pool)
         except self.rados.Error:
             msg = _("Error connecting to ceph cluster.")
             LOG.exception(msg)
-            client.shutdown()
             raise exception.VolumeBackendAPIException(data=msg)
 
-    def _disconnect_from_rados(self, client, ioctx):
-        # closing an ioctx cannot raise an exception
-        ioctx.close()
-        client.shutdown()
+    def _disconnect_from_rados(self, client, ioctx, discard=False):
+        self._rados_pool.put(client, ioctx, discard=discard)
 
     def _get_backup_snaps(self, rbd_image):
         """Get list of any backup snapshots that exist on this volume.
@@ -422,7 +526,7 @@ class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
 
     def _get_clone_depth(self, client, volume_name, depth=0):
         """Returns the number of ancestral clones of the given volume."""
-        parent_volume = self.rbd.Image(client.ioctx, volume_name)
+        parent_volume = self._open_image(client.ioctx, volume_name)
         try:
             _pool, parent, _snap = self._get_clone_info(parent_volume,
                                                         volume_name)
@@ -474,7 +578,7 @@ class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
                           self.configuration.rbd_max_clone_depth)
                 flatten_parent = True
 
-            src_volume = self.rbd.Image(client.ioctx, src_name)
+            src_volume = self._open_image(client.ioctx, src_name)
             try:
                 # First flatten source volume if required.
                 if flatten_parent:
@@ -484,7 +588,7 @@ class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
                     LOG.debug("flattening source volume %s", src_name)
                     src_volume.flatten()
                     # Delete parent clone snap
-                    parent_volume = self.rbd.Image(client.ioctx, parent)
+                    parent_volume = self._open_image(client.ioctx, parent)
                     try:
                         parent_volume.unprotect_snap(snap)
                         parent_volume.remove_snap(snap)
@@ -633,7 +737,7 @@ class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
 
         Deletes references i.e. deleted parent volumes and snapshots.
         """
-        parent_rbd = self.rbd.Image(client.ioctx, parent_name)
+        parent_rbd = self._open_image(client.ioctx, parent_name)
         parent_has_snaps = False
         try:
             # Check for grandparent
@@ -666,7 +770,7 @@ class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
         volume_name = utils.convert_str(volume['name'])
         with RADOSClient(self) as client:
             try:
-                rbd_image = self.rbd.Image(client.ioctx, volume_name)
+                rbd_image = self._open_image(client.ioctx, volume_name)
             except self.rbd.ImageNotFound:
                 LOG.info(_LI("volume %s no longer exists in backend"),
                          volume_name)
@@ -1030,7 +1134,7 @@ class RBDDriver(driver.RetypeVD, driver.TransferVD, driver.ExtendVD,
         with RADOSClient(self) as client:
             # Raise an exception if we didn't find a suitable rbd image.
             try:
-                rbd_image = self.rbd.Image(client.ioctx, rbd_name)
+                rbd_image = self._open_image(client.ioctx, rbd_name)
                 image_size = rbd_image.size()
             except self.rbd.ImageNotFound:
                 kwargs = {'existing_ref': rbd_name,
@@ -649,7 +649,8 @@ class VolumeCastTask(flow_utils.CinderTask):
     created volume.
     """
 
-    def __init__(self, scheduler_rpcapi, volume_rpcapi, db):
+    def __init__(self, scheduler_rpcapi, volume_rpcapi, db,
+                 scheduler_batch=None):
         requires = ['image_id', 'scheduler_hints', 'snapshot_id',
                     'source_volid', 'volume_id', 'volume_type',
                     'volume_properties', 'source_replicaid',
@@ -659,6 +660,7 @@ class VolumeCastTask(flow_utils.CinderTask):
         self.volume_rpcapi = volume_rpcapi
         self.scheduler_rpcapi = scheduler_rpcapi
         self.db = db
+        self.scheduler_batch = scheduler_batch
 
     def _cast_create_volume(self, context, request_spec, filter_properties):
         source_volid = request_spec['source_volid']
@@ -691,7 +693,10 @@ class VolumeCastTask(flow_utils.CinderTask):
             source_volume_ref = self.db.volume_get(context, source_replicaid)
             host = source_volume_ref['host']
 
-        if not host:
+        if not host and self.scheduler_batch is not None:
+            # The caller sends the whole batch to the scheduler at once.
+            self.scheduler_batch.append((request_spec, filter_properties))
+        elif not host:
             # Cast to the scheduler and let it handle whatever is needed
             # to select the target host for this volume.
             self.scheduler_rpcapi.create_volume(
@@ -741,7 +746,7 @@ class VolumeCastTask(flow_utils.CinderTask):
 
 
 def get_flow(db_api, image_service_api, availability_zones, create_what,
-             scheduler_rpcapi=None, volume_rpcapi=None):
+             scheduler_rpcapi=None, volume_rpcapi=None, scheduler_batch=None):
     """Constructs and returns the api entrypoint flow.
 
     This flow will do the following:
@@ -752,6 +757,10 @@ def get_flow(db_api, image_service_api, availability_zones, create_what,
     4. Creates the database entry.
     5. Commits the quota.
     6. Casts to volume manager or scheduler for further processing.
+
+    When a scheduler_batch list is given, the (request_spec,
+    filter_properties) meant for the scheduler are appended to it instead
+    of being cast, so that the caller can schedule many volumes at once.
     """
 
     flow_name = ACTION.replace(":", "_") + "_api"
@@ -770,7 +779,8 @@ def get_flow(db_api, image_service_api, availability_zones, create_what,
     if scheduler_rpcapi and volume_rpcapi:
         # This will cast it out to either the scheduler or volume manager via
         # the rpc apis provided.
-        api_flow.add(VolumeCastTask(scheduler_rpcapi, volume_rpcapi, db_api))
+        api_flow.add(VolumeCastTask(scheduler_rpcapi, volume_rpcapi, db_api,
+                                    scheduler_batch=scheduler_batch))
 
     # Now load (but do not run) the flow using the provided initial data.
     return taskflow.engines.load(api_flow, store=create_what)
@@ -20,11 +20,13 @@ import taskflow.engines
 from taskflow.patterns import linear_flow
 from taskflow.types import failure as ft
 
+from cinder import context as cinder_context
 from cinder import exception
 from cinder import flow_utils
-from cinder.i18n import _, _LE, _LI
+from cinder.i18n import _, _LE, _LI, _LW
 from cinder.image import glance
 from cinder import objects
+from cinder import quota
 from cinder import utils
 from cinder.volume.flows import common
 from cinder.volume import utils as volume_utils
@@ -33,6 +35,7 @@ LOG = logging.getLogger(__name__)
 
 ACTION = 'volume:create'
 CONF = cfg.CONF
+QUOTAS = quota.QUOTAS
 
 # These attributes we will attempt to save for the volume if they exist
 # in the source image metadata.
@@ -350,10 +353,11 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
 
     default_provides = 'volume'
 
-    def __init__(self, db, driver):
+    def __init__(self, db, driver, image_volume_cache=None):
         super(CreateVolumeFromSpecTask, self).__init__(addons=[ACTION])
         self.db = db
         self.driver = driver
+        self.image_volume_cache = image_volume_cache
 
     def _handle_bootable_volume_glance_meta(self, context, volume_id,
                                             **kwargs):
@@ -587,6 +591,16 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                                                        image_location,
                                                        image_meta,
                                                        image_service)
+        internal_context = None
+        if not cloned and self.image_volume_cache:
+            internal_context = cinder_context.get_internal_tenant_context()
+            if internal_context is None:
+                LOG.warning(_LW("Unable to use the image volume cache "
+                                "without the Cinder internal tenant."))
+            else:
+                model_update, cloned = self._create_from_image_cache(
+                    internal_context, volume_ref, image_id, image_meta)
+
         if not cloned:
             # TODO(harlowja): what needs to be rolled back in the clone if this
             # volume create fails?? Likely this should be a subflow or broken
@@ -608,12 +622,116 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
                                'updates': updates})
             self._copy_image_to_volume(context, volume_ref,
                                        image_id, image_location, image_service)
+            if internal_context is not None:
+                self._create_image_cache_volume_entry(internal_context,
+                                                      volume_ref, image_id,
+                                                      image_meta)
 
         self._handle_bootable_volume_glance_meta(context, volume_ref['id'],
                                                  image_id=image_id,
                                                  image_meta=image_meta)
         return model_update
 
+    def _create_from_image_cache(self, internal_context, volume_ref,
+                                 image_id, image_meta):
+        """Clones the volume from the image volume cache of its host.
+
+        Returns the model update and whether the volume was cloned.
+        """
+        cache_entry = self.image_volume_cache.get_entry(internal_context,
+                                                        volume_ref,
+                                                        image_id,
+                                                        image_meta)
+        if cache_entry is None:
+            return None, False
+
+        image_volume_id = cache_entry['volume_id']
+
+        # Same lock as the deletion of the image volume, an eviction waits
+        # for the clone to complete.
+        @utils.synchronized("%s-delete_volume" % image_volume_id,
+                            external=True)
+        def _clone_image_volume():
+            # The entry may have been evicted before we got the lock
+            if not self.db.image_volume_cache_get_by_volume_id(
+                    internal_context, image_volume_id):
+                return None, False
+            image_volume = self.db.volume_get(internal_context,
+                                              image_volume_id)
+            if image_volume['status'] != 'available':
+                return None, False
+            LOG.debug("Cloning %(volume_id)s from image volume "
+                      "%(image_volume_id)s of image %(image_id)s.",
+                      {'volume_id': volume_ref['id'],
+                       'image_volume_id': image_volume_id,
+                       'image_id': image_id})
+            return self.driver.create_cloned_volume(volume_ref,
+                                                    image_volume), True
+
+        return _clone_image_volume()
+
+    def _create_image_cache_volume_entry(self, internal_context, volume_ref,
+                                         image_id, image_meta):
+        """Adds a clone of a volume just created from an image to the cache.
+
+        The cache only speeds up later creates, failing to add the volume
+        is logged but doesn't fail the create.
+        """
+        cache = self.image_volume_cache
+        size = volume_ref['size']
+        if not cache.ensure_space(internal_context, size,
+                                  volume_ref['host']):
+            LOG.debug("Volume %(volume_id)s of %(size)s GB is too large "
+                      "for the image volume cache.",
+                      {'volume_id': volume_ref['id'], 'size': size})
+            return
+
+        reservations = None
+        image_volume = None
+        try:
+            reserve_opts = {'volumes': 1, 'gigabytes': size}
+            QUOTAS.add_volume_type_opts(internal_context, reserve_opts,
+                                        volume_ref['volume_type_id'])
+            reservations = QUOTAS.reserve(internal_context, **reserve_opts)
+            image_volume = self.db.volume_create(internal_context, {
+                'size': size,
+                'host': volume_ref['host'],
+                'availability_zone': volume_ref['availability_zone'],
+                'volume_type_id': volume_ref['volume_type_id'],
+                'user_id': internal_context.user_id,
+                'project_id': internal_context.project_id,
+                'status': 'creating',
+                'attach_status': 'detached',
+                'display_name': 'image-%s' % image_id,
+                'display_description': None,
+            })
+            QUOTAS.commit(internal_context, reservations)
+            reservations = None
+            model_update = self.driver.create_cloned_volume(image_volume,
+                                                            volume_ref)
+            updates = dict(model_update or dict(), status='available',
+                           launched_at=timeutils.utcnow())
+            image_volume = self.db.volume_update(internal_context,
+                                                 image_volume['id'], updates)
+            cache.create_cache_entry(internal_context, image_volume,
+                                     image_id, image_meta)
+        except exception.OverQuota:
+            LOG.warning(_LW("Not adding volume %(volume_id)s of image "
+                            "%(image_id)s to the image volume cache, the "
+                            "Cinder internal tenant is over quota."),
+                        {'volume_id': volume_ref['id'],
+                         'image_id': image_id})
+        except Exception:
+            LOG.exception(_LE("Failed to add volume %(volume_id)s of image "
+                              "%(image_id)s to the image volume cache."),
+                          {'volume_id': volume_ref['id'],
+                           'image_id': image_id})
+            if reservations:
+                QUOTAS.rollback(internal_context, reservations)
+            if image_volume is not None:
+                self.db.volume_update(internal_context, image_volume['id'],
+                                      {'status': 'error'})
+
     def _create_raw_volume(self, context, volume_ref, **kwargs):
         return self.driver.create_volume(volume_ref)
 
@@ -720,7 +838,7 @@ class CreateVolumeOnFinishTask(NotifyVolumeActionTask):
 
 def get_flow(context, db, driver, scheduler_rpcapi, host, volume_id,
              allow_reschedule, reschedule_context, request_spec,
-             filter_properties):
+             filter_properties, image_volume_cache=None):
     """Constructs and returns the manager entrypoint flow.
 
     This flow will do the following:
@@ -766,7 +884,8 @@ def get_flow(context, db, driver, scheduler_rpcapi, host, volume_id,
 
     volume_flow.add(ExtractVolumeSpecTask(db),
                     NotifyVolumeActionTask(db, "create.start"),
-                    CreateVolumeFromSpecTask(db, driver),
+                    CreateVolumeFromSpecTask(db, driver,
+                                             image_volume_cache),
                     CreateVolumeOnFinishTask(db, "create.end"))
 
     # Now load (but do not run) the flow using the provided initial data.
@@ -57,6 +57,7 @@ from cinder import context
 from cinder import exception
 from cinder import flow_utils
 from cinder.i18n import _, _LE, _LI, _LW
+from cinder.image import cache as image_cache
 from cinder.image import glance
 from cinder import manager
 from cinder import objects
@@ -69,6 +70,7 @@ from cinder.volume import rpcapi as volume_rpcapi
 from cinder.volume import utils as vol_utils
 from cinder.volume import volume_types
 
+import eventlet
 from eventlet import greenpool
 
 LOG = logging.getLogger(__name__)
@@ -103,6 +105,28 @@ volume_manager_opts = [
                     'location of a backend, then creating a volume type to '
                     'allow the user to select by these different '
                     'properties.'),
+    cfg.FloatOpt('capabilities_report_delay',
+                 default=2.0,
+                 help='Seconds to wait before reporting the capabilities to '
+                      'the schedulers after an operation changing them, '
+                      'so that a burst of operations is reported once. 0 '
+                      'reports after each operation.'),
+    cfg.BoolOpt('image_volume_cache_enabled',
+                default=False,
+                help='Keep a volume of each image volumes are created from '
+                     'on the backend, and clone it to create the next '
+                     'volumes from the image. The cached volumes belong to '
+                     'the Cinder internal tenant.'),
+    cfg.IntOpt('image_volume_cache_max_size_gb',
+               default=0,
+               help='Maximum total size in GB of the image volume cache of '
+                    'a backend, the least recently used volumes are '
+                    'deleted first. 0 is unlimited.'),
+    cfg.IntOpt('image_volume_cache_max_count',
+               default=0,
+               help='Maximum number of volumes in the image volume cache of '
+                    'a backend, the least recently used volumes are deleted '
+                    'first. 0 is unlimited.'),
 ]
 
 CONF = cfg.CONF
@@ -202,6 +226,7 @@ class VolumeManager(manager.SchedulerDependentManager):
                                                   config_group=service_name)
         self._tp = greenpool.GreenPool()
         self.stats = {}
+        self._capabilities_report_pending = False
 
         if not volume_driver:
             # Get from configuration, which will get the default
@@ -234,6 +259,14 @@ class VolumeManager(manager.SchedulerDependentManager):
                 LOG.error(_LE("Invalid JSON: %s"),
                           self.driver.configuration.extra_capabilities)
 
+        self.image_volume_cache = None
+        if self.configuration.image_volume_cache_enabled:
+            self.image_volume_cache = image_cache.ImageVolumeCache(
+                self.db,
+                volume_rpcapi.VolumeAPI(),
+                self.configuration.image_volume_cache_max_size_gb,
+                self.configuration.image_volume_cache_max_count)
+
     def _add_to_threadpool(self, func, *args, **kwargs):
         self._tp.spawn_n(func, *args, **kwargs)
 
@@ -381,7 +414,8 @@ class VolumeManager(manager.SchedulerDependentManager):
                          resource=volume)
 
         # collect and publish service capabilities
-        self.publish_service_capabilities(ctxt)
+        self._report_driver_status(ctxt)
+        self._publish_service_capabilities(ctxt, full=True)
 
         # conditionally run replication status task
         stats = self.driver.get_volume_stats(refresh=True)
@@ -429,7 +463,8 @@ class VolumeManager(manager.SchedulerDependentManager):
                 allow_reschedule,
                 context,
                 request_spec,
-                filter_properties)
+                filter_properties,
+                image_volume_cache=self.image_volume_cache)
         except Exception:
             msg = _("Create manager volume flow failed.")
             LOG.exception(msg, resource={'type': 'volume', 'id': volume_id})
@@ -594,6 +629,8 @@ class VolumeManager(manager.SchedulerDependentManager):
 
             # Delete glance metadata if it exists
             self.db.volume_glance_metadata_delete_by_volume(context, volume_id)
+            if self.image_volume_cache:
+                self.db.image_volume_cache_delete(context, volume_id)
 
             self.db.volume_destroy(context, volume_id)
 
@@ -620,7 +657,7 @@ class VolumeManager(manager.SchedulerDependentManager):
                 self.stats['pools'][pool] = dict(
                     allocated_capacity_gb=-size)
 
-            self.publish_service_capabilities(context)
+            self._report_capabilities_change(context)
 
         LOG.info(_LI("Deleted volume successfully."), resource=volume_ref)
         return True
@@ -1526,9 +1563,35 @@ class VolumeManager(manager.SchedulerDependentManager):
         return volume_stats
 
     def publish_service_capabilities(self, context):
-        """Collect driver status and then publish."""
+        """Collect driver status and then publish it in full."""
         self._report_driver_status(context)
-        self._publish_service_capabilities(context)
+        self._publish_service_capabilities(context, full=True)
+
+    def _report_capabilities_change(self, context):
+        """Collect driver status and publish it after a change.
+
+        The changes made within capabilities_report_delay seconds of the
+        first one are published together.
+        """
+        if CONF.capabilities_report_delay <= 0:
+            self._report_driver_status(context)
+            self._publish_service_capabilities(context)
+            return
+
+        if self._capabilities_report_pending:
+            return
+        self._capabilities_report_pending = True
+        eventlet.spawn_after(CONF.capabilities_report_delay,
+                             self._delayed_capabilities_report)
+
+    def _delayed_capabilities_report(self):
+        self._capabilities_report_pending = False
+        ctxt = context.get_admin_context()
+        try:
+            self._report_driver_status(ctxt)
+            self._publish_service_capabilities(ctxt)
+        except Exception:
+            LOG.exception(_LE("Failed to report the capabilities."))
 
     def notification(self, context, event):
         LOG.info(_LI("Notification {%s} received"), event)
@@ -1785,7 +1848,7 @@ class VolumeManager(manager.SchedulerDependentManager):
             QUOTAS.commit(context, old_reservations, project_id=project_id)
         if new_reservations:
             QUOTAS.commit(context, new_reservations, project_id=project_id)
-        self.publish_service_capabilities(context)
+        self._report_capabilities_change(context)
         LOG.info(_LI("Retype volume completed successfully."),
                  resource=volume_ref)
 
@@ -2251,7 +2314,7 @@ class VolumeManager(manager.SchedulerDependentManager):
         self.db.consistencygroup_destroy(context, group_id)
         self._notify_about_consistencygroup_usage(
             context, group_ref, "delete.end", volumes)
-        self.publish_service_capabilities(context)
+        self._report_capabilities_change(context)
         LOG.info(_LI("Delete consistency group "
                      "completed successfully."),
                  resource={'type': 'consistency_group',
@@ -15,12 +15,20 @@
 """Volume-related Utilities and helpers."""
 
 
+import ctypes
+import errno
+import io
 import math
+import os
+import stat
 
 from Crypto.Random import random
+import eventlet
+from eventlet import tpool
 from oslo_concurrency import processutils
 from oslo_config import cfg
 from oslo_log import log as logging
+from oslo_utils import excutils
 from oslo_utils import strutils
 from oslo_utils import timeutils
 from oslo_utils import units
@@ -39,6 +47,13 @@ CONF = cfg.CONF
 
 LOG = logging.getLogger(__name__)
 
+# Alignment of the buffers, offsets and lengths of O_DIRECT I/O.
+DIRECT_IO_ALIGNMENT = 4096
+# Seconds between two progress reports of the native volume copy.
+COPY_PROGRESS_INTERVAL = 30
+SEEK_DATA = getattr(os, 'SEEK_DATA', 3)
+SEEK_HOLE = getattr(os, 'SEEK_HOLE', 4)
+
 
 def null_safe_str(s):
     return str(s) if s else ''
@@ -346,17 +361,334 @@ def _copy_volume(prefix, srcstr, deststr, size_in_m, blocksize, sync=False,
              {'size_in_m': size_in_m, 'mbps': mbps})
 
 
+def _open_for_copy(path, flags):
+    """Open path with O_DIRECT if the file supports it.
+
+    Returns the file descriptor, and whether O_DIRECT is used.
+    """
+    if hasattr(os, 'O_DIRECT'):
+        try:
+            return os.open(path, flags | os.O_DIRECT), True
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+    return os.open(path, flags), False
+
+
+def _data_extents(fd, size):
+    """Yield the (start, end) ranges of a file that may contain data.
+
+    Holes are found with SEEK_DATA and SEEK_HOLE on regular files; any
+    other file is considered to be all data.
+    """
+    if not stat.S_ISREG(os.fstat(fd).st_mode):
+        yield 0, size
+        return
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, SEEK_DATA)
+            end = os.lseek(fd, start, SEEK_HOLE)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # No data after offset.
+                return
+            # SEEK_DATA is not supported.
+            yield offset, size
+            return
+        if start >= size:
+            return
+        if end <= start:
+            end = size
+        yield start, min(end, size)
+        offset = end
+
+
+def _copy_blocks(extents, block_size):
+    for start, end in extents:
+        for offset in range(start, end, block_size):
+            yield offset, min(block_size, end - offset)
+
+
+def _round_up(length, alignment):
+    return (length + alignment - 1) // alignment * alignment
+
+
+def _aligned_buffer(size):
+    """Return a writable memoryview of size bytes aligned for O_DIRECT."""
+    buf = bytearray(size + DIRECT_IO_ALIGNMENT)
+    address = ctypes.addressof(ctypes.c_char.from_buffer(buf))
+    offset = -address % DIRECT_IO_ALIGNMENT
+    return memoryview(buf)[offset:offset + size]
+
+
+def _copy_block(src, dst, buf, zeros, offset, length, deststr, dst_direct,
+                sparse):
+    """Copy length bytes at offset from src to dst through buf.
+
+    Returns the number of bytes read, which is less than length at the end
+    of the source.
+    """
+    src.seek(offset)
+    read = 0
+    # O_DIRECT reads must be a multiple of the alignment, and the buffer
+    # is large enough for the rounded up length of any block.
+    read_length = _round_up(length, DIRECT_IO_ALIGNMENT)
+    while read < read_length:
+        count = src.readinto(buf[read:read_length])
+        if not count:
+            break
+        read += count
+    read = min(read, length)
+    if not read:
+        return 0
+    if sparse and buf[:read] == zeros[:read]:
+        return read
+    if dst_direct and read % DIRECT_IO_ALIGNMENT:
+        # The tail of the volume cannot be written with O_DIRECT.
+        fd = os.open(deststr, os.O_WRONLY)
+        try:
+            os.lseek(fd, offset, os.SEEK_SET)
+            data = buf[:read].tobytes()
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+        return read
+    dst.seek(offset)
+    written = 0
+    while written < read:
+        written += dst.write(buf[written:read])
+    return read
+
+
+def _copy_volume_native(srcstr, deststr, size_in_m, blocksize, sync=False,
+                        sparse=False):
+    """Copy a volume within the volume service instead of running dd.
+
+    The copy uses O_DIRECT where supported, and keeps volume_copy_io_depth
+    blocks in flight at a time.  The I/O itself runs in native threads so
+    that the service keeps running meanwhile.  With sparse, holes of the
+    source and all-zero blocks are not written to the destination.
+    """
+    blocksize, count = _calculate_count(size_in_m, blocksize)
+    block_size = _round_up(int(strutils.string_to_bytes('%sB' % blocksize)),
+                           DIRECT_IO_ALIGNMENT)
+    size = int(strutils.string_to_bytes('%sB' % blocksize)) * count
+
+    # Opening the volumes here makes permission errors show up before any
+    # data is copied.  Like dd, create and truncate a destination file.
+    src_fd = os.open(srcstr, os.O_RDONLY)
+    try:
+        dst_fd = os.open(deststr, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o666)
+    except OSError:
+        with excutils.save_and_reraise_exception():
+            os.close(src_fd)
+    src_stat = os.fstat(src_fd)
+    if stat.S_ISREG(src_stat.st_mode):
+        # Like dd, stop at the end of a source file.
+        size = min(size, src_stat.st_size)
+
+    copied = [0]
+    progress = {'time': timeutils.utcnow()}
+    zeros = memoryview(b'\0' * block_size)
+
+    def _report_progress(length):
+        copied[0] += length
+        now = timeutils.utcnow()
+        if (timeutils.delta_seconds(progress['time'], now) >=
+                COPY_PROGRESS_INTERVAL):
+            progress['time'] = now
+            LOG.info(_LI("Volume copy %(src)s to %(dest)s: %(copied)d of "
+                         "%(size)d bytes copied."),
+                     {'src': srcstr, 'dest': deststr,
+                      'copied': copied[0], 'size': size})
+
+    def _copy_worker():
+        src = io.FileIO(_open_for_copy(srcstr, os.O_RDONLY)[0], 'r')
+        dst_fd, dst_direct = _open_for_copy(deststr, os.O_WRONLY)
+        dst = io.FileIO(dst_fd, 'w')
+        buf = _aligned_buffer(block_size)
+        try:
+            for offset, length in blocks:
+                read = tpool.execute(_copy_block, src, dst, buf, zeros,
+                                     offset, length, deststr, dst_direct,
+                                     sparse)
+                _report_progress(read)
+        finally:
+            src.close()
+            dst.close()
+
+    start_time = timeutils.utcnow()
+    try:
+        extents = _data_extents(src_fd, size) if sparse else [(0, size)]
+        # The workers share the generator, each taking the next block.
+        blocks = _copy_blocks(extents, block_size)
+        workers = [eventlet.spawn(_copy_worker)
+                   for _i in range(max(1, CONF.volume_copy_io_depth))]
+        try:
+            for worker in workers:
+                worker.wait()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for worker in workers:
+                    worker.kill()
+        if stat.S_ISREG(os.fstat(dst_fd).st_mode):
+            # Holes and zero blocks at the end of the source are not
+            # written, the destination file still has to be as long.
+            os.ftruncate(dst_fd, size)
+        if sync:
+            tpool.execute(os.fsync, dst_fd)
+    finally:
+        os.close(src_fd)
+        os.close(dst_fd)
+    duration = timeutils.delta_seconds(start_time, timeutils.utcnow())
+
+    # NOTE(jdg): use a default of 1, mostly for unit test, but in
+    # some incredible event this is 0 (cirros image?) don't barf
+    if duration < 1:
+        duration = 1
+    mbps = (size_in_m / duration)
+    LOG.debug("Volume copy details: src %(src)s, dest %(dest)s, "
+              "size %(sz).2f MB, duration %(duration).2f sec",
+              {"src": srcstr,
+               "dest": deststr,
+               "sz": size_in_m,
+               "duration": duration})
+    LOG.info(_LI("Volume copy %(size_in_m).2f MB at %(mbps).2f MB/s"),
+             {'size_in_m': size_in_m, 'mbps': mbps})
+
+
 def copy_volume(srcstr, deststr, size_in_m, blocksize, sync=False,
                 execute=utils.execute, ionice=None, throttle=None,
                 sparse=False):
     if not throttle:
         throttle = throttling.Throttle.get_default()
     with throttle.subcommand(srcstr, deststr) as throttle_cmd:
+        # The native copy cannot be run under a command prefix or with
+        # ionice, or with a custom execute.
+        if (CONF.volume_copy_method == 'native' and
+                not throttle_cmd['prefix'] and ionice is None and
+                execute is utils.execute):
+            try:
+                return _copy_volume_native(srcstr, deststr, size_in_m,
+                                           blocksize, sync=sync,
+                                           sparse=sparse)
+            except OSError as e:
+                if e.errno not in (errno.EACCES, errno.EPERM):
+                    raise
+                LOG.warning(_LW("Volume copy %(src)s to %(dest)s cannot "
+                                "be done natively (%(err)s), using dd."),
+                            {'src': srcstr, 'dest': deststr, 'err': e})
         _copy_volume(throttle_cmd['prefix'], srcstr, deststr,
                      size_in_m, blocksize, sync=sync,
                      execute=execute, ionice=ionice, sparse=sparse)
 
 
+def _reads_zeros(dst, scratch, zeros, offset, length, holes):
+    """Check whether length bytes at offset of dst already read as zeros.
+
+    That is the case for a hole of a file, or for a block of a thin volume
+    that is not provisioned yet.
+    """
+    if holes:
+        try:
+            data = os.lseek(dst.fileno(), offset, SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # No data after offset.
+                return True
+        else:
+            if data >= offset + length:
+                return True
+    dst.seek(offset)
+    read = 0
+    # O_DIRECT reads must be a multiple of the alignment.
+    read_length = _round_up(length, DIRECT_IO_ALIGNMENT)
+    while read < read_length:
+        count = dst.readinto(scratch[read:read_length])
+        if not count:
+            break
+        read += count
+    return read >= length and scratch[:length] == zeros[:length]
+
+
+def _write_block(dst, buf, scratch, zeros, offset, length, deststr,
+                 dst_direct, holes, sync):
+    """Write length bytes of buf at offset of dst.
+
+    A block of zeros is not written where the destination already reads
+    zeros, so that it stays sparse.
+    """
+    if (buf[:length] == zeros[:length] and
+            _reads_zeros(dst, scratch, zeros, offset, length, holes)):
+        return
+    if dst_direct and length % DIRECT_IO_ALIGNMENT:
+        # The tail of the data cannot be written with O_DIRECT.
+        fd = os.open(deststr, os.O_WRONLY)
+        try:
+            os.lseek(fd, offset, os.SEEK_SET)
+            data = buf[:length].tobytes()
+            while data:
+                data = data[os.write(fd, data):]
+            if sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        return
+    dst.seek(offset)
+    written = 0
+    while written < length:
+        written += dst.write(buf[written:length])
+
+
+def copy_stream(chunks, deststr, blocksize, sync=False):
+    """Write the chunks of data of an iterable to the start of a volume.
+
+    The chunks are gathered into blocks of blocksize, written with O_DIRECT
+    where supported, in native threads.  Blocks of zeros are skipped where
+    the volume already reads zeros, as qemu-img convert does.  Returns the
+    number of bytes written.
+    """
+    block_size = _round_up(int(strutils.string_to_bytes('%sB' % blocksize)),
+                           DIRECT_IO_ALIGNMENT)
+    dst_fd, dst_direct = _open_for_copy(deststr, os.O_RDWR)
+    dst = io.FileIO(dst_fd, 'r+')
+    # Files have holes, a file shorter than the data is extended at the end.
+    holes = stat.S_ISREG(os.fstat(dst_fd).st_mode)
+    buf = _aligned_buffer(block_size)
+    scratch = _aligned_buffer(block_size)
+    zeros = memoryview(b'\0' * block_size)
+    written = 0
+    filled = 0
+    try:
+        for chunk in chunks:
+            offset = 0
+            while offset < len(chunk):
+                count = min(len(chunk) - offset, block_size - filled)
+                buf[filled:filled + count] = chunk[offset:offset + count]
+                filled += count
+                offset += count
+                if filled == block_size:
+                    tpool.execute(_write_block, dst, buf, scratch, zeros,
+                                  written, filled, deststr, dst_direct,
+                                  holes, sync)
+                    written += filled
+                    filled = 0
+        if filled:
+            tpool.execute(_write_block, dst, buf, scratch, zeros, written,
+                          filled, deststr, dst_direct, holes, sync)
+            written += filled
+        if holes and os.fstat(dst_fd).st_size < written:
+            os.ftruncate(dst_fd, written)
+        if sync:
+            tpool.execute(os.fsync, dst_fd)
+    finally:
+        dst.close()
+    return written
+
+
 def clear_volume(volume_size, volume_path, volume_clear=None,
                  volume_clear_size=None, volume_clear_ionice=None,
                  throttle=None):